@@ -0,0 +1,100 @@
+from dataclasses import dataclass
+from typing import List, Literal, Optional, Tuple, Type, Union
+from pydantic import BaseModel, Field, ValidationError
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+from embedding_cache import text_hash
+from llm_pool import ChatModelPool
+from lru_cache import LRUCache
+from scheduler import GenerationScheduler
+import config
+
+
+class SentimentResult(BaseModel):
+    sentimiento: Literal["positivo", "negativo", "neutral"]
+    confianza: float = Field(ge=0.0, le=1.0)
+
+
+class KeywordsResult(BaseModel):
+    keywords: List[str]
+
+
+@dataclass(frozen=True)
+class AnalysisTask:
+    prompt: ChatPromptTemplate
+    # Tasks with a schema run in Ollama's JSON mode and are validated into it
+    schema: Optional[Type[BaseModel]] = None
+
+
+# Prompts compiled once at import
+ANALYSIS_TASKS = {
+    "summarize": AnalysisTask(ChatPromptTemplate.from_template("Resume el siguiente texto en 2-3 oraciones:\n\n{text}")),
+    "sentiment": AnalysisTask(ChatPromptTemplate.from_template("""Analiza el sentimiento del siguiente texto.
+Responde con JSON: {{"sentimiento": "positivo|negativo|neutral", "confianza": 0.0-1.0}}
+
+Texto: {text}"""), SentimentResult),
+    "extract_keywords": AnalysisTask(ChatPromptTemplate.from_template("""Extrae las 5 palabras clave mas importantes del texto.
+Responde con JSON: {{"keywords": ["kw1", "kw2", ...]}}
+
+Texto: {text}"""), KeywordsResult),
+}
+
+
+class AnalysisParseError(Exception):
+    """The model kept returning output that does not match the task's schema."""
+
+
+class Analyzer:
+    """Runs /analyze tasks with typed results and a cache keyed by (task, model, text hash).
+
+    Structured tasks ask Ollama for JSON and are validated with their pydantic schema;
+    only a validation failure triggers another generation, up to `retries` times.
+    """
+
+    def __init__(self,
+                 llm_pool: ChatModelPool,
+                 scheduler: Optional[GenerationScheduler] = None,
+                 cache_size: int = config.ANALYZE_CACHE_SIZE,
+                 cache_ttl: float = config.ANALYZE_CACHE_TTL,
+                 retries: int = config.ANALYZE_PARSE_RETRIES):
+        self.llm_pool = llm_pool
+        self.scheduler = scheduler
+        self.retries = max(0, retries)
+        self.cache = LRUCache(cache_size, ttl=cache_ttl or None)
+        self.parse_failures = 0
+
+    async def _generate(self, task: AnalysisTask, text: str, model: str) -> str:
+        params = {"format": "json"} if task.schema else {}
+        chain = task.prompt | self.llm_pool.get(model, temperature=0.1, **params) | StrOutputParser()
+        if self.scheduler is None:
+            return await chain.ainvoke({"text": text})
+        async with self.scheduler.slot(model, "analyze"):
+            return await chain.ainvoke({"text": text})
+
+    async def analyze(self, task_name: str, text: str, model: str) -> Tuple[Union[str, dict], bool]:
+        """Returns (result, served_from_cache); structured results are plain dicts."""
+        key = (task_name, model, text_hash(text))
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached, True
+
+        task = ANALYSIS_TASKS[task_name]
+        for attempt in range(self.retries + 1):
+            raw = await self._generate(task, text, model)
+            if task.schema is None:
+                result = raw
+                break
+            try:
+                result = task.schema.model_validate_json(raw).model_dump()
+                break
+            except ValidationError as e:
+                self.parse_failures += 1
+                print(f"Invalid {task_name} output from {model} (attempt {attempt + 1}): {e.errors()[:1]}")
+        else:
+            raise AnalysisParseError(f"{model} did not return valid {task_name} output")
+
+        self.cache.put(key, result)
+        return result, False
+
+    def stats(self) -> dict:
+        return {**self.cache.stats(), "parse_failures": self.parse_failures}
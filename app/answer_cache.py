@@ -0,0 +1,144 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Iterable, List, Optional, Tuple
+import numpy as np
+
+
+@dataclass
+class CachedAnswer:
+    """A generated RAG answer and what it was derived from."""
+    question: str
+    vector: np.ndarray  # unit-normalised question embedding
+    chunk_ids: List[str]
+    embedding_model: str
+    model: str
+    temperature_bucket: float
+    answer: str
+    created_at: float
+
+
+def temperature_bucket(temperature: Optional[float]) -> float:
+    """Groups temperatures to one decimal, so 0.31 and 0.3 share answers."""
+    return round(temperature or 0.0, 1)
+
+
+class SemanticAnswerCache:
+    """Size-bounded cache of RAG answers looked up by question similarity.
+
+    An answer is reused when a previous question for the same embedding model, chat
+    model and temperature bucket has cosine similarity >= `threshold`, is younger than
+    `ttl` seconds and all the chunks it was generated from still exist. Entries whose
+    chunks are deleted are dropped through `invalidate_chunks`.
+    """
+
+    def __init__(self, max_entries: int = 1000, threshold: float = 0.95, ttl: Optional[float] = None):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._next_id = 0
+        self._entries: "OrderedDict[int, CachedAnswer]" = OrderedDict()
+
+    @staticmethod
+    def _normalise(vector: List[float]) -> np.ndarray:
+        array = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(array)
+        return array / norm if norm else array
+
+    def _candidates(self, embedding_model: str, model: str, bucket: float) -> List[Tuple[int, CachedAnswer]]:
+        now = time.time()
+        expired = [key for key, entry in self._entries.items() if self.ttl and now - entry.created_at > self.ttl]
+        for key in expired:
+            del self._entries[key]
+        return [
+            (key, entry) for key, entry in self._entries.items()
+            if entry.embedding_model == embedding_model and entry.model == model
+            and entry.temperature_bucket == bucket
+        ]
+
+    def lookup(self, vector: List[float], embedding_model: str, model: str, temperature: Optional[float],
+               chunks_exist: Callable[[List[str]], bool]) -> Optional[CachedAnswer]:
+        """Returns the closest cached answer above the threshold whose chunks still exist."""
+        query = self._normalise(vector)
+        with self._lock:
+            candidates = self._candidates(embedding_model, model, temperature_bucket(temperature))
+            if candidates:
+                scores = np.stack([entry.vector for _, entry in candidates]) @ query
+                order = [i for i in np.argsort(-scores) if scores[i] >= self.threshold]
+            else:
+                order = []
+            matches = [candidates[i] for i in order]
+
+        # Existence checks hit the vector store, so run them outside the lock
+        for key, entry in matches:
+            if chunks_exist(entry.chunk_ids):
+                with self._lock:
+                    if key in self._entries:
+                        self._entries.move_to_end(key)
+                    self.hits += 1
+                return entry
+            with self._lock:
+                self._entries.pop(key, None)
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, question: str, vector: List[float], chunk_ids: List[str], embedding_model: str,
+            model: str, temperature: Optional[float], answer: str) -> None:
+        # Answers without supporting chunks could never be invalidated
+        if self.max_entries <= 0 or not answer or not chunk_ids:
+            return
+        entry = CachedAnswer(
+            question=question,
+            vector=self._normalise(vector),
+            chunk_ids=list(chunk_ids),
+            embedding_model=embedding_model,
+            model=model,
+            temperature_bucket=temperature_bucket(temperature),
+            answer=answer,
+            created_at=time.time(),
+        )
+        with self._lock:
+            self._entries[self._next_id] = entry
+            self._next_id += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_chunks(self, chunk_ids: Iterable[str]) -> int:
+        """Drops answers that were generated from any of the given chunks."""
+        removed = set(chunk_ids)
+        if not removed:
+            return 0
+        with self._lock:
+            stale = [key for key, entry in self._entries.items() if removed.intersection(entry.chunk_ids)]
+            for key in stale:
+                del self._entries[key]
+        return len(stale)
+
+    def invalidate_model(self, embedding_model: Optional[str] = None) -> None:
+        """Drops all answers of an embedding model, or every answer when none is given."""
+        with self._lock:
+            stale = [
+                key for key, entry in self._entries.items()
+                if embedding_model is None or entry.embedding_model == embedding_model
+            ]
+            for key in stale:
+                del self._entries[key]
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = len(self._entries)
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
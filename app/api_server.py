@@ -1,23 +1,50 @@
 import os
+import sys
+
+if __name__ == "__main__":
+    # Se arranca como `python -m uvicorn api_server:app`: los procesos de parseo re-importan
+    # el __main__ del proceso padre y no deben repetir la inicializacion de este modulo
+    import config
+    from launcher import run_module
+    print("=" * 60)
+    print("ChatGPT Local - Ollama API Server")
+    print("=" * 60)
+    print(f"Ollama URL: {config.OLLAMA_BASE_URL}")
+    print(f"Modelo por defecto: {config.DEFAULT_MODEL}")
+    print(f"Puerto: {config.PORT}")
+    print(f"Max input length: {config.MAX_INPUT_LENGTH} caracteres")
+    print("=" * 60)
+    run_module("uvicorn", ["api_server:app", "--host", "0.0.0.0", "--port", str(config.PORT)])
+    sys.exit(0)
+
 import shutil
 import asyncio
 import json
-from typing import List, Optional, Any, Dict
+from contextlib import asynccontextmanager
+from typing import List, Literal, Optional, Any, Dict, Tuple
 from pydantic import BaseModel, Field
-from fastapi import FastAPI, HTTPException, UploadFile, File, Depends, Security, APIRouter
+from fastapi import FastAPI, HTTPException, UploadFile, File, Depends, Security, APIRouter, Query, Response
 from fastapi.security import APIKeyHeader
-from fastapi.responses import StreamingResponse
-from langchain_ollama import ChatOllama
-from langchain_core.prompts import ChatPromptTemplate
+from fastapi.responses import JSONResponse, StreamingResponse
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.tools import tool
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
 from rag_service import RAGService
+from llm_pool import ChatModelPool
+from model_residency import ModelResidencyManager
+from single_flight import SingleFlight
+from scheduler import AdmissionRejected, GenerationScheduler
+from ingest_jobs import IngestionQueue
+from tool_executor import ToolExecutor
+from stream_events import MEDIA_TYPES, event, render
+from analysis import ANALYSIS_TASKS, AnalysisParseError, Analyzer
 import nltk
 import config
 
 # Import MongoDB MCP
 try:
     from mcp_server.mongodb_mcp import create_mongodb_mcp_server
+    from mcp_server.schema_catalog import SchemaCatalog
     MONGODB_MCP_AVAILABLE = True
 except ImportError:
     MONGODB_MCP_AVAILABLE = False
@@ -56,11 +83,35 @@ async def verify_api_key(api_key: str = Security(api_key_header)):
             detail="Could not validate credentials",
         )
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Precarga los modelos por defecto al arrancar y libera recursos al parar."""
+    await residency.start()
+    if schema_catalog:
+        schema_catalog.start()
+    yield
+    await residency.stop()
+    await ingestion_queue.stop()
+    if schema_catalog:
+        await schema_catalog.stop()
+    if mongodb_server:
+        await mongodb_server.aclose()
+
 # Initialize FastAPI
 app = FastAPI(
-    title="LangChain Local LLM API"
+    title="LangChain Local LLM API",
+    lifespan=lifespan,
 )
 
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request, exc: AdmissionRejected):
+    """Peticiones rechazadas por el planificador: 429 (cola llena) o 503 (tiempo de espera agotado)."""
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
 # Router for protected endpoints
 router = APIRouter(dependencies=[Depends(verify_api_key)])
 
@@ -78,33 +129,70 @@ class AnalysisRequest(BaseModel):
     task: str
     model: str = MODEL_NAME
 
+class BatchAnalysisItem(BaseModel):
+    text: str
+    task: str
+    id: Optional[str] = Field(default=None, description="Client identifier echoed in the result")
+
+class BatchAnalysisRequest(BaseModel):
+    items: List[BatchAnalysisItem] = Field(..., min_length=1, max_length=config.ANALYZE_BATCH_MAX_ITEMS)
+    model: str = MODEL_NAME
+    concurrency: int = Field(default=config.ANALYZE_BATCH_CONCURRENCY, ge=1, le=32, description="Concurrent generations")
+
 # Configuration
 UPLOAD_DIR = "./uploaded_files"
+UPLOAD_BLOCK_SIZE = 1024 * 1024
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 @app.get("/")
 async def root():
     return {"status": "ok", "service": "LangChain Local API"}
 
+# Clientes de Ollama compartidos entre peticiones (conexiones keep-alive)
+llm_pool = ChatModelPool(base_url=OLLAMA_BASE_URL)
+
+# Modelos residentes en Ollama: precarga, keep-alive y cargas compartidas
+residency = ModelResidencyManager(base_url=OLLAMA_BASE_URL)
+if config.MODEL_PRELOAD:
+    residency.pin(MODEL_NAME, "chat")
+    residency.pin(EMBEDDING_MODEL, "embedding")
+
+# Control de admisión y prioridades de las generaciones en Ollama
+scheduler = GenerationScheduler()
+
+# Tareas de /analyze con salida estructurada y caché de resultados
+analyzer = Analyzer(llm_pool, scheduler)
+
+# Coalescencia de peticiones de chat idénticas en curso
+single_flight = SingleFlight(enabled=config.SINGLE_FLIGHT_ENABLED)
+
 # Inicializar RAG Service
 rag_service = RAGService(
     ollama_base_url=OLLAMA_BASE_URL,
     model_name=MODEL_NAME,
-    embedding_model=EMBEDDING_MODEL
+    embedding_model=EMBEDDING_MODEL,
+    llm_pool=llm_pool,
+    residency=residency,
 )
 
+# Cola de ingestión en segundo plano
+ingestion_queue = IngestionQueue(rag_service)
+
 # Inicializar MongoDB MCP
 mongodb_server = None
 mongodb_tools = []
-mongodb_context = None
+schema_catalog = None
 
 if MONGODB_MCP_AVAILABLE:
     try:
         mongodb_server = create_mongodb_mcp_server()
+        # Catálogo de colecciones y campos, refrescado en segundo plano
+        schema_catalog = SchemaCatalog(mongodb_server.async_tools)
 
-        # Crear LangChain tools a partir de las herramientas MCP
+        # Crear LangChain tools asíncronas a partir de las herramientas MCP,
+        # para que una consulta lenta no bloquee el bucle de eventos
         @tool
-        def mongodb_find(collection: str, filter_json: Any = "{}", limit: Any = 10) -> str:
+        async def mongodb_find(collection: str, filter_json: Any = "{}", limit: Any = 10) -> str:
             """Busca documentos en una colección de MongoDB.
 
             Args:
@@ -127,7 +215,7 @@ if MONGODB_MCP_AVAILABLE:
             elif isinstance(limit, str):
                 limit = int(limit)
 
-            result = mongodb_server.execute_tool("mongodb_find", {
+            result = await mongodb_server.aexecute_tool("mongodb_find", {
                 "collection": collection,
                 "filter_json": filter_json,
                 "limit": limit
@@ -135,7 +223,7 @@ if MONGODB_MCP_AVAILABLE:
             return result
 
         @tool
-        def mongodb_count(collection: str, filter_json: Any = "{}") -> str:
+        async def mongodb_count(collection: str, filter_json: Any = "{}") -> str:
             """Cuenta documentos en una colección que cumplan un filtro.
 
             Args:
@@ -151,14 +239,14 @@ if MONGODB_MCP_AVAILABLE:
             elif filter_json is None or filter_json == "":
                 filter_json = "{}"
 
-            result = mongodb_server.execute_tool("mongodb_count", {
+            result = await mongodb_server.aexecute_tool("mongodb_count", {
                 "collection": collection,
                 "filter_json": filter_json
             })
             return result
 
         @tool
-        def mongodb_aggregate(collection: str, pipeline_json: str) -> str:
+        async def mongodb_aggregate(collection: str, pipeline_json: str) -> str:
             """Ejecuta un pipeline de agregación en MongoDB.
 
             Args:
@@ -168,43 +256,34 @@ if MONGODB_MCP_AVAILABLE:
             Returns:
                 JSON string con los resultados
             """
-            result = mongodb_server.execute_tool("mongodb_aggregate", {
+            result = await mongodb_server.aexecute_tool("mongodb_aggregate", {
                 "collection": collection,
                 "pipeline_json": pipeline_json
             })
             return result
 
         @tool
-        def mongodb_list_collections() -> str:
+        async def mongodb_list_collections() -> str:
             """Lista todas las colecciones disponibles en la base de datos.
 
             Returns:
                 JSON string con la lista de colecciones
             """
-            result = mongodb_server.execute_tool("mongodb_list_collections", {})
+            result = await mongodb_server.aexecute_tool("mongodb_list_collections", {})
             return result
 
         mongodb_tools = [mongodb_find, mongodb_count, mongodb_aggregate, mongodb_list_collections]
 
-        # Obtener contexto de la base de datos
-        try:
-            result = mongodb_server.execute_tool("mongodb_list_collections", {})
-            result_data = json.loads(result)
-            if result_data.get("success"):
-                mongodb_context = {
-                    "database": result_data.get("database"),
-                    "collections": result_data.get("collections", [])
-                }
-        except Exception as e:
-            print(f"Error getting MongoDB context: {e}")
-
+        # El contexto de la base de datos (colecciones y campos) lo mantiene el catálogo,
+        # que se carga al arrancar y se actualiza en segundo plano
         print(f"✓ MongoDB MCP initialized with {len(mongodb_tools)} tools")
-        if mongodb_context:
-            print(f"✓ Database: {mongodb_context['database']}, Collections: {len(mongodb_context['collections'])}")
     except Exception as e:
         print(f"Error initializing MongoDB MCP: {e}")
         MONGODB_MCP_AVAILABLE = False
 
+# Ejecución de las llamadas a herramientas de cada turno del modelo
+tool_executor = ToolExecutor(mongodb_tools)
+
 # ... (Models) ...
 
 class ChatRequest(BaseModel):
@@ -220,6 +299,15 @@ class ChatRequest(BaseModel):
 
 # ... (Existing endpoints) ...
 
+@router.get("/models/resident")
+async def get_resident_models():
+    """Modelos cargados actualmente en Ollama y modelos fijados por el servidor."""
+    try:
+        await residency.refresh()
+    except Exception as e:
+        print(f"Warning: could not refresh resident models: {e}")
+    return residency.snapshot()
+
 @router.get("/models/raw")
 async def get_models_raw():
     """Endpoint de debug: retorna la respuesta raw de Ollama sin procesar."""
@@ -284,14 +372,130 @@ async def get_models():
         print(traceback.format_exc())
         return {"models": [{"name": MODEL_NAME}]}
 
+def server_timing(timings: Dict[str, Any]) -> Dict[str, str]:
+    """Cabeceras con los tiempos por etapa del RAG (Server-Timing, en ms)."""
+    headers = {
+        "Server-Timing": ", ".join(
+            f"{name[:-3]};dur={value:.1f}" for name, value in timings.items() if name.endswith("_ms")
+        )
+    }
+    if "tokens_per_second" in timings:
+        headers["X-Tokens-Per-Second"] = f"{timings['tokens_per_second']:.1f}"
+    return headers
+
+# Parte del system prompt que describe MongoDB, por versión del catálogo y lista de colecciones
+_mongodb_prompt: Dict[str, Any] = {"key": None, "text": ""}
+
+def mongodb_system_prompt() -> str:
+    """Descripción de la base de datos y sus herramientas para el system prompt.
+
+    Sólo se reconstruye cuando cambia la versión del catálogo (campos o tipos) o la lista de
+    colecciones. Hasta la primera muestra de documentos incluye sólo los nombres de las colecciones.
+    """
+    key = (schema_catalog.version, tuple(schema_catalog.collection_names or ()))
+    if _mongodb_prompt["key"] == key:
+        return _mongodb_prompt["text"]
+
+    collections_list = ", ".join(schema_catalog.collection_names or [])
+    # Campos y tipos más frecuentes de cada colección
+    schema = schema_catalog.describe()
+    schema_section = f"\n\nEsquema de las colecciones (campo: tipos):\n{schema}" if schema else ""
+    text = f"""Tienes acceso a una base de datos MongoDB llamada '{schema_catalog.database}' con las siguientes colecciones: {collections_list}.{schema_section}
+
+Puedes usar las siguientes herramientas para consultar los datos:
+- mongodb_list_collections: Lista todas las colecciones disponibles
+- mongodb_find: Busca documentos en una colección
+- mongodb_count: Cuenta documentos que cumplan un filtro
+- mongodb_aggregate: Ejecuta pipelines de agregación complejos
+
+Cuando el usuario haga preguntas sobre los datos:
+1. Usa mongodb_list_collections si necesitas ver qué colecciones hay disponibles
+2. Usa mongodb_find para obtener documentos de una colección
+3. Usa mongodb_count para contar documentos
+4. Interpreta los resultados y responde en lenguaje natural
+
+Ejemplos de uso:
+- Para listar usuarios: mongodb_find(collection="users", filter_json="{{}}", limit=10)
+- Para contar usuarios activos: mongodb_count(collection="users", filter_json='{{"status": "active"}}')
+- Para buscar por nombre: mongodb_find(collection="users", filter_json='{{"name": "Juan"}}', limit=5)"""
+    _mongodb_prompt.update(key=key, text=text)
+    return text
+
+def build_chat_messages(request: ChatRequest) -> list:
+    """Mensajes de LangChain de la conversación, con el contexto de MongoDB si hay herramientas."""
+    langchain_messages = []
+
+    # Construir system prompt con contexto de MongoDB si está habilitado
+    system_prompt = request.system_prompt
+    if (request.use_mongodb_tools and MONGODB_MCP_AVAILABLE and schema_catalog
+            and schema_catalog.collection_names is not None):
+        system_prompt = f"{mongodb_system_prompt()}\n\n{system_prompt}"
+
+    # Agregar system prompt si existe y no está en los mensajes
+    has_system = any(msg.role == "system" for msg in request.messages)
+    if not has_system and system_prompt:
+        langchain_messages.append(SystemMessage(content=system_prompt))
+
+    # Agregar resto de mensajes
+    for msg in request.messages:
+        if msg.role == "user":
+            langchain_messages.append(HumanMessage(content=msg.content))
+        elif msg.role == "assistant":
+            langchain_messages.append(AIMessage(content=msg.content))
+        elif msg.role == "system":
+            langchain_messages.append(SystemMessage(content=msg.content))
+
+    return langchain_messages
+
+async def run_tool_loop(llm, langchain_messages: list):
+    """Bucle de llamadas a las herramientas de MongoDB, común a /chat y /chat/stream.
+
+    Produce un evento tool_start y otro tool_end por cada llamada y, al final, un evento
+    "result" con la última respuesta del modelo. Las llamadas de un mismo turno se ejecutan
+    en paralelo y sus resultados se añaden en el orden en que el modelo las pidió.
+    """
+    llm_with_tools = llm.bind_tools(mongodb_tools)
+    result = await llm_with_tools.ainvoke(langchain_messages)
+
+    for _ in range(config.TOOL_MAX_ITERATIONS):
+        if not result.tool_calls:
+            break
+        # Agregar la respuesta del asistente (la llamada a la herramienta)
+        langchain_messages.append(result)
+
+        for tool_call in result.tool_calls:
+            yield event("tool_start", name=tool_call["name"], id=tool_call["id"], args=tool_call["args"])
+        tool_messages = await tool_executor.run(result.tool_calls)
+        for message in tool_messages:
+            yield event("tool_end", name=message.name, id=message.tool_call_id, status=message.status)
+        langchain_messages.extend(tool_messages)
+
+        # Invocar LLM nuevamente con los resultados de las herramientas
+        result = await llm_with_tools.ainvoke(langchain_messages)
+
+    yield event("result", message=result)
+
 @router.post("/chat", response_model=ChatResponse)
-async def chat(request: ChatRequest):
+async def chat(request: ChatRequest, http_response: Response):
     """Endpoint de chat con soporte RAG opcional y MongoDB tools."""
     # Validar longitud
     for msg in request.messages:
         if len(msg.content) > MAX_INPUT_LENGTH:
             raise HTTPException(status_code=400, detail="Message too long")
 
+    # Las peticiones idénticas en curso comparten una única generación
+    key = single_flight.key("chat", request.model_dump())
+    async def run_scheduled():
+        async with scheduler.slot(request.model, "chat"):
+            return await run_chat(request)
+
+    result, headers = await single_flight.run(key, run_scheduled)
+    http_response.headers.update(headers)
+    return result
+
+
+async def run_chat(request: ChatRequest) -> Tuple[ChatResponse, Dict[str, str]]:
+    """Genera la respuesta de /chat; devuelve también las cabeceras a añadir."""
     try:
         if request.use_knowledge_base:
             # RAG Flow
@@ -299,115 +503,40 @@ async def chat(request: ChatRequest):
             if last_message.role != "user":
                  raise HTTPException(status_code=400, detail="Last message must be from user for RAG")
 
+            timings = {}
             response_text = await rag_service.ask(
                 question=last_message.content,
                 model_name=request.model,
                 temperature=request.temperature,
-                embedding_model=request.embedding_model
+                embedding_model=request.embedding_model,
+                timings=timings,
             )
-            return ChatResponse(response=response_text, model=request.model)
+            return ChatResponse(response=response_text, model=request.model), server_timing(timings)
 
         else:
             # Standard Flow (con o sin MongoDB tools)
-            llm = ChatOllama(
-                model=request.model,
-                base_url=OLLAMA_BASE_URL,
+            await residency.ensure_loaded(request.model)
+            llm = llm_pool.get(
+                request.model,
                 temperature=request.temperature,
                 num_predict=request.max_tokens,
             )
 
-            from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
-
-            langchain_messages = []
+            langchain_messages = build_chat_messages(request)
 
-            # Construir system prompt con contexto de MongoDB si está habilitado
-            system_prompt = request.system_prompt
-            if request.use_mongodb_tools and MONGODB_MCP_AVAILABLE and mongodb_context:
-                collections_list = ", ".join(mongodb_context["collections"])
-                mongodb_system_prompt = f"""Tienes acceso a una base de datos MongoDB llamada '{mongodb_context["database"]}' con las siguientes colecciones: {collections_list}.
-
-Puedes usar las siguientes herramientas para consultar los datos:
-- mongodb_list_collections: Lista todas las colecciones disponibles
-- mongodb_find: Busca documentos en una colección
-- mongodb_count: Cuenta documentos que cumplan un filtro
-- mongodb_aggregate: Ejecuta pipelines de agregación complejos
-
-Cuando el usuario haga preguntas sobre los datos:
-1. Usa mongodb_list_collections si necesitas ver qué colecciones hay disponibles
-2. Usa mongodb_find para obtener documentos de una colección
-3. Usa mongodb_count para contar documentos
-4. Interpreta los resultados y responde en lenguaje natural
-
-Ejemplos de uso:
-- Para listar usuarios: mongodb_find(collection="users", filter_json="{{}}", limit=10)
-- Para contar usuarios activos: mongodb_count(collection="users", filter_json='{{"status": "active"}}')
-- Para buscar por nombre: mongodb_find(collection="users", filter_json='{{"name": "Juan"}}', limit=5)
-
-{system_prompt}"""
-                system_prompt = mongodb_system_prompt
-
-            # Agregar system prompt si existe y no está en los mensajes
-            has_system = any(msg.role == "system" for msg in request.messages)
-            if not has_system and system_prompt:
-                langchain_messages.append(SystemMessage(content=system_prompt))
-
-            # Agregar resto de mensajes
-            for msg in request.messages:
-                if msg.role == "user":
-                    langchain_messages.append(HumanMessage(content=msg.content))
-                elif msg.role == "assistant":
-                    langchain_messages.append(AIMessage(content=msg.content))
-                elif msg.role == "system":
-                    langchain_messages.append(SystemMessage(content=msg.content))
-
-            # Si MongoDB tools están habilitados, vincular las herramientas al LLM
+            # Si MongoDB tools están habilitados, el modelo puede consultar la base de datos
             if request.use_mongodb_tools and MONGODB_MCP_AVAILABLE and mongodb_tools:
-                llm_with_tools = llm.bind_tools(mongodb_tools)
-
-                # Invocar el LLM con herramientas
-                result = await llm_with_tools.ainvoke(langchain_messages)
-
-                # Procesar tool calls si existen
-                from langchain_core.messages import AIMessage, ToolMessage
-                max_iterations = 5
-                iteration = 0
-
-                while hasattr(result, 'tool_calls') and result.tool_calls and iteration < max_iterations:
-                    iteration += 1
-                    langchain_messages.append(result)
-
-                    # Ejecutar cada tool call
-                    for tool_call in result.tool_calls:
-                        tool_name = tool_call["name"]
-                        tool_args = tool_call["args"]
-
-                        print(f"Executing tool: {tool_name} with args: {tool_args}")
-
-                        # Encontrar y ejecutar la herramienta
-                        tool_result = None
-                        for tool_func in mongodb_tools:
-                            if tool_func.name == tool_name:
-                                tool_result = tool_func.invoke(tool_args)
-                                break
-
-                        if tool_result:
-                            langchain_messages.append(
-                                ToolMessage(
-                                    content=str(tool_result),
-                                    tool_call_id=tool_call["id"]
-                                )
-                            )
-
-                    # Invocar LLM nuevamente con los resultados de las herramientas
-                    result = await llm_with_tools.ainvoke(langchain_messages)
-
-                response = result.content if hasattr(result, 'content') else str(result)
+                result = None
+                async for item in run_tool_loop(llm, langchain_messages):
+                    if item["type"] == "result":
+                        result = item["message"]
+                response = result.content
             else:
                 # Sin herramientas
                 chain = llm | StrOutputParser()
                 response = await chain.ainvoke(langchain_messages)
 
-            return ChatResponse(response=response, model=request.model)
+            return ChatResponse(response=response, model=request.model), {}
 
     except Exception as e:
         import traceback
@@ -417,33 +546,68 @@ Ejemplos de uso:
 
 
 @router.post("/ingest")
-async def ingest_document(file: UploadFile = File(...), embedding_model: Optional[str] = None):
-    """Upload and ingest a document into the Knowledge Base."""
+async def ingest_document(file: UploadFile = File(...), embedding_model: Optional[str] = None, wait: bool = False):
+    """Upload a document and queue it for ingestion into the Knowledge Base.
+
+    Returns a job id immediately; poll /ingest/jobs/{job_id} for progress.
+    With wait=true the request blocks until the job finishes.
+    """
     try:
         file_path = os.path.join(UPLOAD_DIR, file.filename)
+        # Copy the upload in blocks so large files are never held in memory
         with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-            
-        num_chunks = rag_service.ingest_file(file_path, embedding_model=embedding_model)
-        
+            while block := await file.read(UPLOAD_BLOCK_SIZE):
+                buffer.write(block)
+
+        job = ingestion_queue.submit(file_path, file.filename, embedding_model=embedding_model)
+        if not wait:
+            return {
+                "job_id": job.id,
+                "filename": file.filename,
+                "status": "queued",
+                "message": f"Queued {file.filename} for ingestion"
+            }
+
+        await job.done.wait()
+        if job.stage == "failed":
+            raise HTTPException(status_code=500, detail=f"Ingestion failed: {job.error}")
         return {
+            "job_id": job.id,
             "filename": file.filename,
             "status": "success", 
-            "chunks_added": num_chunks,
+            "chunks_added": job.stats.chunks,
+            "chunks_unchanged": job.stats.unchanged,
+            "chunks_deleted": job.stats.deleted,
+            "chunks_per_second": round(job.stats.chunks_per_second, 2),
             "message": f"Successfully ingested {file.filename}"
         }
+    except HTTPException:
+        raise
     except Exception as e:
         import traceback
         print(f"Error ingesting file: {str(e)}")
         print(traceback.format_exc())
         raise HTTPException(status_code=500, detail=f"Ingestion failed: {str(e)}")
 
+@router.get("/ingest/jobs")
+async def list_ingest_jobs():
+    """List recent ingestion jobs."""
+    return {"jobs": [job.to_dict() for job in ingestion_queue.jobs()]}
+
+@router.get("/ingest/jobs/{job_id}")
+async def get_ingest_job(job_id: str):
+    """Progress of an ingestion job: stage, chunks embedded, throughput and errors."""
+    job = ingestion_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job.to_dict()
+
 @router.get("/documents")
 async def list_documents(embedding_model: Optional[str] = None):
     """List all unique documents in the vector store."""
     try:
-        docs = rag_service.list_documents(embedding_model=embedding_model)
-        return {"documents": docs}
+        details = rag_service.document_stats(embedding_model=embedding_model)
+        return {"documents": [doc["name"] for doc in details], "details": details}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -470,146 +634,81 @@ async def clear_documents(embedding_model: Optional[str] = None):
 
 
 @router.post("/chat/stream")
-async def chat_stream(request: ChatRequest):
-    """Endpoint de chat con streaming via texto plano."""
+async def chat_stream(request: ChatRequest, stream_format: Literal["text", "sse", "ndjson"] = Query("text", alias="format")):
+    """Endpoint de chat con streaming.
+
+    Con format=text (por defecto) se envía texto plano. Con format=sse o format=ndjson se
+    envían eventos tipados (token, tool_start, tool_end, usage, error, done) con los tokens
+    agrupados en fragmentos y latidos (heartbeat) periódicos; la respuesta empieza sin
+    esperar a la cola ni al modelo, y los rechazos del planificador llegan como evento error.
+    """
     # Validar longitud de mensajes
     for msg in request.messages:
         if len(msg.content) > MAX_INPUT_LENGTH:
             raise HTTPException(status_code=400, detail="Message too long")
 
-    async def generate():
+    async def stream_tokens(llm, messages):
+        # Eventos token de la respuesta y, al final, el uso de tokens que informa Ollama
+        usage = {}
+        async for chunk in llm.astream(messages):
+            if chunk.content:
+                yield event("token", content=chunk.content)
+            usage = getattr(chunk, "usage_metadata", None) or usage
+        if usage:
+            yield event("usage", **usage)
+
+    async def generate(headers: Dict[str, str]):
         try:
             if request.use_knowledge_base:
                 # RAG Flow
                 last_message = request.messages[-1]
                 if last_message.role != "user":
-                    yield "Error: Last message must be from user for RAG."
+                    yield event("error", message="Last message must be from user for RAG.")
                     return
 
-                # Streaming de RAG
+                # Streaming de RAG; los tiempos de embed/search/prompt/ttft van en cabecera
+                # (format=text) y en el evento usage final
+                timings = {}
+                first = True
                 async for chunk in rag_service.ask_stream(
                     question=last_message.content,
                     model_name=request.model,
                     temperature=request.temperature,
-                    embedding_model=request.embedding_model
+                    embedding_model=request.embedding_model,
+                    timings=timings,
                 ):
-                    yield chunk
-            
+                    if first:
+                        headers.update(server_timing(timings))
+                        first = False
+                    yield event("token", content=chunk)
+                yield event("usage", timings={name: round(value, 1) for name, value in timings.items()})
+
             else:
                 # Standard Flow
-                llm = ChatOllama(
-                    model=request.model,
-                    base_url=OLLAMA_BASE_URL,
+                await residency.ensure_loaded(request.model)
+                llm = llm_pool.get(
+                    request.model,
                     temperature=request.temperature,
                     num_predict=request.max_tokens,
                 )
 
-                # Construir mensajes usando objetos Message directamente
-                from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
-
-                langchain_messages = []
-
-                # Construir system prompt con contexto de MongoDB si está habilitado
-                system_prompt = request.system_prompt
-                if request.use_mongodb_tools and MONGODB_MCP_AVAILABLE and mongodb_context:
-                    collections_list = ", ".join(mongodb_context["collections"])
-                    mongodb_system_prompt = f"""Tienes acceso a una base de datos MongoDB llamada '{mongodb_context["database"]}' con las siguientes colecciones: {collections_list}.
-
-Puedes usar las siguientes herramientas para consultar los datos:
-- mongodb_list_collections: Lista todas las colecciones disponibles
-- mongodb_find: Busca documentos en una colección
-- mongodb_count: Cuenta documentos que cumplan un filtro
-- mongodb_aggregate: Ejecuta pipelines de agregación complejos
-
-Cuando el usuario haga preguntas sobre los datos:
-1. Usa mongodb_list_collections si necesitas ver qué colecciones hay disponibles
-2. Usa mongodb_find para obtener documentos de una colección
-3. Usa mongodb_count para contar documentos
-4. Interpreta los resultados y responde en lenguaje natural
+                langchain_messages = build_chat_messages(request)
 
-Ejemplos de uso:
-- Para listar usuarios: mongodb_find(collection="users", filter_json="{{}}", limit=10)
-- Para contar usuarios activos: mongodb_count(collection="users", filter_json='{{"status": "active"}}')
-- Para buscar por nombre: mongodb_find(collection="users", filter_json='{{"name": "Juan"}}', limit=5)
-
-{system_prompt}"""
-                    system_prompt = mongodb_system_prompt
-
-                has_system = any(msg.role == "system" for msg in request.messages)
-                if not has_system and system_prompt:
-                    langchain_messages.append(SystemMessage(content=system_prompt))
-
-                for msg in request.messages:
-                    if msg.role == "user":
-                        langchain_messages.append(HumanMessage(content=msg.content))
-                    elif msg.role == "assistant":
-                        langchain_messages.append(AIMessage(content=msg.content))
-                    elif msg.role == "system":
-                        langchain_messages.append(SystemMessage(content=msg.content))
-
-                # Si MongoDB tools están habilitados
                 if request.use_mongodb_tools and MONGODB_MCP_AVAILABLE and mongodb_tools:
-                    llm_with_tools = llm.bind_tools(mongodb_tools)
-                    
-                    # Para tools, necesitamos hacer una primera llamada NO streaming para ver si el modelo quiere usar tools
-                    # Esto es una limitación actual de LangChain/Ollama streaming con tools
-                    result = await llm_with_tools.ainvoke(langchain_messages)
-                    
-                    # Procesar tool calls si existen
-                    from langchain_core.messages import AIMessage, ToolMessage
-                    max_iterations = 5
-                    iteration = 0
-                    
-                    while hasattr(result, 'tool_calls') and result.tool_calls and iteration < max_iterations:
-                        iteration += 1
-                        
-                        # Agregar la respuesta del asistente (la llamada a la herramienta)
-                        langchain_messages.append(result)
-                        
-                        # Ejecutar cada tool call
-                        for tool_call in result.tool_calls:
-                            tool_name = tool_call["name"]
-                            tool_args = tool_call["args"]
-                            
-                            # Notificar al usuario que estamos usando una herramienta (opcional)
-                            yield f"[Utilizando herramienta: {tool_name}]...\n"
-                            
-                            # Encontrar y ejecutar la herramienta
-                            tool_result = None
-                            for tool_func in mongodb_tools:
-                                if tool_func.name == tool_name:
-                                    tool_result = tool_func.invoke(tool_args)
-                                    break
-                            
-                            if tool_result:
-                                langchain_messages.append(
-                                    ToolMessage(
-                                        content=str(tool_result),
-                                        tool_call_id=tool_call["id"]
-                                    )
-                                )
-                        
-                        # Invocar LLM nuevamente
-                        # Si es la última iteración o ya no hay tools, podríamos hacer stream aquí
-                        # Por simplicidad, seguimos con invoke hasta que no haya tools, y la respuesta final se streamea
-                        if iteration < max_iterations:
-                             result = await llm_with_tools.ainvoke(langchain_messages)
-                             if not (hasattr(result, 'tool_calls') and result.tool_calls):
-                                 # Si ya no hay tools, streameamos la respuesta final
-                                 async for chunk in llm.astream(langchain_messages):
-                                     if hasattr(chunk, 'content'):
-                                         yield chunk.content
-                                 return # Terminamos
-                    
-                    # Si salimos del loop (max iteraciones) y tenemos un resultado final
-                    if hasattr(result, 'content'):
-                         yield result.content
+                    # Las llamadas a herramientas se notifican como eventos; la respuesta
+                    # final ya está generada al salir del bucle y se envía tal cual
+                    async for item in run_tool_loop(llm, langchain_messages):
+                        if item["type"] != "result":
+                            yield item
+                            continue
+                        yield event("token", content=item["message"].content)
+                        if item["message"].usage_metadata:
+                            yield event("usage", **item["message"].usage_metadata)
 
                 else:
                     # Stream normal sin tools
-                    async for chunk in llm.astream(langchain_messages):
-                        if hasattr(chunk, 'content'):
-                            yield chunk.content
+                    async for item in stream_tokens(llm, langchain_messages):
+                        yield item
                 
                 await asyncio.sleep(0)  # Permitir que otros procesos se ejecuten
 
@@ -617,53 +716,146 @@ Ejemplos de uso:
             import traceback
             print(f"Error in chat stream endpoint: {str(e)}")
             print(traceback.format_exc())
-            yield f"\n\nError: {str(e)}"
-
-    return StreamingResponse(generate(), media_type="text/plain")
+            yield event("error", message=str(e))
+
+    async def generate_scheduled(headers: Dict[str, str]):
+        # Un rechazo de admisión se propaga antes del primer fragmento: 429/503 en format=text,
+        # evento error en sse/ndjson
+        async with scheduler.slot(request.model, "stream"):
+            async for item in generate(headers):
+                yield item
+        yield event("done", model=request.model)
+
+    async def with_rejection(events):
+        # sse/ndjson ya han respondido 200: el rechazo del planificador llega como evento
+        async for item in events:
+            yield item
+        if isinstance(flight.error, AdmissionRejected):
+            yield event("error", message=str(flight.error), status=flight.error.status_code,
+                        retry_after=flight.error.retry_after)
+
+    # Las peticiones idénticas en curso (en cualquier formato) se suscriben a la misma generación
+    flight, ticket = single_flight.stream(single_flight.key("chat_stream", request.model_dump()), generate_scheduled)
+    if stream_format != "text":
+        # Respuesta inmediata: los latidos cubren la cola, la carga del modelo y las herramientas;
+        # los tiempos por etapa del RAG van en el evento usage
+        return StreamingResponse(
+            render(with_rejection(flight.subscribe(ticket)), stream_format),
+            media_type=MEDIA_TYPES[stream_format],
+        )
+    try:
+        # Esperar al primer fragmento para que las cabeceras (Server-Timing) estén completas
+        await flight.wait_started()
+    except BaseException:
+        # Este consumidor no llega a leer el stream: no debe mantener viva la generación
+        flight.release(ticket)
+        raise
+    return StreamingResponse(
+        render(flight.subscribe(ticket), stream_format),
+        media_type=MEDIA_TYPES[stream_format],
+        headers=flight.headers,
+    )
+
+
+def check_analysis_task(task: str):
+    if task not in ANALYSIS_TASKS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Tarea no valida. Opciones: {list(ANALYSIS_TASKS.keys())}"
+        )
 
 
 @router.post("/analyze")
 async def analyze_text(request: AnalysisRequest):
     """Analizar texto (resumen, sentimiento, keywords)."""
-    tasks = {
-        "summarize": "Resume el siguiente texto en 2-3 oraciones:\n\n{text}",
-        "sentiment": """Analiza el sentimiento del siguiente texto.
-Responde con JSON: {{"sentimiento": "positivo|negativo|neutral", "confianza": 0.0-1.0}}
-
-Texto: {text}""",
-        "extract_keywords": """Extrae las 5 palabras clave mas importantes del texto.
-Responde con JSON: {{"keywords": ["kw1", "kw2", ...]}}
-
-Texto: {text}"""
-    }
-
-    if request.task not in tasks:
-        raise HTTPException(
-            status_code=400,
-            detail=f"Tarea no valida. Opciones: {list(tasks.keys())}"
-        )
+    check_analysis_task(request.task)
 
     try:
-        llm = ChatOllama(
-            model=request.model,
-            base_url=OLLAMA_BASE_URL,
-            temperature=0.1,
-        )
-
-        prompt = ChatPromptTemplate.from_template(tasks[request.task])
-        chain = prompt | llm | StrOutputParser()
-
-        result = await chain.ainvoke({"text": request.text})
+        await residency.ensure_loaded(request.model)
+        result, cached = await analyzer.analyze(request.task, request.text, request.model)
 
         return {
             "task": request.task,
             "result": result,
-            "model": request.model
+            "model": request.model,
+            "cached": cached
         }
 
+    except AdmissionRejected:
+        raise
+    except AnalysisParseError as e:
+        raise HTTPException(status_code=502, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+
+@router.post("/analyze/batch")
+async def analyze_batch(request: BatchAnalysisRequest):
+    """Analiza muchos textos en paralelo y devuelve los resultados en NDJSON según terminan.
+
+    Cada línea contiene el índice del elemento, su resultado o error y la latencia en ms;
+    la última línea resume el lote.
+    """
+    for item in request.items:
+        check_analysis_task(item.task)
+    await residency.ensure_loaded(request.model)
+
+    async def worker(pending: asyncio.Queue, results: asyncio.Queue):
+        while True:
+            try:
+                index, item = pending.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            start = asyncio.get_running_loop().time()
+            line = {"index": index, "id": item.id, "task": item.task, "result": None, "error": None, "cached": False}
+            try:
+                line["result"], line["cached"] = await analyzer.analyze(item.task, item.text, request.model)
+            except Exception as e:
+                line["error"] = str(e)
+            line["latency_ms"] = round((asyncio.get_running_loop().time() - start) * 1000, 1)
+            await results.put(line)
+
+    async def generate():
+        start = asyncio.get_running_loop().time()
+        pending = asyncio.Queue()
+        for index, item in enumerate(request.items):
+            pending.put_nowait((index, item))
+        results = asyncio.Queue()
+        workers = [asyncio.create_task(worker(pending, results)) for _ in range(request.concurrency)]
+        errors = 0
+        try:
+            for _ in range(len(request.items)):
+                line = await results.get()
+                errors += line["error"] is not None
+                yield json.dumps(line, ensure_ascii=False) + "\n"
+            yield json.dumps({
+                "done": True,
+                "count": len(request.items),
+                "errors": errors,
+                "elapsed_ms": round((asyncio.get_running_loop().time() - start) * 1000, 1),
+                "model": request.model,
+            }) + "\n"
+        finally:
+            # Si el cliente se desconecta no seguimos generando
+            for task in workers:
+                task.cancel()
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+@router.get("/cache/stats")
+async def cache_stats():
+    """Estadísticas de aciertos/fallos de las cachés y de la coalescencia de peticiones."""
+    return {
+        **rag_service.cache_stats(),
+        "analysis": analyzer.stats(),
+        "single_flight": single_flight.stats(),
+    }
+
+@router.get("/scheduler/stats")
+async def scheduler_stats():
+    """Generaciones activas, profundidad de cola y tiempos de espera por modelo y tipo."""
+    return scheduler.stats()
+
 @router.get("/debug/rag")
 async def debug_rag(query: str):
     """Endpoint de debug para verificar retrieval."""
@@ -687,11 +879,14 @@ async def mongodb_status():
         }
 
     try:
+        # Contexto en memoria del catálogo, sin consultar la base de datos
+        snapshot = schema_catalog.snapshot if schema_catalog else None
         return {
             "available": True,
             "connected": mongodb_server is not None,
-            "database": mongodb_context.get("database") if mongodb_context else None,
-            "collections": mongodb_context.get("collections") if mongodb_context else [],
+            "database": snapshot["database"] if snapshot else None,
+            "collections": [coll["name"] for coll in snapshot["collections"]] if snapshot else [],
+            "schema_version": snapshot["version"] if snapshot else None,
             "tools_count": len(mongodb_tools)
         }
     except Exception as e:
@@ -703,50 +898,28 @@ async def mongodb_status():
 
 @router.get("/mongodb/collections")
 async def mongodb_collections_info():
-    """Obtener información detallada de las colecciones."""
+    """Información de las colecciones: tamaño aproximado y estadísticas de campos.
+
+    Se sirve desde el catálogo en memoria, que se refresca en segundo plano.
+    """
     if not MONGODB_MCP_AVAILABLE or not mongodb_server:
         raise HTTPException(status_code=503, detail="MongoDB MCP not available")
 
     try:
-        result = mongodb_server.execute_tool("mongodb_list_collections", {})
-        result_data = json.loads(result)
-
-        if not result_data.get("success"):
-            raise HTTPException(status_code=500, detail=result_data.get("error"))
-
-        # Obtener muestra de cada colección
-        collections_info = []
-        for coll_name in result_data.get("collections", []):
-            # Contar documentos
-            count_result = mongodb_server.execute_tool("mongodb_count", {
-                "collection": coll_name,
-                "filter_json": "{}"
-            })
-            count_data = json.loads(count_result)
-            doc_count = count_data.get("count", 0) if count_data.get("success") else 0
-
-            # Obtener documento de ejemplo
-            sample_result = mongodb_server.execute_tool("mongodb_find", {
-                "collection": coll_name,
-                "filter_json": "{}",
-                "limit": 1
-            })
-            sample_data = json.loads(sample_result)
-
-            fields = []
-            if sample_data.get("success") and sample_data.get("documents"):
-                doc = sample_data["documents"][0]
-                fields = list(doc.keys())
-
-            collections_info.append({
-                "name": coll_name,
-                "document_count": doc_count,
-                "fields": fields
-            })
-
+        snapshot = await schema_catalog.get()
         return {
-            "database": result_data.get("database"),
-            "collections": collections_info
+            "database": snapshot["database"],
+            "refreshed_at": snapshot["refreshed_at"],
+            "collections": [
+                {
+                    "name": coll["name"],
+                    "document_count": coll["document_count"],
+                    "fields": [field["name"] for field in coll["fields"]],
+                    "sample_size": coll["sample_size"],
+                    "field_stats": coll["fields"],
+                }
+                for coll in snapshot["collections"]
+            ]
         }
     except Exception as e:
         import traceback
@@ -754,18 +927,3 @@ async def mongodb_collections_info():
         raise HTTPException(status_code=500, detail=str(e))
 
 app.include_router(router)
-
-# =============================================================================
-# Main
-# =============================================================================
-if __name__ == "__main__":
-    import uvicorn
-    print("=" * 60)
-    print("ChatGPT Local - Ollama API Server")
-    print("=" * 60)
-    print(f"Ollama URL: {OLLAMA_BASE_URL}")
-    print(f"Modelo por defecto: {MODEL_NAME}")
-    print(f"Puerto: {PORT}")
-    print(f"Max input length: {MAX_INPUT_LENGTH} caracteres")
-    print("=" * 60)
-    uvicorn.run(app, host="0.0.0.0", port=PORT)
@@ -4,6 +4,43 @@ import os
 OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
 DEFAULT_MODEL = os.getenv("MODEL_NAME", "qwen3:14b")
 DEFAULT_EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "qwen3-embedding:8b")
+# Model residency: preload the default models at startup and keep them loaded
+MODEL_PRELOAD = os.getenv("MODEL_PRELOAD", "true").lower() == "true"
+MODEL_KEEP_ALIVE = os.getenv("MODEL_KEEP_ALIVE", "30m")
+MODEL_KEEPALIVE_INTERVAL = float(os.getenv("MODEL_KEEPALIVE_INTERVAL", 240))
+MODEL_LOAD_TIMEOUT = float(os.getenv("MODEL_LOAD_TIMEOUT", 300))
+# Identical in-flight /chat and /chat/stream requests share one generation
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+# Admission control for generations: concurrent requests per model, waiting requests
+# per model, and max queue wait in seconds per request kind (0 = no deadline)
+SCHEDULER_MAX_CONCURRENT_PER_MODEL = int(os.getenv("SCHEDULER_MAX_CONCURRENT_PER_MODEL", 2))
+SCHEDULER_MAX_QUEUE = int(os.getenv("SCHEDULER_MAX_QUEUE", 100))
+SCHEDULER_DEADLINES = {
+    "stream": float(os.getenv("SCHEDULER_DEADLINE_STREAM", 30)),
+    "chat": float(os.getenv("SCHEDULER_DEADLINE_CHAT", 60)),
+    "analyze": float(os.getenv("SCHEDULER_DEADLINE_ANALYZE", 120)),
+}
+# /analyze/batch: items per request and default concurrent generations per batch
+ANALYZE_BATCH_MAX_ITEMS = int(os.getenv("ANALYZE_BATCH_MAX_ITEMS", 10000))
+ANALYZE_BATCH_CONCURRENCY = int(os.getenv("ANALYZE_BATCH_CONCURRENCY", 4))
+# /chat/stream: token frames flushed at this many characters or after this delay; idle heartbeat (0 = off)
+STREAM_COALESCE_CHARS = int(os.getenv("STREAM_COALESCE_CHARS", 32))
+STREAM_COALESCE_MS = float(os.getenv("STREAM_COALESCE_MS", 50))
+STREAM_HEARTBEAT_SECONDS = float(os.getenv("STREAM_HEARTBEAT_SECONDS", 15))
+# Tool calling: rounds of tool calls per request, concurrent calls per round and time limit per round
+TOOL_MAX_ITERATIONS = int(os.getenv("TOOL_MAX_ITERATIONS", 5))
+TOOL_MAX_CONCURRENCY = int(os.getenv("TOOL_MAX_CONCURRENCY", 4))
+TOOL_TURN_TIMEOUT = float(os.getenv("TOOL_TURN_TIMEOUT", 30))
+# /analyze results cached by (task, model, text hash); extra generations when JSON output fails validation
+ANALYZE_CACHE_SIZE = int(os.getenv("ANALYZE_CACHE_SIZE", 2048))
+ANALYZE_CACHE_TTL = float(os.getenv("ANALYZE_CACHE_TTL", 3600))
+ANALYZE_PARSE_RETRIES = int(os.getenv("ANALYZE_PARSE_RETRIES", 1))
+# Pooled chat clients, one per (model, base URL, generation parameters)
+LLM_POOL_MAX_SIZE = int(os.getenv("LLM_POOL_MAX_SIZE", 32))
+LLM_POOL_IDLE_SECONDS = float(os.getenv("LLM_POOL_IDLE_SECONDS", 600))
+# HTTP connection limits of each pooled client
+OLLAMA_MAX_CONNECTIONS = int(os.getenv("OLLAMA_MAX_CONNECTIONS", 100))
+OLLAMA_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OLLAMA_MAX_KEEPALIVE_CONNECTIONS", 64))
 
 # API Server Settings
 PORT = int(os.getenv("PORT", 8000))
@@ -13,6 +50,63 @@ UPLOAD_DIR = os.getenv("UPLOAD_DIR", "./uploaded_files")
 # Vector Database (ChromaDB) Settings
 CHROMA_PERSIST_DIR = os.getenv("CHROMA_PERSIST_DIR", "./chroma_db")
 
+# Ingestion Settings
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", 1000))
+CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", 200))
+# Worker processes for document parsing (0 = parse inside the API process)
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", os.cpu_count() or 1))
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", 8))
+# Text-like files at least this big are read and embedded incrementally instead of loaded whole
+STREAMING_INGEST_MIN_BYTES = int(os.getenv("STREAMING_INGEST_MIN_BYTES", 8 * 1024 * 1024))
+STREAMING_BLOCK_CHARS = int(os.getenv("STREAMING_BLOCK_CHARS", 64 * 1024))
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", 32))
+EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", 4))
+# Per-model batch size overrides, e.g. "nomic-embed-text=64,qwen3-embedding:8b=8"
+EMBEDDING_BATCH_SIZES = {
+    name.strip(): int(size)
+    for name, _, size in (item.rpartition("=") for item in os.getenv("EMBEDDING_BATCH_SIZES", "").split(","))
+    if name.strip()
+}
+
+# Embedding cache (SQLite). Defaults to <CHROMA_PERSIST_DIR>/embedding_cache.sqlite3
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "")
+EMBEDDING_CACHE_MAX_ENTRIES = int(os.getenv("EMBEDDING_CACHE_MAX_ENTRIES", 200000))
+
+# In-memory cache of retrieval results per embedding model (0 disables it)
+RETRIEVAL_CACHE_SIZE = int(os.getenv("RETRIEVAL_CACHE_SIZE", 256))
+RETRIEVAL_CACHE_TTL = float(os.getenv("RETRIEVAL_CACHE_TTL", 300))
+# In-memory LRU of question embeddings per embedding model (0 disables it)
+QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", 1024))
+
+# Semantic answer cache for RAG questions (opt-in): reuse an answer when a previous
+# question is at least this similar and its source chunks still exist
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "false").lower() == "true"
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", 0.95))
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", 1000))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", 24 * 3600))
+
+# Prompt used by RAG answers; must contain {context} and {question}
+RAG_PROMPT_TEMPLATE = os.getenv("RAG_PROMPT_TEMPLATE", """Usa el siguiente contexto para responder a la pregunta del usuario.
+Si la respuesta no se encuentra en el contexto, di que no tienes esa información. No inventes nada.
+Mantén la respuesta concisa y profesional.
+
+Contexto:
+{context}
+
+Pregunta: {question}
+Respuesta:""")
+# Load the chat model in Ollama while a RAG question is being retrieved
+RAG_PRELOAD_LLM = os.getenv("RAG_PRELOAD_LLM", "true").lower() == "true"
+
+# Background ingestion queue
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", 2))
+# Max concurrent ingestion jobs per embedding model, leaving Ollama capacity for /chat
+INGEST_CONCURRENCY_PER_MODEL = int(os.getenv("INGEST_CONCURRENCY_PER_MODEL", 1))
+INGEST_JOB_HISTORY = int(os.getenv("INGEST_JOB_HISTORY", 200))
+# Files ingested at the same time by ingest_directory
+DIRECTORY_INGEST_CONCURRENCY = int(os.getenv("DIRECTORY_INGEST_CONCURRENCY", 4))
+
 # MongoDB Settings (for MCP)
 MONGODB_URI = os.getenv("MONGODB_URI", "")
 MONGODB_DATABASE = os.getenv("MONGODB_DATABASE", "")
@@ -24,3 +118,4 @@ LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
 
 # Security
 API_KEY = os.getenv("API_KEY", "")
+
@@ -0,0 +1,173 @@
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+from langchain_community.document_loaders import TextLoader, UnstructuredMarkdownLoader
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
+import config
+
+# (text, metadata) pairs are what worker processes send back to the parent
+Chunk = Tuple[str, dict]
+
+# Formats that can be split while reading, without a format-specific loader
+STREAMING_EXTENSIONS = {".txt", ".log", ".csv", ".tsv", ".jsonl", ".ndjson"}
+
+
+def make_text_splitter(**kwargs) -> RecursiveCharacterTextSplitter:
+    return RecursiveCharacterTextSplitter(
+        chunk_size=config.CHUNK_SIZE,
+        chunk_overlap=config.CHUNK_OVERLAP,
+        length_function=len,
+        **kwargs,
+    )
+
+
+def _to_chunks(documents: List[Document]) -> List[Chunk]:
+    return [(chunk.page_content, chunk.metadata) for chunk in make_text_splitter().split_documents(documents)]
+
+
+def _load_markdown(file_path: str) -> List[Document]:
+    try:
+        # Try to ensure resources are available if using Unstructured
+        import nltk
+        try:
+            nltk.data.find('tokenizers/punkt_tab')
+        except LookupError:
+            nltk.download('punkt_tab')
+        try:
+            nltk.data.find('tokenizers/punkt')
+        except LookupError:
+            nltk.download('punkt')
+        try:
+            nltk.data.find('taggers/averaged_perceptron_tagger')
+        except LookupError:
+            nltk.download('averaged_perceptron_tagger')
+
+        return UnstructuredMarkdownLoader(file_path).load()
+    except Exception as e:
+        print(f"Warning: UnstructuredMarkdownLoader failed: {e}. Falling back to TextLoader.")
+        return TextLoader(file_path, encoding="utf-8", autodetect_encoding=True).load()
+
+
+def _load_and_split(file_path: str) -> List[Chunk]:
+    """Loads a non-PDF file with the loader matching its extension and splits it."""
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext == ".md":
+        documents = _load_markdown(file_path)
+    elif ext == ".txt":
+        documents = TextLoader(file_path, encoding="utf-8").load()
+    else:
+        # Fallback for code files or others, treat as text
+        documents = TextLoader(file_path, encoding="utf-8", autodetect_encoding=True).load()
+    return _to_chunks(documents)
+
+
+def _pdf_page_count(file_path: str) -> int:
+    import pypdf
+    return len(pypdf.PdfReader(file_path).pages)
+
+
+def _split_pdf_pages(file_path: str, start: int, end: int) -> List[Chunk]:
+    """Extracts and splits pages [start, end) of a PDF, one Document per page like PyPDFLoader."""
+    import pypdf
+    reader = pypdf.PdfReader(file_path)
+    total_pages = len(reader.pages)
+    documents = []
+    for page_number in range(start, min(end, total_pages)):
+        documents.append(Document(
+            page_content=reader.pages[page_number].extract_text().strip(),
+            metadata={
+                "source": file_path,
+                "total_pages": total_pages,
+                "page": page_number,
+                "page_label": reader.page_labels[page_number],
+            },
+        ))
+    return _to_chunks(documents)
+
+
+def parse_file(file_path: str, executor: Optional[Executor] = None) -> List[Document]:
+    """Loads and splits a file into chunk Documents, in `executor` when one is given.
+
+    PDFs are split into page ranges of PDF_PAGES_PER_TASK pages that are parsed in
+    parallel; chunks are returned in document order.
+    """
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext == ".pdf":
+        total_pages = _pdf_page_count(file_path)
+        step = max(1, config.PDF_PAGES_PER_TASK)
+        ranges = [(start, start + step) for start in range(0, total_pages, step)]
+        if executor is None:
+            parts = [_split_pdf_pages(file_path, start, end) for start, end in ranges]
+        else:
+            futures = [executor.submit(_split_pdf_pages, file_path, start, end) for start, end in ranges]
+            parts = [future.result() for future in futures]
+        chunks = [chunk for part in parts for chunk in part]
+    elif executor is None:
+        chunks = _load_and_split(file_path)
+    else:
+        chunks = executor.submit(_load_and_split, file_path).result()
+
+    return [Document(page_content=text, metadata=metadata) for text, metadata in chunks]
+
+
+def make_parse_pool(max_workers: int) -> ProcessPoolExecutor:
+    """Process pool for parse_file.
+
+    Workers are forked from a forkserver that has imported only this module, never from
+    the API process with its Chroma and HTTP client threads (spawn where forkserver is not
+    available). Both start methods re-import the parent's __main__ in every worker, so
+    servers that use the pool must be started through a module entry point such as
+    `python -m uvicorn` (see launcher.run_module), not a script with setup at import time.
+    """
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload([__name__])
+    else:
+        context = multiprocessing.get_context("spawn")
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=context)
+
+
+def is_streamable(file_path: str) -> bool:
+    """Whether a file should be ingested with iter_text_chunks rather than parse_file."""
+    ext = os.path.splitext(file_path)[1].lower()
+    return ext in STREAMING_EXTENSIONS and os.path.getsize(file_path) >= config.STREAMING_INGEST_MIN_BYTES
+
+
+def iter_text_chunks(file_path: str, block_size: int = config.STREAMING_BLOCK_CHARS) -> Iterator[Document]:
+    """Reads a text file incrementally and yields chunks as soon as they are final.
+
+    After each block the buffer is re-split with the regular splitter. Chunks are only
+    emitted up to the last one that starts on a top-level separator (e.g. a paragraph
+    break) and is not among the final two, whose boundaries can still move when more text
+    arrives; the buffer then restarts at that chunk. Since the splitter's merge state is
+    fresh at such a chunk, the output matches splitting the whole file, while memory stays
+    around one block plus a few chunks.
+    """
+    splitter = make_text_splitter(add_start_index=True)
+    buffer = ""
+    with open(file_path, "r", encoding="utf-8", errors="replace") as f:
+        for block in iter(lambda: f.read(block_size), ""):
+            buffer += block
+            docs = splitter.create_documents([buffer])
+            separator = next((sep for sep in splitter._separators if sep and sep in buffer), "")
+            restart, offset = 0, 0
+            for k in range(len(docs) - 3, 0, -1):
+                head = buffer[:docs[k].metadata["start_index"]].rstrip(" \t")
+                if separator and head.endswith(separator):
+                    # Keep the separator: the splitter attaches it to the following piece
+                    restart, offset = k, len(head) - len(separator)
+                    break
+            if not restart and len(buffer) > 16 * block_size and len(docs) > 3:
+                # No paragraph boundary in sight: accept a possibly different split to bound memory
+                restart = len(docs) - 3
+                offset = docs[restart].metadata["start_index"]
+            if not restart:
+                continue
+            for doc in docs[:restart]:
+                yield Document(page_content=doc.page_content, metadata={"source": file_path})
+            buffer = buffer[offset:]
+
+    for text in splitter.split_text(buffer):
+        yield Document(page_content=text, metadata={"source": file_path})
@@ -0,0 +1,148 @@
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+from ingestion import IngestionStats
+from rag_service import RAGService
+import config
+
+
+@dataclass
+class IngestJob:
+    """State of a background ingestion job."""
+    id: str
+    filename: str
+    file_path: str
+    embedding_model: str
+    stage: str = "queued"  # queued, parsing, embedding, done, skipped, failed
+    stats: IngestionStats = field(default_factory=IngestionStats)
+    error: Optional[str] = None
+    created_at: float = field(default_factory=time.time)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    done: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+
+    @property
+    def finished(self) -> bool:
+        return self.stage in ("done", "skipped", "failed")
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "filename": self.filename,
+            "embedding_model": self.embedding_model,
+            "stage": self.stage,
+            "chunks_total": self.stats.total,
+            "chunks_embedded": self.stats.chunks,
+            "chunks_unchanged": self.stats.unchanged,
+            "chunks_deleted": self.stats.deleted,
+            "chunks_updated": self.stats.updated,
+            "chunks_per_second": round(self.stats.chunks_per_second, 2),
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class IngestionQueue:
+    """Runs ingestion jobs on asyncio workers, off the request path.
+
+    Jobs for the same embedding model are limited to `per_model_concurrency` at a time
+    so background embedding does not monopolise the Ollama instance serving chats; this
+    is the only limit on ingestion, which does not take GenerationScheduler slots (those
+    are per chat model). Workers start lazily on the first submitted job.
+    """
+
+    def __init__(self,
+                 rag_service: RAGService,
+                 workers: int = config.INGEST_WORKERS,
+                 per_model_concurrency: int = config.INGEST_CONCURRENCY_PER_MODEL,
+                 history: int = config.INGEST_JOB_HISTORY):
+        self.rag_service = rag_service
+        self.num_workers = max(1, workers)
+        self.per_model_concurrency = max(1, per_model_concurrency)
+        self.history = history
+        self._jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self._model_limits: Dict[str, asyncio.Semaphore] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+
+    def _ensure_started(self) -> None:
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(self.num_workers)]
+
+    async def stop(self) -> None:
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+
+    def submit(self, file_path: str, filename: str, embedding_model: Optional[str] = None) -> IngestJob:
+        """Queues a file for ingestion and returns its job immediately."""
+        self._ensure_started()
+        job = IngestJob(
+            id=uuid.uuid4().hex,
+            filename=filename,
+            file_path=file_path,
+            embedding_model=embedding_model or self.rag_service.embedding_model_name,
+        )
+        self._jobs[job.id] = job
+        self._prune()
+        self._queue.put_nowait(job)
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        return self._jobs.get(job_id)
+
+    def jobs(self) -> List[IngestJob]:
+        return list(self._jobs.values())
+
+    def _prune(self) -> None:
+        """Forgets the oldest finished jobs beyond the history limit."""
+        excess = len(self._jobs) - self.history
+        for job_id in [j.id for j in self._jobs.values() if j.finished][:max(0, excess)]:
+            del self._jobs[job_id]
+
+    async def _worker(self) -> None:
+        while True:
+            job = await self._queue.get()
+            try:
+                limit = self._model_limits.setdefault(
+                    job.embedding_model, asyncio.Semaphore(self.per_model_concurrency)
+                )
+                async with limit:
+                    await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: IngestJob) -> None:
+        job.started_at = time.time()
+
+        def on_progress(stage: str, stats: IngestionStats) -> None:
+            # Called from the ingestion thread; plain attribute updates only
+            job.stage = stage
+            job.stats = stats
+
+        try:
+            job.stats = await asyncio.to_thread(
+                self.rag_service.ingest_file,
+                job.file_path,
+                embedding_model=job.embedding_model,
+                on_progress=on_progress,
+            )
+            if job.stage != "skipped":
+                job.stage = "done"
+        except Exception as e:
+            import traceback
+            print(f"Error ingesting file {job.filename}: {str(e)}")
+            print(traceback.format_exc())
+            job.stage = "failed"
+            job.error = str(e)
+        finally:
+            job.finished_at = time.time()
+            job.done.set()
@@ -0,0 +1,133 @@
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass
+from itertools import islice
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_chroma import Chroma
+import config
+
+
+@dataclass
+class IngestionStats:
+    """Counters reported by an EmbeddingPipeline run."""
+    total: int = 0
+    chunks: int = 0
+    batches: int = 0
+    seconds: float = 0.0
+    unchanged: int = 0
+    deleted: int = 0
+    # Unchanged chunks whose metadata (e.g. page numbers) was rewritten without re-embedding
+    updated: int = 0
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.chunks / self.seconds if self.seconds > 0 else 0.0
+
+    def add(self, other: "IngestionStats") -> None:
+        """Accumulates the counters of another run into this one."""
+        self.total += other.total
+        self.chunks += other.chunks
+        self.batches += other.batches
+        self.seconds += other.seconds
+        self.unchanged += other.unchanged
+        self.deleted += other.deleted
+        self.updated += other.updated
+
+    def to_dict(self) -> dict:
+        return {
+            "total": self.total,
+            "chunks": self.chunks,
+            "batches": self.batches,
+            "seconds": round(self.seconds, 3),
+            "chunks_per_second": round(self.chunks_per_second, 2),
+            "unchanged": self.unchanged,
+            "deleted": self.deleted,
+            "updated": self.updated,
+        }
+
+
+def _batched(items: Iterable[Document], size: int) -> Iterator[List[Document]]:
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+class EmbeddingPipeline:
+    """Embeds chunks in batches with bounded concurrency and writes them to Chroma in bulk.
+
+    Batches are embedded on a thread pool (at most `concurrency` in flight) and each
+    completed batch is upserted with its precomputed vectors, so Chroma never calls
+    the embedding function itself during ingestion.
+    """
+
+    def __init__(self,
+                 embeddings: Embeddings,
+                 vectorstore: Chroma,
+                 batch_size: int = config.EMBEDDING_BATCH_SIZE,
+                 concurrency: int = config.EMBEDDING_CONCURRENCY):
+        self.embeddings = embeddings
+        self.vectorstore = vectorstore
+        self.batch_size = max(1, batch_size)
+        self.concurrency = max(1, concurrency)
+
+    def _embed(self, batch: List[Document]) -> Tuple[List[Document], List[List[float]]]:
+        return batch, self.embeddings.embed_documents([doc.page_content for doc in batch])
+
+    def _write(self, batch: List[Document], vectors: List[List[float]]) -> None:
+        self.vectorstore._collection.upsert(
+            ids=[doc.id or str(uuid.uuid4()) for doc in batch],
+            embeddings=vectors,
+            documents=[doc.page_content for doc in batch],
+            # Chroma rejects empty metadata dicts but accepts None
+            metadatas=[doc.metadata or None for doc in batch],
+        )
+
+    def update_metadata(self, docs: List[Document]) -> None:
+        """Rewrites the metadata of already stored chunks, keeping their vectors."""
+        for start in range(0, len(docs), self.batch_size):
+            batch = docs[start:start + self.batch_size]
+            self.vectorstore._collection.update(
+                ids=[doc.id for doc in batch],
+                metadatas=[doc.metadata or None for doc in batch],
+            )
+
+    def run(self, chunks: Iterable[Document],
+            stats: Optional[IngestionStats] = None,
+            on_batch: Optional[Callable[[IngestionStats], None]] = None) -> IngestionStats:
+        """Embeds and stores all chunks. `chunks` may be a lazy iterable.
+
+        Counters are accumulated into `stats` (a new object if omitted) as batches are
+        written, and `on_batch` is called after each write to report progress.
+        """
+        stats = stats or IngestionStats()
+        start = time.perf_counter()
+
+        def flush(future):
+            batch, vectors = future.result()
+            self._write(batch, vectors)
+            stats.chunks += len(batch)
+            stats.batches += 1
+            stats.seconds = time.perf_counter() - start
+            if on_batch:
+                on_batch(stats)
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            pending = set()
+            for batch in _batched(chunks, self.batch_size):
+                if len(pending) >= self.concurrency:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        flush(future)
+                pending.add(executor.submit(self._embed, batch))
+
+            for future in pending:
+                flush(future)
+
+        stats.seconds = time.perf_counter() - start
+        return stats
@@ -0,0 +1,15 @@
+import runpy
+import sys
+from typing import List
+
+
+def run_module(module: str, args: List[str]) -> None:
+    """Runs `python -m <module> <args>` in the current process.
+
+    Worker processes started with spawn or forkserver (the document parsing pool) re-import
+    the parent's __main__ script. Once a script hands over to a package entry point this
+    way, __main__ is `<module>.__main__`, which workers skip, so the script's module-level
+    setup is not repeated in each of them.
+    """
+    sys.argv = [module, *args]
+    runpy.run_module(module, run_name="__main__", alter_sys=True)
@@ -0,0 +1,81 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable, Optional, Tuple
+import httpx
+from langchain_ollama import ChatOllama
+import config
+
+
+class ChatModelPool:
+    """Shared ChatOllama clients keyed by model, base URL and generation parameters.
+
+    Each ChatOllama owns sync and async HTTP clients with keep-alive connections to
+    Ollama, so reusing it across requests avoids a new connection per chat. At most
+    `max_size` clients are kept; the least recently used one is dropped beyond that, and
+    clients unused for `idle_seconds` are dropped on the next lookup.
+    """
+
+    def __init__(self,
+                 base_url: str = config.OLLAMA_BASE_URL,
+                 max_size: int = config.LLM_POOL_MAX_SIZE,
+                 idle_seconds: float = config.LLM_POOL_IDLE_SECONDS):
+        self.base_url = base_url
+        self.max_size = max(1, max_size)
+        self.idle_seconds = idle_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # key -> (last_used, client)
+        self._clients: "OrderedDict[Hashable, Tuple[float, ChatOllama]]" = OrderedDict()
+
+    def _evict_idle(self, now: float) -> None:
+        while self._clients:
+            key, (last_used, _) = next(iter(self._clients.items()))
+            if now - last_used <= self.idle_seconds:
+                break
+            del self._clients[key]
+
+    def get(self, model: str, base_url: Optional[str] = None, **params) -> ChatOllama:
+        """Returns the pooled client for these settings, creating it on first use."""
+        base_url = base_url or self.base_url
+        key = (model, base_url, tuple(sorted(params.items())))
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle(now)
+            entry = self._clients.get(key)
+            if entry is not None:
+                self.hits += 1
+                llm = entry[1]
+            else:
+                self.misses += 1
+                llm = ChatOllama(
+                    model=model,
+                    base_url=base_url,
+                    client_kwargs={
+                        "limits": httpx.Limits(
+                            max_connections=config.OLLAMA_MAX_CONNECTIONS,
+                            max_keepalive_connections=config.OLLAMA_MAX_KEEPALIVE_CONNECTIONS,
+                        ),
+                    },
+                    **params,
+                )
+            self._clients[key] = (now, llm)
+            self._clients.move_to_end(key)
+            while len(self._clients) > self.max_size:
+                self._clients.popitem(last=False)
+            return llm
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._clients)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "clients": len(self),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
@@ -0,0 +1,245 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from itertools import zip_longest
+from typing import Callable, Dict, List, Optional
+
+
+def file_hash(path: str, block_size: int = 1 << 20) -> str:
+    """SHA-256 of a file's contents, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def chunk_id(source: str, chunk_hash: str, occurrence: int = 0) -> str:
+    """Deterministic Chroma id for a chunk; `occurrence` disambiguates repeated chunks in one source."""
+    return hashlib.sha256(f"{source}\0{chunk_hash}\0{occurrence}".encode("utf-8")).hexdigest()
+
+
+def metadata_hash(metadata: dict) -> str:
+    """Hash of a chunk's metadata, to notice metadata-only changes of unchanged text."""
+    return hashlib.sha256(json.dumps(metadata, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def write_json_atomic(path: str, data) -> None:
+    """Writes JSON to a temporary file and renames it over `path`."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+@dataclass
+class DocumentManifest:
+    """Version record of an ingested document."""
+    source: str
+    content_hash: Optional[str]
+    chunk_ids: List[str] = field(default_factory=list)
+    chunk_hashes: List[str] = field(default_factory=list)
+    ingested_at: float = field(default_factory=time.time)
+    # Parallel to chunk_ids; None for chunks recorded before metadata was tracked
+    metadata_hashes: List[Optional[str]] = field(default_factory=list)
+
+
+class ManifestStore:
+    """SQLite-backed collection of DocumentManifests, one database per embedding model directory.
+
+    A manifest is one row plus one row per chunk, so saving or removing a document does
+    not rewrite the others. Manifests from a JSON file written by earlier versions
+    (`legacy_path`) are imported once and the file is removed.
+    """
+
+    def __init__(self, path: str, legacy_path: Optional[str] = None):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            """CREATE TABLE IF NOT EXISTS manifests (
+                   source TEXT PRIMARY KEY,
+                   name TEXT NOT NULL,
+                   content_hash TEXT,
+                   ingested_at REAL NOT NULL
+               );
+               CREATE INDEX IF NOT EXISTS idx_manifests_name ON manifests (name);
+               CREATE TABLE IF NOT EXISTS manifest_chunks (
+                   source TEXT NOT NULL,
+                   id TEXT NOT NULL,
+                   hash TEXT NOT NULL,
+                   metadata_hash TEXT
+               );
+               CREATE INDEX IF NOT EXISTS idx_manifest_chunks_source ON manifest_chunks (source);"""
+        )
+        if legacy_path and os.path.exists(legacy_path):
+            with open(legacy_path, "r", encoding="utf-8") as f:
+                for entry in json.load(f):
+                    self._write(DocumentManifest(**entry))
+            self._conn.commit()
+            os.remove(legacy_path)
+
+    def _write(self, manifest: DocumentManifest) -> None:
+        self._conn.execute("DELETE FROM manifest_chunks WHERE source = ?", (manifest.source,))
+        self._conn.execute(
+            "INSERT OR REPLACE INTO manifests (source, name, content_hash, ingested_at) VALUES (?, ?, ?, ?)",
+            (manifest.source, os.path.basename(manifest.source), manifest.content_hash, manifest.ingested_at),
+        )
+        self._conn.executemany(
+            "INSERT INTO manifest_chunks (source, id, hash, metadata_hash) VALUES (?, ?, ?, ?)",
+            [
+                (manifest.source, i, h, m)
+                for i, h, m in zip_longest(manifest.chunk_ids, manifest.chunk_hashes, manifest.metadata_hashes)
+                if i is not None
+            ],
+        )
+
+    def _delete(self, source: str) -> None:
+        self._conn.execute("DELETE FROM manifest_chunks WHERE source = ?", (source,))
+        self._conn.execute("DELETE FROM manifests WHERE source = ?", (source,))
+
+    def get(self, source: str) -> Optional[DocumentManifest]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content_hash, ingested_at FROM manifests WHERE source = ?", (source,)
+            ).fetchone()
+            if row is None:
+                return None
+            chunks = self._conn.execute(
+                "SELECT id, hash, metadata_hash FROM manifest_chunks WHERE source = ? ORDER BY rowid", (source,)
+            ).fetchall()
+        return DocumentManifest(
+            source=source,
+            content_hash=row[0],
+            chunk_ids=[i for i, _, _ in chunks],
+            chunk_hashes=[h for _, h, _ in chunks],
+            ingested_at=row[1],
+            metadata_hashes=[m for _, _, m in chunks],
+        )
+
+    def put(self, manifest: DocumentManifest) -> None:
+        self.put_many([manifest])
+
+    def put_many(self, manifests: List[DocumentManifest]) -> None:
+        """Saves several manifests in one transaction."""
+        with self._lock:
+            for manifest in manifests:
+                self._write(manifest)
+            self._conn.commit()
+
+    def remove(self, source: str) -> Optional[DocumentManifest]:
+        manifest = self.get(source)
+        if manifest is not None:
+            with self._lock:
+                self._delete(source)
+                self._conn.commit()
+        return manifest
+
+    def remove_name(self, name: str) -> int:
+        """Removes the manifests of every source with basename `name`; returns how many."""
+        with self._lock:
+            sources = [s for (s,) in self._conn.execute("SELECT source FROM manifests WHERE name = ?", (name,))]
+            for source in sources:
+                self._delete(source)
+            self._conn.commit()
+        return len(sources)
+
+    def sources(self) -> List[str]:
+        with self._lock:
+            return [source for (source,) in self._conn.execute("SELECT source FROM manifests")]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+class DirectoryCheckpoint:
+    """Progress of one directory ingestion run, so an interrupted run can resume.
+
+    Completed files are recorded with their modification time and size; a resumed run
+    skips them without re-reading them as long as both still match. The file is keyed by
+    the directory and glob pattern and is flushed every `flush_every` completed files.
+    `on_flush` runs right before each flush, so state that completed files depend on
+    (e.g. their manifests) is persisted no later than the checkpoint that skips them.
+    """
+
+    def __init__(self, checkpoint_dir: str, dir_path: str, glob_pattern: str, flush_every: int = 25,
+                 on_flush: Optional[Callable[[], None]] = None):
+        key = hashlib.sha256(f"{os.path.abspath(dir_path)}\0{glob_pattern}".encode("utf-8")).hexdigest()[:16]
+        self.path = os.path.join(checkpoint_dir, f"{key}.json")
+        self.dir_path = dir_path
+        self.glob_pattern = glob_pattern
+        self.flush_every = max(1, flush_every)
+        self.on_flush = on_flush
+        self._lock = threading.Lock()
+        self._pending = 0
+        # path -> [mtime, size] of files ingested (or skipped as unchanged)
+        self.completed: Dict[str, List[float]] = {}
+        # path -> error message of the last failed attempt
+        self.failed: Dict[str, str] = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self.completed = data.get("completed", {})
+            self.failed = data.get("failed", {})
+
+    @staticmethod
+    def _signature(path: str) -> List[float]:
+        st = os.stat(path)
+        return [st.st_mtime, st.st_size]
+
+    def is_done(self, path: str) -> bool:
+        with self._lock:
+            signature = self.completed.get(path)
+        try:
+            return signature is not None and signature == self._signature(path)
+        except OSError:
+            return False
+
+    def mark_done(self, path: str) -> None:
+        signature = self._signature(path)
+        with self._lock:
+            self.completed[path] = signature
+            self.failed.pop(path, None)
+            self._count_change()
+
+    def mark_failed(self, path: str, error: str) -> None:
+        with self._lock:
+            self.completed.pop(path, None)
+            self.failed[path] = error
+            self._count_change()
+
+    def _count_change(self) -> None:
+        self._pending += 1
+        if self._pending >= self.flush_every:
+            self._save()
+
+    def _save(self) -> None:
+        if self.on_flush:
+            self.on_flush()
+        write_json_atomic(self.path, {
+            "dir": os.path.abspath(self.dir_path),
+            "glob": self.glob_pattern,
+            "completed": self.completed,
+            "failed": self.failed,
+        })
+        self._pending = 0
+
+    def save(self) -> None:
+        with self._lock:
+            self._save()
+
+    def reset(self) -> None:
+        """Forgets all progress, so the next run revisits every file."""
+        with self._lock:
+            self.completed.clear()
+            self.failed.clear()
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            self._pending = 0
@@ -32,6 +32,46 @@ class MongoDBConfig:
             "MONGODB_MAX_POOL_SIZE",
             "10"
         ))
+        # Schema catalog: documents sampled per collection and refresh period in seconds
+        self.schema_sample_size: int = int(os.getenv(
+            "MONGODB_SCHEMA_SAMPLE_SIZE",
+            "200"
+        ))
+        self.schema_ttl: float = float(os.getenv(
+            "MONGODB_SCHEMA_TTL",
+            "300"
+        ))
+        # Seconds between cheap checks of the collection list (new or dropped collections)
+        self.schema_poll_interval: float = float(os.getenv(
+            "MONGODB_SCHEMA_POLL_INTERVAL",
+            "30"
+        ))
+        # Fields and types seen in less than this fraction of the sample don't change the schema version
+        self.schema_min_frequency: float = float(os.getenv(
+            "MONGODB_SCHEMA_MIN_FREQUENCY",
+            "0.05"
+        ))
+        # Tool results: compact JSON, per-result byte budget and truncation of large values
+        self.result_compact: bool = os.getenv(
+            "MONGODB_RESULT_COMPACT",
+            "true"
+        ).lower() == "true"
+        self.result_max_bytes: int = int(os.getenv(
+            "MONGODB_RESULT_MAX_BYTES",
+            "16384"
+        ))
+        self.result_max_string: int = int(os.getenv(
+            "MONGODB_RESULT_MAX_STRING",
+            "1000"
+        ))
+        self.result_max_array: int = int(os.getenv(
+            "MONGODB_RESULT_MAX_ARRAY",
+            "50"
+        ))
+        self.result_batch_size: int = int(os.getenv(
+            "MONGODB_RESULT_BATCH_SIZE",
+            "100"
+        ))
 
     def get_connection_params(self) -> dict:
         """Get MongoDB connection parameters."""
@@ -7,7 +7,7 @@ This server exposes MongoDB tools that can be used by LLM agents.
 """
 
 from typing import Any, Dict, List
-from .tools import MongoDBTools
+from .tools import AsyncMongoDBTools, MongoDBTools
 from .config import config
 
 
@@ -27,6 +27,8 @@ class MongoDBMCPServer:
     def __init__(self):
         """Initialize the MongoDB MCP server."""
         self.tools = MongoDBTools()
+        # Used from async code (the API server); has its own connection pool
+        self.async_tools = AsyncMongoDBTools()
         self.name = "mongodb"
         self.version = "1.0.0"
         self.description = "MongoDB MCP Server for database operations"
@@ -234,6 +236,20 @@ class MongoDBMCPServer:
             }
         ]
 
+    @staticmethod
+    def _tool_map(tools) -> Dict[str, Any]:
+        return {
+            "mongodb_find": tools.find_documents,
+            "mongodb_find_one": tools.find_one_document,
+            "mongodb_insert": tools.insert_document,
+            "mongodb_insert_many": tools.insert_many_documents,
+            "mongodb_update": tools.update_documents,
+            "mongodb_delete": tools.delete_documents,
+            "mongodb_aggregate": tools.aggregate,
+            "mongodb_list_collections": tools.list_collections,
+            "mongodb_count": tools.count_documents,
+        }
+
     def execute_tool(self, tool_name: str, parameters: Dict[str, Any]) -> str:
         """
         Execute a tool with given parameters.
@@ -245,17 +261,7 @@ class MongoDBMCPServer:
         Returns:
             JSON string with tool execution results
         """
-        tool_map = {
-            "mongodb_find": self.tools.find_documents,
-            "mongodb_find_one": self.tools.find_one_document,
-            "mongodb_insert": self.tools.insert_document,
-            "mongodb_insert_many": self.tools.insert_many_documents,
-            "mongodb_update": self.tools.update_documents,
-            "mongodb_delete": self.tools.delete_documents,
-            "mongodb_aggregate": self.tools.aggregate,
-            "mongodb_list_collections": self.tools.list_collections,
-            "mongodb_count": self.tools.count_documents,
-        }
+        tool_map = self._tool_map(self.tools)
 
         if tool_name not in tool_map:
             return f'{{"success": false, "error": "Unknown tool: {tool_name}"}}'
@@ -267,10 +273,30 @@ class MongoDBMCPServer:
         except Exception as e:
             return f'{{"success": false, "error": "Tool execution failed: {str(e)}"}}'
 
+    async def aexecute_tool(self, tool_name: str, parameters: Dict[str, Any]) -> str:
+        """
+        Execute a tool without blocking the event loop.
+
+        Same contract as execute_tool, using the async MongoDB client.
+        """
+        tool_map = self._tool_map(self.async_tools)
+
+        if tool_name not in tool_map:
+            return f'{{"success": false, "error": "Unknown tool: {tool_name}"}}'
+
+        try:
+            return await tool_map[tool_name](**parameters)
+        except Exception as e:
+            return f'{{"success": false, "error": "Tool execution failed: {str(e)}"}}'
+
     def close(self):
         """Close MongoDB connections."""
         self.tools.disconnect()
 
+    async def aclose(self):
+        """Close the async MongoDB connections."""
+        await self.async_tools.disconnect()
+
     def __enter__(self):
         """Context manager entry."""
         return self
@@ -0,0 +1,242 @@
+"""
+MongoDB Schema Catalog
+======================
+
+Cached snapshot of the collections, their approximate sizes and field statistics,
+refreshed in the background so request handlers never scan the database.
+"""
+
+import asyncio
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+from bson import Decimal128, ObjectId
+from .config import config
+from .tools import AsyncMongoDBTools
+
+
+def bson_type(value: Any) -> str:
+    """Name of the BSON type of a decoded value."""
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        return "bool"
+    if isinstance(value, int):
+        return "int"
+    if isinstance(value, float):
+        return "double"
+    if isinstance(value, str):
+        return "string"
+    if isinstance(value, dict):
+        return "object"
+    if isinstance(value, list):
+        return "array"
+    if isinstance(value, ObjectId):
+        return "objectId"
+    if isinstance(value, datetime):
+        return "date"
+    if isinstance(value, Decimal128):
+        return "decimal"
+    return type(value).__name__
+
+
+class SchemaCatalog:
+    """
+    Collection metadata for /mongodb/collections and the tool-calling system prompt.
+
+    Counts come from `estimated_document_count` (collection metadata, no scan) and field
+    statistics from a `$sample` of `sample_size` documents per collection: how often each
+    top-level field appears and with which types. The snapshot is refreshed every `ttl`
+    seconds by a background task, and on demand when it is older than that.
+
+    Between refreshes the background task polls the collection list every
+    `poll_interval` seconds (a single cheap command) and refreshes at once when a
+    collection is created or dropped. `collection_names` holds the last list, so callers
+    have the collection names before the first sampled snapshot is ready.
+
+    `version` increases only when the schema changes: the collection names and, per
+    collection, the sorted field names and type sets seen in at least `min_frequency`
+    of the sample. Counts, field order and rare fields that come and go between random
+    samples don't count, so callers can cache anything derived from it per version.
+    A collection that fails to sample keeps its previous description.
+    """
+
+    def __init__(
+        self,
+        tools: AsyncMongoDBTools,
+        sample_size: int = config.schema_sample_size,
+        ttl: float = config.schema_ttl,
+        poll_interval: float = config.schema_poll_interval,
+        min_frequency: float = config.schema_min_frequency,
+        max_concurrency: int = 4
+    ):
+        self.tools = tools
+        self.sample_size = sample_size
+        self.ttl = ttl
+        self.poll_interval = poll_interval
+        self.min_frequency = min_frequency
+        self.max_concurrency = max(1, max_concurrency)
+        self.database = config.database_name
+        self.snapshot: Optional[Dict[str, Any]] = None
+        self.collection_names: Optional[List[str]] = None
+        self.version = 0
+        self._signature: Optional[tuple] = None
+        self._refreshed_at: Optional[float] = None
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._loop_task: Optional[asyncio.Task] = None
+
+    async def _describe_collection(self, name: str) -> Dict[str, Any]:
+        coll = self.tools.db[name]
+        document_count = await coll.estimated_document_count()
+
+        fields: Dict[str, Counter] = {}
+        sampled = 0
+        cursor = await coll.aggregate([{"$sample": {"size": self.sample_size}}])
+        async for document in cursor:
+            sampled += 1
+            for key, value in document.items():
+                fields.setdefault(key, Counter())[bson_type(value)] += 1
+
+        # Most common fields first
+        ordered = sorted(fields.items(), key=lambda item: -sum(item[1].values()))
+        return {
+            "name": name,
+            "document_count": document_count,
+            "sample_size": sampled,
+            "fields": [
+                {
+                    "name": key,
+                    "frequency": round(sum(types.values()) / sampled, 3),
+                    "types": dict(types.most_common()),
+                }
+                for key, types in ordered
+            ],
+        }
+
+    async def _list_collections(self) -> List[str]:
+        await self.tools.connect()
+        names = sorted(await self.tools.db.list_collection_names())
+        self.collection_names = names
+        return names
+
+    async def _refresh(self) -> Dict[str, Any]:
+        start = time.perf_counter()
+        names = await self._list_collections()
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def describe(name: str) -> Dict[str, Any]:
+            async with semaphore:
+                return await self._describe_collection(name)
+
+        results = await asyncio.gather(*(describe(name) for name in names), return_exceptions=True)
+        previous = {coll["name"]: coll for coll in self.snapshot["collections"]} if self.snapshot else {}
+        collections = []
+        for name, result in zip(names, results):
+            if isinstance(result, BaseException):
+                print(f"Warning: could not sample MongoDB collection {name}: {result}")
+                result = {
+                    **previous.get(name, {"name": name, "document_count": None, "sample_size": 0, "fields": []}),
+                    "error": str(result),
+                }
+            collections.append(result)
+
+        signature = self._schema_signature(collections)
+        if signature != self._signature:
+            self._signature = signature
+            self.version += 1
+        self.snapshot = {
+            "database": self.database,
+            "version": self.version,
+            "collections": collections,
+            "refreshed_at": time.time(),
+        }
+        self._refreshed_at = time.monotonic()
+        print(f"✓ MongoDB schema catalog refreshed: {len(names)} collections in {time.perf_counter() - start:.2f}s")
+        return self.snapshot
+
+    def _schema_signature(self, collections: List[Dict[str, Any]]) -> tuple:
+        signature = []
+        for coll in collections:
+            fields = []
+            for field in coll["fields"]:
+                if field["frequency"] < self.min_frequency:
+                    continue
+                types = tuple(sorted(
+                    t for t, n in field["types"].items() if n / coll["sample_size"] >= self.min_frequency
+                ))
+                fields.append((field["name"], types))
+            signature.append((coll["name"], tuple(sorted(fields))))
+        return tuple(sorted(signature))
+
+    def refresh(self) -> asyncio.Task:
+        """Returns the in-flight refresh, starting one if there is none."""
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh())
+        return self._refresh_task
+
+    def is_fresh(self) -> bool:
+        return self._refreshed_at is not None and time.monotonic() - self._refreshed_at < self.ttl
+
+    async def get(self) -> Dict[str, Any]:
+        """
+        Current snapshot, refreshed first if it has expired.
+
+        A failed refresh falls back to the previous snapshot when there is one.
+        """
+        if self.snapshot is not None and self.is_fresh():
+            return self.snapshot
+        try:
+            return await asyncio.shield(self.refresh())
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if self.snapshot is None:
+                raise
+            print(f"Warning: MongoDB schema refresh failed, serving previous snapshot: {e}")
+            return self.snapshot
+
+    async def _collections_changed(self) -> bool:
+        names = await self._list_collections()
+        return names != [coll["name"] for coll in self.snapshot["collections"]]
+
+    async def _refresh_loop(self):
+        while True:
+            try:
+                if self.snapshot is None or not self.is_fresh() or await self._collections_changed():
+                    await self.refresh()
+            except Exception as e:
+                print(f"Warning: MongoDB schema refresh failed: {e}")
+            await asyncio.sleep(min(self.poll_interval, self.ttl) if self.poll_interval else self.ttl)
+
+    def start(self):
+        """Starts refreshing the catalog in the background."""
+        if self._loop_task is None:
+            self._loop_task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        """Stops the background refresh."""
+        for task in (self._loop_task, self._refresh_task):
+            if task is not None:
+                task.cancel()
+        await asyncio.gather(*(t for t in (self._loop_task, self._refresh_task) if t), return_exceptions=True)
+        self._loop_task = None
+        self._refresh_task = None
+
+    def describe(self, max_fields: int = 10) -> str:
+        """
+        Compact text description of the last snapshot for an LLM prompt.
+
+        One line per collection with its most common fields. Counts are left out: they
+        change without a new version, and the text is cached per version.
+        """
+        if not self.snapshot:
+            return ""
+        lines: List[str] = []
+        for coll in self.snapshot["collections"]:
+            fields = ", ".join(
+                f"{field['name']}: {'|'.join(field['types'])}"
+                for field in [f for f in coll["fields"] if f["frequency"] >= self.min_frequency][:max_fields]
+            )
+            lines.append(f"- {coll['name']}: {fields}" if fields else f"- {coll['name']}")
+        return "\n".join(lines)
@@ -5,15 +5,196 @@ MongoDB MCP Tools
 Tools for MongoDB operations exposed through MCP.
 """
 
-from typing import Any, Dict, List, Optional
-from pymongo import MongoClient
+import asyncio
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from pymongo import AsyncMongoClient, MongoClient
 from pymongo.errors import PyMongoError
 import json
 from bson import json_util, ObjectId
 from .config import config
 
+# Optional faster JSON encoder
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
-class MongoDBTools:
+
+class BaseMongoDBTools:
+    """
+    Parsing and serialization shared by the sync and async tools.
+
+    Results are fed back into the LLM context, so by default they are compact JSON,
+    long strings and arrays inside documents are truncated, and find/aggregate stop
+    reading the cursor once the serialized documents reach the byte budget.
+    """
+
+    def _dumps(self, data: Any) -> str:
+        if not config.result_compact:
+            return json.dumps(data, default=json_util.default, indent=2)
+        if orjson is not None:
+            # Datetimes go through json_util too, so both encoders produce the same output
+            return orjson.dumps(
+                data, default=json_util.default, option=orjson.OPT_PASSTHROUGH_DATETIME
+            ).decode("utf-8")
+        return json.dumps(data, default=json_util.default, separators=(",", ":"), ensure_ascii=False)
+
+    def _serialize_result(self, data: Any) -> str:
+        """Serialize MongoDB result to JSON string."""
+        return self._dumps(data)
+
+    def _truncate(self, value: Any) -> Any:
+        """Shorten long strings and arrays anywhere inside a document."""
+        if isinstance(value, dict):
+            return {key: self._truncate(item) for key, item in value.items()}
+        if isinstance(value, list):
+            items = [self._truncate(item) for item in value[:config.result_max_array]]
+            if len(value) > config.result_max_array:
+                items.append(f"...[{len(value) - config.result_max_array} more items]")
+            return items
+        if isinstance(value, str) and len(value) > config.result_max_string:
+            return value[:config.result_max_string] + f"...[{len(value) - config.result_max_string} more chars]"
+        return value
+
+    def _add_within_budget(self, documents: List[Any], size: int, document: Any) -> Tuple[int, bool]:
+        """
+        Append a truncated document unless it would exceed the result byte budget.
+
+        Returns the new size and whether the document fit; the first document is
+        always kept so a result is never empty because of one large document.
+        """
+        document = self._truncate(document)
+        encoded = len(self._dumps(document).encode("utf-8"))
+        if documents and size + encoded > config.result_max_bytes:
+            return size, False
+        documents.append(document)
+        return size + encoded, True
+
+    def _collect(self, cursor: Iterable) -> Tuple[List[Any], bool]:
+        """Read a cursor until it ends or the byte budget is reached; returns (documents, truncated)."""
+        documents: List[Any] = []
+        size = 0
+        try:
+            for document in cursor:
+                size, fits = self._add_within_budget(documents, size, document)
+                if not fits:
+                    return documents, True
+            return documents, False
+        finally:
+            cursor.close()
+
+    def _parse_filter(self, filter_str: str) -> dict:
+        """Parse filter string to dict, handling ObjectId."""
+        if not filter_str or filter_str.strip() == "{}":
+            return {}
+
+        filter_dict = json.loads(filter_str)
+
+        # Convert _id string to ObjectId if present
+        if "_id" in filter_dict and isinstance(filter_dict["_id"], str):
+            try:
+                filter_dict["_id"] = ObjectId(filter_dict["_id"])
+            except:
+                pass  # Keep as string if invalid ObjectId
+
+        return filter_dict
+
+    def _parse_json(self, json_str: Optional[str]) -> Any:
+        return json.loads(json_str) if json_str else None
+
+    def _parse_array(self, json_str: str, name: str) -> list:
+        value = json.loads(json_str)
+        if not isinstance(value, list):
+            raise ValueError(f"{name} must be a JSON array")
+        return value
+
+    # Result shaping, identical for the sync and async clients
+
+    def _error_result(self, error: Exception) -> str:
+        return self._serialize_result({
+            "success": False,
+            "error": str(error)
+        })
+
+    def _find_result(self, collection: str, results: Tuple[List[Any], bool]) -> str:
+        documents, truncated = results
+        return self._serialize_result({
+            "success": True,
+            "collection": collection,
+            "count": len(documents),
+            "truncated": truncated,
+            "documents": documents
+        })
+
+    def _find_one_result(self, collection: str, document: Any) -> str:
+        return self._serialize_result({
+            "success": True,
+            "collection": collection,
+            "document": self._truncate(document)
+        })
+
+    def _insert_result(self, collection: str, result) -> str:
+        return self._serialize_result({
+            "success": True,
+            "collection": collection,
+            "inserted_id": str(result.inserted_id),
+            "acknowledged": result.acknowledged
+        })
+
+    def _insert_many_result(self, collection: str, result) -> str:
+        return self._serialize_result({
+            "success": True,
+            "collection": collection,
+            "inserted_ids": [str(id) for id in result.inserted_ids],
+            "count": len(result.inserted_ids),
+            "acknowledged": result.acknowledged
+        })
+
+    def _update_result(self, collection: str, result) -> str:
+        return self._serialize_result({
+            "success": True,
+            "collection": collection,
+            "matched_count": result.matched_count,
+            "modified_count": result.modified_count,
+            "upserted_id": str(result.upserted_id) if result.upserted_id else None,
+            "acknowledged": result.acknowledged
+        })
+
+    def _delete_result(self, collection: str, result) -> str:
+        return self._serialize_result({
+            "success": True,
+            "collection": collection,
+            "deleted_count": result.deleted_count,
+            "acknowledged": result.acknowledged
+        })
+
+    def _aggregate_result(self, collection: str, results: Tuple[List[Any], bool]) -> str:
+        documents, truncated = results
+        return self._serialize_result({
+            "success": True,
+            "collection": collection,
+            "count": len(documents),
+            "truncated": truncated,
+            "results": documents
+        })
+
+    def _list_collections_result(self, collections: List[str]) -> str:
+        return self._serialize_result({
+            "success": True,
+            "database": config.database_name,
+            "collections": collections,
+            "count": len(collections)
+        })
+
+    def _count_result(self, collection: str, count: int) -> str:
+        return self._serialize_result({
+            "success": True,
+            "collection": collection,
+            "count": count
+        })
+
+
+class MongoDBTools(BaseMongoDBTools):
     """Tools for MongoDB operations."""
 
     def __init__(self):
@@ -42,26 +223,6 @@ class MongoDBTools:
             self.db = None
             print("✓ Disconnected from MongoDB")
 
-    def _serialize_result(self, data: Any) -> str:
-        """Serialize MongoDB result to JSON string."""
-        return json.dumps(data, default=json_util.default, indent=2)
-
-    def _parse_filter(self, filter_str: str) -> dict:
-        """Parse filter string to dict, handling ObjectId."""
-        if not filter_str or filter_str.strip() == "{}":
-            return {}
-
-        filter_dict = json.loads(filter_str)
-
-        # Convert _id string to ObjectId if present
-        if "_id" in filter_dict and isinstance(filter_dict["_id"], str):
-            try:
-                filter_dict["_id"] = ObjectId(filter_dict["_id"])
-            except:
-                pass  # Keep as string if invalid ObjectId
-
-        return filter_dict
-
     def find_documents(
         self,
         collection: str,
@@ -85,25 +246,12 @@ class MongoDBTools:
         """
         try:
             self.connect()
-            coll = self.db[collection]
-
             query_filter = self._parse_filter(filter_json)
-            proj = json.loads(projection) if projection else None
-
-            cursor = coll.find(query_filter, proj).skip(skip).limit(limit)
-            results = list(cursor)
-
-            return self._serialize_result({
-                "success": True,
-                "collection": collection,
-                "count": len(results),
-                "documents": results
-            })
+            cursor = self.db[collection].find(query_filter, self._parse_json(projection))
+            cursor = cursor.skip(skip).limit(limit).batch_size(config.result_batch_size)
+            return self._find_result(collection, self._collect(cursor))
         except Exception as e:
-            return self._serialize_result({
-                "success": False,
-                "error": str(e)
-            })
+            return self._error_result(e)
 
     def find_one_document(
         self,
@@ -124,23 +272,11 @@ class MongoDBTools:
         """
         try:
             self.connect()
-            coll = self.db[collection]
-
             query_filter = self._parse_filter(filter_json)
-            proj = json.loads(projection) if projection else None
-
-            result = coll.find_one(query_filter, proj)
-
-            return self._serialize_result({
-                "success": True,
-                "collection": collection,
-                "document": result
-            })
+            document = self.db[collection].find_one(query_filter, self._parse_json(projection))
+            return self._find_one_result(collection, document)
         except Exception as e:
-            return self._serialize_result({
-                "success": False,
-                "error": str(e)
-            })
+            return self._error_result(e)
 
     def insert_document(
         self,
@@ -159,22 +295,10 @@ class MongoDBTools:
         """
         try:
             self.connect()
-            coll = self.db[collection]
-
-            document = json.loads(document_json)
-            result = coll.insert_one(document)
-
-            return self._serialize_result({
-                "success": True,
-                "collection": collection,
-                "inserted_id": str(result.inserted_id),
-                "acknowledged": result.acknowledged
-            })
+            result = self.db[collection].insert_one(json.loads(document_json))
+            return self._insert_result(collection, result)
         except Exception as e:
-            return self._serialize_result({
-                "success": False,
-                "error": str(e)
-            })
+            return self._error_result(e)
 
     def insert_many_documents(
         self,
@@ -193,26 +317,10 @@ class MongoDBTools:
         """
         try:
             self.connect()
-            coll = self.db[collection]
-
-            documents = json.loads(documents_json)
-            if not isinstance(documents, list):
-                raise ValueError("documents_json must be a JSON array")
-
-            result = coll.insert_many(documents)
-
-            return self._serialize_result({
-                "success": True,
-                "collection": collection,
-                "inserted_ids": [str(id) for id in result.inserted_ids],
-                "count": len(result.inserted_ids),
-                "acknowledged": result.acknowledged
-            })
+            documents = self._parse_array(documents_json, "documents_json")
+            return self._insert_many_result(collection, self.db[collection].insert_many(documents))
         except Exception as e:
-            return self._serialize_result({
-                "success": False,
-                "error": str(e)
-            })
+            return self._error_result(e)
 
     def update_documents(
         self,
@@ -238,28 +346,11 @@ class MongoDBTools:
         try:
             self.connect()
             coll = self.db[collection]
-
-            query_filter = self._parse_filter(filter_json)
-            update_doc = json.loads(update_json)
-
-            if update_many:
-                result = coll.update_many(query_filter, update_doc, upsert=upsert)
-            else:
-                result = coll.update_one(query_filter, update_doc, upsert=upsert)
-
-            return self._serialize_result({
-                "success": True,
-                "collection": collection,
-                "matched_count": result.matched_count,
-                "modified_count": result.modified_count,
-                "upserted_id": str(result.upserted_id) if result.upserted_id else None,
-                "acknowledged": result.acknowledged
-            })
+            update = coll.update_many if update_many else coll.update_one
+            result = update(self._parse_filter(filter_json), json.loads(update_json), upsert=upsert)
+            return self._update_result(collection, result)
         except Exception as e:
-            return self._serialize_result({
-                "success": False,
-                "error": str(e)
-            })
+            return self._error_result(e)
 
     def delete_documents(
         self,
@@ -281,25 +372,10 @@ class MongoDBTools:
         try:
             self.connect()
             coll = self.db[collection]
-
-            query_filter = self._parse_filter(filter_json)
-
-            if delete_many:
-                result = coll.delete_many(query_filter)
-            else:
-                result = coll.delete_one(query_filter)
-
-            return self._serialize_result({
-                "success": True,
-                "collection": collection,
-                "deleted_count": result.deleted_count,
-                "acknowledged": result.acknowledged
-            })
+            delete = coll.delete_many if delete_many else coll.delete_one
+            return self._delete_result(collection, delete(self._parse_filter(filter_json)))
         except Exception as e:
-            return self._serialize_result({
-                "success": False,
-                "error": str(e)
-            })
+            return self._error_result(e)
 
     def aggregate(
         self,
@@ -318,25 +394,11 @@ class MongoDBTools:
         """
         try:
             self.connect()
-            coll = self.db[collection]
-
-            pipeline = json.loads(pipeline_json)
-            if not isinstance(pipeline, list):
-                raise ValueError("pipeline_json must be a JSON array")
-
-            results = list(coll.aggregate(pipeline))
-
-            return self._serialize_result({
-                "success": True,
-                "collection": collection,
-                "count": len(results),
-                "results": results
-            })
+            pipeline = self._parse_array(pipeline_json, "pipeline_json")
+            cursor = self.db[collection].aggregate(pipeline, batchSize=config.result_batch_size)
+            return self._aggregate_result(collection, self._collect(cursor))
         except Exception as e:
-            return self._serialize_result({
-                "success": False,
-                "error": str(e)
-            })
+            return self._error_result(e)
 
     def list_collections(self) -> str:
         """
@@ -347,19 +409,9 @@ class MongoDBTools:
         """
         try:
             self.connect()
-            collections = self.db.list_collection_names()
-
-            return self._serialize_result({
-                "success": True,
-                "database": config.database_name,
-                "collections": collections,
-                "count": len(collections)
-            })
+            return self._list_collections_result(self.db.list_collection_names())
         except Exception as e:
-            return self._serialize_result({
-                "success": False,
-                "error": str(e)
-            })
+            return self._error_result(e)
 
     def count_documents(
         self,
@@ -378,18 +430,190 @@ class MongoDBTools:
         """
         try:
             self.connect()
-            coll = self.db[collection]
+            count = self.db[collection].count_documents(self._parse_filter(filter_json))
+            return self._count_result(collection, count)
+        except Exception as e:
+            return self._error_result(e)
+
+
+class AsyncMongoDBTools(BaseMongoDBTools):
+    """
+    Async MongoDB tools for use from the event loop.
+
+    Same operations and results as MongoDBTools, on pymongo's AsyncMongoClient, so a
+    slow query only suspends the request that issued it. All callers share the client's
+    connection pool, sized by MONGODB_MAX_POOL_SIZE.
+    """
+
+    def __init__(self):
+        """Initialize MongoDB connection state."""
+        self.client: Optional[AsyncMongoClient] = None
+        self.db = None
+        self._connect_lock = asyncio.Lock()
+
+    async def connect(self):
+        """Establish connection to MongoDB."""
+        if self.client is not None:
+            return
+        async with self._connect_lock:
+            if self.client is not None:
+                return
+            client = AsyncMongoClient(**config.get_connection_params())
+            try:
+                # Test connection
+                await client.admin.command('ping')
+            except PyMongoError as e:
+                print(f"✗ Failed to connect to MongoDB: {e}")
+                await client.close()
+                raise
+            self.client = client
+            self.db = client[config.database_name]
+            print(f"✓ Connected to MongoDB (async): {config.database_name}")
+
+    async def disconnect(self):
+        """Close MongoDB connection."""
+        if self.client:
+            await self.client.close()
+            self.client = None
+            self.db = None
+            print("✓ Disconnected from MongoDB (async)")
+
+    async def _collect(self, cursor) -> Tuple[List[Any], bool]:
+        """Read a cursor until it ends or the byte budget is reached; returns (documents, truncated)."""
+        documents: List[Any] = []
+        size = 0
+        try:
+            async for document in cursor:
+                size, fits = self._add_within_budget(documents, size, document)
+                if not fits:
+                    return documents, True
+            return documents, False
+        finally:
+            await cursor.close()
+
+    async def find_documents(
+        self,
+        collection: str,
+        filter_json: str = "{}",
+        limit: int = 10,
+        skip: int = 0,
+        projection: Optional[str] = None
+    ) -> str:
+        """Find documents in a MongoDB collection."""
+        try:
+            await self.connect()
+            query_filter = self._parse_filter(filter_json)
+            cursor = self.db[collection].find(query_filter, self._parse_json(projection))
+            cursor = cursor.skip(skip).limit(limit).batch_size(config.result_batch_size)
+            return self._find_result(collection, await self._collect(cursor))
+        except Exception as e:
+            return self._error_result(e)
 
+    async def find_one_document(
+        self,
+        collection: str,
+        filter_json: str,
+        projection: Optional[str] = None
+    ) -> str:
+        """Find a single document in a MongoDB collection."""
+        try:
+            await self.connect()
             query_filter = self._parse_filter(filter_json)
-            count = coll.count_documents(query_filter)
+            document = await self.db[collection].find_one(query_filter, self._parse_json(projection))
+            return self._find_one_result(collection, document)
+        except Exception as e:
+            return self._error_result(e)
 
-            return self._serialize_result({
-                "success": True,
-                "collection": collection,
-                "count": count
-            })
+    async def insert_document(
+        self,
+        collection: str,
+        document_json: str
+    ) -> str:
+        """Insert a document into a MongoDB collection."""
+        try:
+            await self.connect()
+            result = await self.db[collection].insert_one(json.loads(document_json))
+            return self._insert_result(collection, result)
+        except Exception as e:
+            return self._error_result(e)
+
+    async def insert_many_documents(
+        self,
+        collection: str,
+        documents_json: str
+    ) -> str:
+        """Insert multiple documents into a MongoDB collection."""
+        try:
+            await self.connect()
+            documents = self._parse_array(documents_json, "documents_json")
+            return self._insert_many_result(collection, await self.db[collection].insert_many(documents))
+        except Exception as e:
+            return self._error_result(e)
+
+    async def update_documents(
+        self,
+        collection: str,
+        filter_json: str,
+        update_json: str,
+        upsert: bool = False,
+        update_many: bool = False
+    ) -> str:
+        """Update documents in a MongoDB collection."""
+        try:
+            await self.connect()
+            coll = self.db[collection]
+            update = coll.update_many if update_many else coll.update_one
+            result = await update(self._parse_filter(filter_json), json.loads(update_json), upsert=upsert)
+            return self._update_result(collection, result)
+        except Exception as e:
+            return self._error_result(e)
+
+    async def delete_documents(
+        self,
+        collection: str,
+        filter_json: str,
+        delete_many: bool = False
+    ) -> str:
+        """Delete documents from a MongoDB collection."""
+        try:
+            await self.connect()
+            coll = self.db[collection]
+            delete = coll.delete_many if delete_many else coll.delete_one
+            return self._delete_result(collection, await delete(self._parse_filter(filter_json)))
+        except Exception as e:
+            return self._error_result(e)
+
+    async def aggregate(
+        self,
+        collection: str,
+        pipeline_json: str
+    ) -> str:
+        """Run an aggregation pipeline on a MongoDB collection."""
+        try:
+            await self.connect()
+            pipeline = self._parse_array(pipeline_json, "pipeline_json")
+            cursor = await self.db[collection].aggregate(pipeline, batchSize=config.result_batch_size)
+            return self._aggregate_result(collection, await self._collect(cursor))
+        except Exception as e:
+            return self._error_result(e)
+
+    async def list_collections(self) -> str:
+        """List all collections in the database."""
+        try:
+            await self.connect()
+            return self._list_collections_result(await self.db.list_collection_names())
+        except Exception as e:
+            return self._error_result(e)
+
+    async def count_documents(
+        self,
+        collection: str,
+        filter_json: str = "{}"
+    ) -> str:
+        """Count documents in a collection matching a filter."""
+        try:
+            await self.connect()
+            count = await self.db[collection].count_documents(self._parse_filter(filter_json))
+            return self._count_result(collection, count)
         except Exception as e:
-            return self._serialize_result({
-                "success": False,
-                "error": str(e)
-            })
+            return self._error_result(e)
@@ -0,0 +1,146 @@
+import asyncio
+import time
+from typing import Dict, Optional
+import httpx
+import config
+
+
+class ModelResidencyManager:
+    """Keeps the default Ollama models loaded and shares model loads between requests.
+
+    Pinned models are loaded at startup and re-requested every `ping_interval` seconds
+    with `keep_alive`, so Ollama never unloads them while idle. Resident models are read
+    from Ollama's /api/ps. `ensure_loaded` lets concurrent requests for a model that is
+    not resident wait on one shared load instead of each triggering their own.
+    """
+
+    def __init__(self,
+                 base_url: str = config.OLLAMA_BASE_URL,
+                 keep_alive: str = config.MODEL_KEEP_ALIVE,
+                 ping_interval: float = config.MODEL_KEEPALIVE_INTERVAL,
+                 load_timeout: float = config.MODEL_LOAD_TIMEOUT,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        self.base_url = base_url
+        self.keep_alive = keep_alive
+        self.ping_interval = ping_interval
+        self.load_timeout = load_timeout
+        self.transport = transport
+        # model -> "chat" or "embedding"
+        self.pinned: Dict[str, str] = {}
+        # model -> entry of /api/ps
+        self.resident: Dict[str, dict] = {}
+        self.last_refresh: Optional[float] = None
+        self._kinds: Dict[str, str] = {}
+        self._loads: Dict[str, asyncio.Task] = {}
+        self._client: Optional[httpx.AsyncClient] = None
+        self._ping_task: Optional[asyncio.Task] = None
+        self._preloads: set = set()
+
+    def pin(self, model: str, kind: str = "chat") -> None:
+        """Keeps `model` loaded for as long as the manager runs."""
+        self.pinned[model] = kind
+        self._kinds[model] = kind
+
+    def _http(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url, timeout=self.load_timeout, transport=self.transport
+            )
+        return self._client
+
+    async def start(self) -> None:
+        """Starts loading the pinned models and the keep-alive loop, without waiting for them."""
+        for model, kind in self.pinned.items():
+            task = asyncio.create_task(self.ensure_loaded(model, kind))
+            self._preloads.add(task)
+            task.add_done_callback(self._preloads.discard)
+        self._ping_task = asyncio.create_task(self._ping_loop())
+
+    async def stop(self) -> None:
+        if self._ping_task:
+            self._ping_task.cancel()
+            await asyncio.gather(self._ping_task, return_exceptions=True)
+            self._ping_task = None
+        if self._client:
+            await self._client.aclose()
+            self._client = None
+
+    async def refresh(self) -> Dict[str, dict]:
+        """Reads the models currently loaded in Ollama."""
+        response = await self._http().get("/api/ps", timeout=10)
+        response.raise_for_status()
+        self.resident = {m.get("name") or m.get("model"): m for m in response.json().get("models", [])}
+        self.last_refresh = time.time()
+        return self.resident
+
+    async def _load(self, model: str, kind: str) -> None:
+        keep_alive = {"keep_alive": self.keep_alive} if model in self.pinned else {}
+        start = time.perf_counter()
+        if kind == "embedding":
+            # An embed request with no input only loads the model
+            response = await self._http().post("/api/embed", json={"model": model, "input": [], **keep_alive})
+        else:
+            # A generate request without prompt only loads the model
+            response = await self._http().post("/api/generate", json={"model": model, **keep_alive})
+        response.raise_for_status()
+        self.resident.setdefault(self._name(model), {"name": self._name(model)})
+        print(f"Model {model} loaded in {time.perf_counter() - start:.1f}s")
+
+    @staticmethod
+    def _name(model: str) -> str:
+        # Ollama reports untagged models with their implicit ":latest" tag
+        return model if ":" in model else f"{model}:latest"
+
+    def _shared_load(self, model: str, kind: Optional[str] = None) -> asyncio.Task:
+        """Returns the in-flight load of `model`, starting one if there is none."""
+        task = self._loads.get(model)
+        if task is None:
+            task = asyncio.create_task(self._load(model, kind or self._kinds.get(model, "chat")))
+            self._loads[model] = task
+            task.add_done_callback(lambda _: self._loads.pop(model, None))
+        return task
+
+    async def ensure_loaded(self, model: str, kind: Optional[str] = None) -> bool:
+        """Waits until `model` is loaded, sharing one load among concurrent callers.
+
+        Returns False if the load failed; the caller's own request will then surface the
+        Ollama error, so failures are only logged here.
+        """
+        if self._name(model) in self.resident:
+            return True
+        try:
+            # Shield the shared load so one cancelled request does not cancel it for the others
+            await asyncio.shield(self._shared_load(model, kind))
+            return True
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"Warning: could not load model {model}: {e}")
+            return False
+
+    async def _ping_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.ping_interval)
+            try:
+                await self.refresh()
+                # Re-sending the load request resets Ollama's keep-alive timer
+                await asyncio.gather(*(self._shared_load(model, kind) for model, kind in self.pinned.items()))
+            except Exception as e:
+                print(f"Warning: model keep-alive ping failed: {e}")
+
+    def snapshot(self) -> dict:
+        return {
+            "resident": [
+                {
+                    "name": name,
+                    "size": info.get("size"),
+                    "size_vram": info.get("size_vram"),
+                    "expires_at": info.get("expires_at"),
+                    "pinned": name in {self._name(m) for m in self.pinned},
+                }
+                for name, info in sorted(self.resident.items())
+            ],
+            "pinned": sorted(self.pinned),
+            "loading": sorted(self._loads),
+            "last_refresh": self.last_refresh,
+        }
@@ -1,16 +1,84 @@
+import asyncio
+import json
 import os
+import re
 import shutil
-from typing import List, Optional
-from langchain_ollama import ChatOllama, OllamaEmbeddings
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from langchain_ollama import OllamaEmbeddings
 from langchain_chroma import Chroma
-from langchain_community.document_loaders import TextLoader, DirectoryLoader, PyPDFLoader, UnstructuredMarkdownLoader
-from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnablePassthrough
+from langchain_core.runnables import Runnable
 from langchain_core.documents import Document
+from ingestion import EmbeddingPipeline, IngestionStats
+from embedding_cache import EmbeddingCache, CachedEmbeddings, text_hash
+from manifest import DirectoryCheckpoint, DocumentManifest, ManifestStore, file_hash, chunk_id, metadata_hash
+from source_index import SourceIndex
+from lru_cache import LRUCache
+from answer_cache import CachedAnswer, SemanticAnswerCache
+from llm_pool import ChatModelPool
+from model_residency import ModelResidencyManager
+from document_parsing import make_parse_pool, parse_file, is_streamable, iter_text_chunks
 import config
 
+# Progress callback used by ingestion: (stage, stats so far)
+ProgressCallback = Callable[[str, IngestionStats], None]
+# Receives the manifest and size in bytes of a synced source
+SourceRecorder = Callable[[DocumentManifest, int], None]
+
+
+def format_docs(docs: List[Document]) -> str:
+    return "\n\n".join(doc.page_content for doc in docs)
+
+
+class EmbeddingStore:
+    """Embeddings, Chroma collection and bookkeeping files for one embedding model."""
+
+    def __init__(self, embedding_model: str, ollama_base_url: str, persist_dir: str,
+                 embedding_cache: Optional[EmbeddingCache]):
+        self.embedding_model_name = embedding_model
+        self.embeddings = CachedEmbeddings(
+            OllamaEmbeddings(
+                model=embedding_model,
+                base_url=ollama_base_url,
+            ),
+            embedding_cache,
+            embedding_model,
+            query_cache=LRUCache(config.QUERY_EMBEDDING_CACHE_SIZE),
+        )
+
+        # Use a model-specific subdirectory to avoid dimension mismatch
+        self.persist_directory = os.path.join(persist_dir, embedding_model.replace(':', '_'))
+
+        self.vectorstore = Chroma(
+            persist_directory=self.persist_directory,
+            embedding_function=self.embeddings,
+        )
+        self.retriever = self.vectorstore.as_retriever(
+            search_type="similarity",
+            search_kwargs={"k": 3}
+        )
+        # Cleared whenever this model's collection changes
+        self.retrieval_cache = LRUCache(config.RETRIEVAL_CACHE_SIZE, ttl=config.RETRIEVAL_CACHE_TTL)
+        self.manifests = ManifestStore(os.path.join(self.persist_directory, "manifests.sqlite3"),
+                                       legacy_path=os.path.join(self.persist_directory, "manifests.json"))
+        self.source_index = SourceIndex(os.path.join(self.persist_directory, "source_index.sqlite3"))
+        if not self.source_index.exists:
+            # One-off scan for collections created before the index existed (or indexed in JSON)
+            self.source_index.rebuild(self.vectorstore)
+            legacy_index = os.path.join(self.persist_directory, "source_index.json")
+            if os.path.exists(legacy_index):
+                os.remove(legacy_index)
+
+    def close(self) -> None:
+        """Closes the manifest and source index databases (Chroma keeps its own client)."""
+        self.manifests.close()
+        self.source_index.close()
+
+
 class RAGService:
     """Service to handle RAG operations: ingestion, retrieval, and generation."""
 
@@ -18,158 +86,354 @@ class RAGService:
                  ollama_base_url: str = config.OLLAMA_BASE_URL,
                  model_name: str = config.DEFAULT_MODEL,
                  embedding_model: str = config.DEFAULT_EMBEDDING_MODEL,
-                 persist_dir: str = config.CHROMA_PERSIST_DIR):
+                 persist_dir: str = config.CHROMA_PERSIST_DIR,
+                 llm_pool: Optional[ChatModelPool] = None,
+                 prompt_template: str = config.RAG_PROMPT_TEMPLATE,
+                 residency: Optional[ModelResidencyManager] = None):
         
         self.ollama_base_url = ollama_base_url
         self.model_name = model_name
         self.persist_dir = persist_dir
         self.embedding_model_name = None # Force initial setup in _update_embedding_model
+        self._stores: Dict[str, EmbeddingStore] = {}
+        self._stores_lock = threading.Lock()
+        self._parse_pool: Optional[ProcessPoolExecutor] = None
+
+        # Persistent embedding cache shared by all embedding models
+        self.embedding_cache = None
+        if config.EMBEDDING_CACHE_ENABLED:
+            os.makedirs(persist_dir, exist_ok=True)
+            self.embedding_cache = EmbeddingCache(
+                config.EMBEDDING_CACHE_PATH or os.path.join(persist_dir, "embedding_cache.sqlite3"),
+                max_entries=config.EMBEDDING_CACHE_MAX_ENTRIES,
+            )
+
+        # Opt-in cache of RAG answers for paraphrased questions
+        self.answer_cache = None
+        if config.ANSWER_CACHE_ENABLED:
+            self.answer_cache = SemanticAnswerCache(
+                max_entries=config.ANSWER_CACHE_MAX_ENTRIES,
+                threshold=config.ANSWER_CACHE_THRESHOLD,
+                ttl=config.ANSWER_CACHE_TTL,
+            )
         
-        # Initialize LLM
-        self.llm = ChatOllama(
-            model=model_name,
-            base_url=ollama_base_url,
-            temperature=0.3, # Low temperature for factual RAG
-        )
+        # Initialize LLM (clients are shared with the API through the pool)
+        self.llm_pool = llm_pool or ChatModelPool(base_url=ollama_base_url)
+        self.residency = residency
+        self.llm = self.llm_pool.get(model_name, temperature=0.3) # Low temperature for factual RAG
+
+        # Prompt and chains are built once; chains are cached per (model, temperature)
+        self.prompt = ChatPromptTemplate.from_template(prompt_template)
+        missing = {"context", "question"} - set(self.prompt.input_variables)
+        if missing:
+            raise ValueError(f"RAG prompt template is missing variables: {sorted(missing)}")
+        self._chains = LRUCache(config.LLM_POOL_MAX_SIZE)
+        self._background_tasks = set()
 
         # Initialize embeddings, vectorstore, and retriever
         self._update_embedding_model(embedding_model)
 
-    def _update_embedding_model(self, embedding_model: Optional[str]):
-        """Updates the embedding model if it's different from the current one."""
+    def _get_store(self, embedding_model: str) -> EmbeddingStore:
+        """Returns the (cached) store for an embedding model, opening it on first use."""
+        with self._stores_lock:
+            store = self._stores.get(embedding_model)
+            if store is None:
+                store = EmbeddingStore(embedding_model, self.ollama_base_url, self.persist_dir, self.embedding_cache)
+                self._stores[embedding_model] = store
+            return store
+
+    def _update_embedding_model(self, embedding_model: Optional[str]) -> EmbeddingStore:
+        """Updates the embedding model if it's different from the current one.
+
+        Returns the store for the selected model; callers should use it rather than the
+        `self.*` shortcuts, which another request may switch concurrently.
+        """
         if not embedding_model or embedding_model == getattr(self, 'embedding_model_name', None):
-            return
+            return self._get_store(self.embedding_model_name)
 
         print(f"Switching embedding model to: {embedding_model}")
+        store = self._get_store(embedding_model)
         self.embedding_model_name = embedding_model
-        self.embeddings = OllamaEmbeddings(
-            model=embedding_model,
-            base_url=self.ollama_base_url,
-        )
-        
-        # Use a model-specific subdirectory to avoid dimension mismatch
-        model_persist_dir = os.path.join(self.persist_dir, embedding_model.replace(':', '_'))
-        
-        # Update vectorstore with new embedding function
-        self.vectorstore = Chroma(
-            persist_directory=model_persist_dir,
-            embedding_function=self.embeddings,
-        )
-        self.retriever = self.vectorstore.as_retriever(
-            search_type="similarity",
-            search_kwargs={"k": 3}
-        )
+        self.embeddings = store.embeddings
+        self.vectorstore = store.vectorstore
+        self.retriever = store.retriever
+        self.manifests = store.manifests
+        self.source_index = store.source_index
+        return store
 
-    def ingest_file(self, file_path: str, embedding_model: Optional[str] = None) -> int:
-        """Ingests a single file into the vector store."""
-        if embedding_model:
-            self._update_embedding_model(embedding_model)
+    def _select_store(self, embedding_model: Optional[str]) -> EmbeddingStore:
+        """Store for `embedding_model` (default: the current one), without switching the default.
+
+        Used by ingestion, which may run in background threads: changing the `self.*`
+        shortcuts there would switch the store of unrelated requests.
+        """
+        return self._get_store(embedding_model or self.embedding_model_name)
+
+    def _parse_executor(self) -> Optional[ProcessPoolExecutor]:
+        """Process pool for document parsing, so CPU-heavy loaders don't hold the API's GIL."""
+        if config.PARSE_WORKERS <= 0:
+            return None
+        if self._parse_pool is None:
+            self._parse_pool = make_parse_pool(config.PARSE_WORKERS)
+        return self._parse_pool
 
+    def ingest_file(self, file_path: str, embedding_model: Optional[str] = None,
+                    on_progress: Optional[ProgressCallback] = None) -> IngestionStats:
+        """Ingests a single file into the vector store and returns its counters."""
+        return self._ingest_file(file_path, self._select_store(embedding_model), on_progress)
+
+    def _ingest_file(self, file_path: str, store: EmbeddingStore,
+                     on_progress: Optional[ProgressCallback] = None,
+                     record: Optional[SourceRecorder] = None) -> IngestionStats:
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"File not found: {file_path}")
 
-        # Determine loader based on extension
-        ext = os.path.splitext(file_path)[1].lower()
-        if ext == ".pdf":
-            loader = PyPDFLoader(file_path)
-        elif ext == ".md":
-            try:
-                # Try to ensure resources are available if using Unstructured
-                import nltk
-                try:
-                    nltk.data.find('tokenizers/punkt_tab')
-                except LookupError:
-                    nltk.download('punkt_tab')
-                try:
-                    nltk.data.find('tokenizers/punkt')
-                except LookupError:
-                    nltk.download('punkt')
-                try:
-                    nltk.data.find('taggers/averaged_perceptron_tagger')
-                except LookupError:
-                    nltk.download('averaged_perceptron_tagger')
-
-                loader = UnstructuredMarkdownLoader(file_path)
-                documents = loader.load()
-            except Exception as e:
-                print(f"Warning: UnstructuredMarkdownLoader failed: {e}. Falling back to TextLoader.")
-                loader = TextLoader(file_path, encoding="utf-8", autodetect_encoding=True)
-                documents = loader.load()
-        elif ext == ".txt":
-            loader = TextLoader(file_path, encoding="utf-8")
+        # Skip the file entirely when its content has not changed since the last ingestion
+        content_hash = file_hash(file_path)
+        manifest = store.manifests.get(file_path)
+        if manifest and manifest.content_hash == content_hash:
+            print(f"Skipping {file_path}: unchanged since last ingestion")
+            stats = IngestionStats(total=len(manifest.chunk_ids), unchanged=len(manifest.chunk_ids))
+            if on_progress:
+                on_progress("skipped", stats)
+            return stats
+
+        if on_progress:
+            on_progress("parsing", IngestionStats())
+
+        if is_streamable(file_path):
+            # Large text-like files are split while reading and embedded batch by batch
+            chunks = iter_text_chunks(file_path)
         else:
-            # Fallback for code files or others, treat as text
-            loader = TextLoader(file_path, encoding="utf-8", autodetect_encoding=True)
-
-        documents = loader.load()
-        return self._process_documents(documents)
-
-    def ingest_directory(self, dir_path: str, glob_pattern: str = "**/*") -> int:
-        """Ingests all matching files in a directory."""
-        # Note: DirectoryLoader defaults to Unstructured for unknown types, 
-        # might want to be specific or use multiple loaders.
-        # For simplicity, we use TextLoader for now for text-based.
-        loader = DirectoryLoader(dir_path, glob=glob_pattern, loader_cls=TextLoader)
-        documents = loader.load()
-        return self._process_documents(documents)
-
-    def _process_documents(self, documents: List[Document]) -> int:
-        """Splits documents and adds them to the vector store."""
-        text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len,
+            chunks = parse_file(file_path, self._parse_executor())
+        return self._sync_source(file_path, chunks, store, on_progress, content_hash=content_hash, record=record)
+
+    def ingest_directory(self, dir_path: str, glob_pattern: str = "**/*",
+                         embedding_model: Optional[str] = None, resume: bool = True,
+                         concurrency: int = config.DIRECTORY_INGEST_CONCURRENCY) -> IngestionStats:
+        """Ingests all matching files in a directory, several files at a time.
+
+        The tree is walked lazily and every file goes through the same path as ingest_file
+        (loader by extension, parsing in the process pool, manifest diffing). Completed and
+        failed files are checkpointed, so after a crash a run with `resume=True` continues
+        where it stopped; a failing file is recorded and does not abort the run. Manifests
+        and source index entries are written in one transaction per checkpoint flush rather
+        than per file. Returns the counters summed over the files ingested by this run.
+        """
+        store = self._select_store(embedding_model)
+        updates: List[Tuple[DocumentManifest, int]] = []
+        updates_lock = threading.Lock()
+
+        def record(manifest: DocumentManifest, size: int) -> None:
+            with updates_lock:
+                updates.append((manifest, size))
+
+        def flush_updates() -> None:
+            with updates_lock:
+                batch = updates[:]
+                updates.clear()
+            self._save_sources(store, batch)
+
+        # Files are only checkpointed once their manifests are saved
+        checkpoint = DirectoryCheckpoint(
+            os.path.join(store.persist_directory, "checkpoints"), dir_path, glob_pattern, on_flush=flush_updates
         )
-        chunks = text_splitter.split_documents(documents)
-        
-        if not chunks:
-            return 0
-            
-        self.vectorstore.add_documents(chunks)
-        # Chroma handles persistence automatically in recent versions, but explicit persist calls
-        # were deprecated. LangChain's Chroma wrapper handles it.
-        
-        return len(chunks)
+        if not resume:
+            checkpoint.reset()
+
+        total = IngestionStats()
+        resumed = failed = 0
+
+        def ingest(path: str) -> IngestionStats:
+            stats = self._ingest_file(path, store, record=record)
+            checkpoint.mark_done(path)
+            return stats
+
+        def collect(done) -> None:
+            nonlocal failed
+            for future in done:
+                path = pending.pop(future)
+                try:
+                    total.add(future.result())
+                except Exception as e:
+                    print(f"Error ingesting {path}: {e}")
+                    checkpoint.mark_failed(path, str(e))
+                    failed += 1
+
+        files = (str(path) for path in Path(dir_path).glob(glob_pattern) if path.is_file())
+        pending: Dict[Future, str] = {}
+        with ThreadPoolExecutor(max_workers=max(1, concurrency)) as executor:
+            try:
+                for path in files:
+                    if checkpoint.is_done(path):
+                        resumed += 1
+                        continue
+                    # Bound the files in flight so huge trees are never listed up front
+                    if len(pending) >= max(1, concurrency):
+                        collect(wait(pending, return_when=FIRST_COMPLETED).done)
+                    pending[executor.submit(ingest, path)] = path
+                collect(wait(pending).done)
+            finally:
+                checkpoint.save()
+
+        print(f"Ingested directory {dir_path}: {total.chunks} chunks embedded, "
+              f"{resumed} files already checkpointed, {failed} failed")
+        return total
+
+    @staticmethod
+    def _save_sources(store: EmbeddingStore, updates: List[Tuple[DocumentManifest, int]]) -> None:
+        """Writes the manifests and source index entries of synced sources."""
+        if not updates:
+            return
+        store.manifests.put_many([manifest for manifest, _ in updates])
+        store.source_index.set_sources([(m.source, m.chunk_ids, size) for m, size in updates])
+
+    def _sync_source(self, source: str, chunks: Iterable[Document], store: EmbeddingStore,
+                     on_progress: Optional[ProgressCallback] = None,
+                     content_hash: Optional[str] = None,
+                     record: Optional[SourceRecorder] = None) -> IngestionStats:
+        """Syncs the chunks of one source with the vector store.
+
+        Chunk ids are derived from the source and chunk content, so only chunks missing
+        from the source's manifest are embedded and ids that vanished are deleted afterwards.
+        Known chunks whose metadata changed (e.g. a page inserted before them) only get
+        their metadata rewritten.
+        `chunks` is consumed lazily, so a streamed source is never held in memory at once.
+        The manifest is saved right away unless `record` collects it for a batched write.
+        """
+        previous = store.manifests.get(source)
+        known_ids = set(previous.chunk_ids) if previous else set()
+        known_metadata = dict(zip(previous.chunk_ids, previous.metadata_hashes)) if previous else {}
+        # Chunks ingested before manifests existed carry random ids; replace them all
+        old_ids = known_ids or set(store.source_index.source_ids(source))
+
+        if content_hash is None and os.path.isfile(source):
+            content_hash = file_hash(source)
+        manifest = DocumentManifest(source=source, content_hash=content_hash)
+        stats = IngestionStats(total=len(chunks) if isinstance(chunks, list) else 0)
+        size = 0
+        occurrences: Dict[str, int] = {}
+        pipeline = EmbeddingPipeline(
+            store.embeddings,
+            store.vectorstore,
+            batch_size=config.EMBEDDING_BATCH_SIZES.get(store.embedding_model_name, config.EMBEDDING_BATCH_SIZE),
+        )
+        relabelled: List[Document] = []
+
+        def flush_relabelled():
+            pipeline.update_metadata(relabelled)
+            if relabelled and self.answer_cache:
+                self.answer_cache.invalidate_chunks([chunk.id for chunk in relabelled])
+            stats.updated += len(relabelled)
+            relabelled.clear()
+
+        def new_chunks():
+            nonlocal size
+            for chunk in chunks:
+                h = text_hash(chunk.page_content)
+                chunk.id = chunk_id(source, h, occurrences.get(h, 0))
+                occurrences[h] = occurrences.get(h, 0) + 1
+                meta_hash = metadata_hash(chunk.metadata)
+                manifest.chunk_ids.append(chunk.id)
+                manifest.chunk_hashes.append(h)
+                manifest.metadata_hashes.append(meta_hash)
+                size += len(chunk.page_content.encode("utf-8"))
+                stats.total = max(stats.total, len(manifest.chunk_ids))
+                if chunk.id not in known_ids:
+                    yield chunk
+                    continue
+                stats.unchanged += 1
+                if known_metadata.get(chunk.id) != meta_hash:
+                    relabelled.append(chunk)
+                    if len(relabelled) >= pipeline.batch_size:
+                        flush_relabelled()
+
+        if on_progress:
+            on_progress("embedding", stats)
+        pipeline.run(new_chunks(), stats, on_batch=(lambda s: on_progress("embedding", s)) if on_progress else None)
+        flush_relabelled()
+        stats.total = len(manifest.chunk_ids)
+
+        # New ids never collide with deleted ones, so removing vanished chunks last is safe
+        to_delete = list(old_ids - set(manifest.chunk_ids))
+        if to_delete:
+            store.vectorstore.delete(ids=to_delete)
+            if self.answer_cache:
+                self.answer_cache.invalidate_chunks(to_delete)
+        stats.deleted = len(to_delete)
+
+        if record:
+            record(manifest, size)
+        else:
+            self._save_sources(store, [(manifest, size)])
+        if stats.chunks or stats.deleted or stats.updated:
+            store.retrieval_cache.clear()
+
+        print(f"Embedded {stats.chunks} chunks of {source} in {stats.batches} batches "
+              f"({stats.chunks_per_second:.1f} chunks/s, model={store.embedding_model_name}), "
+              f"{stats.unchanged} unchanged ({stats.updated} with new metadata), {stats.deleted} deleted")
+
+        return stats
 
     def clear_database(self, embedding_model: Optional[str] = None):
         """Clears the vector database. If embedding_model is provided, clears only that model's data."""
+        from chromadb.api.client import SharedSystemClient
+
+        current_model = self.embedding_model_name
         if embedding_model:
-            self._update_embedding_model(embedding_model)
-            if os.path.exists(self.vectorstore._persist_directory):
-                import shutil
-                shutil.rmtree(self.vectorstore._persist_directory)
-                # Force re-init after deletion
-                self.embedding_model_name = None
-                self._update_embedding_model(embedding_model)
+            store = self._update_embedding_model(embedding_model)
+            targets = [store.persist_directory]
         else:
-            # Clear everything
-            if os.path.exists(self.persist_dir):
-                import shutil
-                shutil.rmtree(self.persist_dir)
-                os.makedirs(self.persist_dir, exist_ok=True)
-                # Re-initialize current model
-                current_model = self.embedding_model_name
-                self.embedding_model_name = None
-                self._update_embedding_model(current_model)
+            # Clear everything (the embedding cache is content-addressed and stays valid)
+            cache_name = os.path.basename(self.embedding_cache.path) if self.embedding_cache else None
+            targets = [
+                os.path.join(self.persist_dir, entry)
+                for entry in (os.listdir(self.persist_dir) if os.path.exists(self.persist_dir) else [])
+                if not (cache_name and entry.startswith(cache_name))
+            ]
+
+        with self._stores_lock:
+            cleared = [existing for existing in self._stores.values() if embedding_model is None or existing is store]
+            for old_store in cleared:
+                old_store.close()
+            for path in targets:
+                if os.path.isdir(path):
+                    shutil.rmtree(path)
+                elif os.path.exists(path):
+                    os.remove(path)
+            # Chroma keeps one client per persist directory; drop them so stores reopen cleanly
+            SharedSystemClient.clear_system_cache()
+            self._stores.clear()
+            for old_store in cleared:
+                old_store.retrieval_cache.clear()
+            if self.answer_cache:
+                self.answer_cache.invalidate_model(embedding_model)
+
+        # Re-initialize current model
+        self.embedding_model_name = None
+        self._update_embedding_model(current_model)
+
+    def cache_stats(self) -> dict:
+        """Returns hit/miss counters for the RAG caches and the chat client pool."""
+        return {
+            "embedding_cache": self.embedding_cache.stats() if self.embedding_cache else None,
+            "query_embedding_cache": {
+                model: store.embeddings.query_cache.stats() for model, store in list(self._stores.items())
+            },
+            "retrieval_cache": {model: store.retrieval_cache.stats() for model, store in list(self._stores.items())},
+            "answer_cache": self.answer_cache.stats() if self.answer_cache else None,
+            "llm_pool": self.llm_pool.stats(),
+        }
 
     def list_documents(self, embedding_model: Optional[str] = None) -> List[str]:
         """Returns a list of unique document sources in the vector store."""
+        return [doc["name"] for doc in self.document_stats(embedding_model)]
+
+    def document_stats(self, embedding_model: Optional[str] = None) -> List[dict]:
+        """Returns name, chunk count and size in bytes of every document in the vector store."""
         try:
-            if embedding_model:
-                self._update_embedding_model(embedding_model)
-            
-            # Get all metadata from the collection
-            results = self.vectorstore.get()
-            if not results or 'metadatas' not in results:
-                return []
-            
-            # Extract unique 'source' values
-            sources = set()
-            for meta in results['metadatas']:
-                if meta and 'source' in meta:
-                    sources.add(os.path.basename(meta['source']))
-            
-            return sorted(list(sources))
+            store = self._update_embedding_model(embedding_model)
+            return store.source_index.documents()
         except Exception as e:
             print(f"Error listing documents: {e}")
             return []
@@ -177,21 +441,17 @@ class RAGService:
     def delete_document(self, filename: str, embedding_model: Optional[str] = None) -> bool:
         """Deletes all chunks associated with a specific filename."""
         try:
-            if embedding_model:
-                self._update_embedding_model(embedding_model)
+            store = self._update_embedding_model(embedding_model)
+
+            ids_to_delete = store.source_index.pop(filename)
+
+            store.manifests.remove_name(filename)
 
-            results = self.vectorstore.get()
-            if not results or 'metadatas' not in results:
-                return False
-            
-            ids_to_delete = []
-            for i, meta in enumerate(results['metadatas']):
-                if meta and 'source' in meta:
-                    if os.path.basename(meta['source']) == filename:
-                        ids_to_delete.append(results['ids'][i])
-            
             if ids_to_delete:
-                self.vectorstore.delete(ids=ids_to_delete)
+                store.vectorstore.delete(ids=ids_to_delete)
+                store.retrieval_cache.clear()
+                if self.answer_cache:
+                    self.answer_cache.invalidate_chunks(ids_to_delete)
                 print(f"Deleted {len(ids_to_delete)} chunks from {filename}")
                 return True
             
@@ -200,85 +460,175 @@ class RAGService:
             print(f"Error deleting document {filename}: {e}")
             return False
 
-    async def ask(self, question: str, model_name: Optional[str] = None, temperature: float = 0.3, embedding_model: Optional[str] = None) -> str:
-        """Asks a question using the RAG chain."""
-        if embedding_model:
-            self._update_embedding_model(embedding_model)
+    @staticmethod
+    def _retrieval_key(query: str, k: int, filters: Optional[dict]) -> tuple:
+        return (" ".join(query.split()), k, json.dumps(filters, sort_keys=True) if filters else None)
 
-        # Use provided model or fallback to default
-        target_model = model_name or self.model_name
-        
-        # Create a specific LLM instance for this request
-        llm = ChatOllama(
-            model=target_model,
-            base_url=self.ollama_base_url,
-            temperature=temperature,
+    def _retrieve(self, store: EmbeddingStore, query: str, k: int = 3,
+                  filters: Optional[dict] = None) -> List[Document]:
+        """Similarity search through the store's retrieval cache."""
+        key = self._retrieval_key(query, k, filters)
+        docs = store.retrieval_cache.get(key)
+        if docs is None:
+            generation = store.retrieval_cache.generation
+            docs = store.vectorstore.similarity_search(query, k=k, filter=filters)
+            store.retrieval_cache.put(key, docs, generation)
+        return list(docs)
+
+    async def _aretrieve(self, store: EmbeddingStore, query: str, k: int = 3,
+                         filters: Optional[dict] = None,
+                         timings: Optional[Dict[str, float]] = None) -> List[Document]:
+        """Async similarity search through the retrieval cache, recording embed/search times."""
+        key = self._retrieval_key(query, k, filters)
+        docs = store.retrieval_cache.get(key)
+        if timings is not None:
+            timings["retrieval_cache_hit"] = docs is not None
+        if docs is None:
+            generation = store.retrieval_cache.generation
+            start = time.perf_counter()
+            vector = await store.embeddings.aembed_query(query)
+            embedded = time.perf_counter()
+            docs = await asyncio.to_thread(store.vectorstore.similarity_search_by_vector, vector, k, filters)
+            if timings is not None:
+                timings["embed_ms"] = timings.get("embed_ms", 0.0) + (embedded - start) * 1000
+                timings["search_ms"] = (time.perf_counter() - embedded) * 1000
+            store.retrieval_cache.put(key, docs, generation)
+        return list(docs)
+
+    async def _lookup_answer(self, store: EmbeddingStore, question: str, model: str, temperature: float,
+                             timings: Dict[str, float]) -> Tuple[Optional[List[float]], Optional[CachedAnswer]]:
+        """Embeds the question and looks for a semantically equivalent cached answer."""
+        if self.answer_cache is None:
+            return None, None
+        # The query-embedding cache makes the retrieval that follows a miss reuse this vector
+        start = time.perf_counter()
+        vector = await store.embeddings.aembed_query(question)
+        timings["embed_ms"] = (time.perf_counter() - start) * 1000
+
+        def chunks_exist(ids: List[str]) -> bool:
+            return len(store.vectorstore.get(ids=ids, include=[])["ids"]) == len(set(ids))
+
+        cached = await asyncio.to_thread(
+            self.answer_cache.lookup, vector, store.embedding_model_name, model, temperature, chunks_exist
         )
+        timings["answer_cache_hit"] = cached is not None
+        if cached:
+            print(f"Answer cache hit for {question!r} (cached question: {cached.question!r})")
+        return vector, cached
 
-        template = """Usa el siguiente contexto para responder a la pregunta del usuario.
-Si la respuesta no se encuentra en el contexto, di que no tienes esa información. No inventes nada.
-Mantén la respuesta concisa y profesional.
+    def _store_answer(self, store: EmbeddingStore, question: str, vector: Optional[List[float]],
+                      docs: List[Document], model: str, temperature: float, answer: str) -> None:
+        if self.answer_cache is None or vector is None:
+            return
+        self.answer_cache.put(question, vector, [doc.id for doc in docs if doc.id],
+                              store.embedding_model_name, model, temperature, answer)
 
-Contexto:
-{context}
+    def _get_chain(self, model: str, temperature: float) -> Runnable:
+        """Returns the prompt | llm chain for a model, built once and reused."""
+        llm = self.llm_pool.get(model, temperature=temperature)
+        cached = self._chains.get((model, temperature))
+        # Rebuild if the pool has replaced the client since the chain was built
+        if cached is None or cached[0] is not llm:
+            cached = (llm, self.prompt | llm)
+            self._chains.put((model, temperature), cached)
+        return cached[1]
 
-Pregunta: {question}
-Respuesta:"""
-        
-        prompt = ChatPromptTemplate.from_template(template)
+    def _preload_llm(self, model: str, temperature: float) -> Optional[asyncio.Task]:
+        """Asks Ollama to load the chat model in the background while retrieval runs."""
+        if not config.RAG_PRELOAD_LLM:
+            return None
+        if self.residency is not None:
+            # Shares the load with any other request waiting for the same model
+            task = asyncio.create_task(self.residency.ensure_loaded(model))
+        else:
+            client = getattr(self.llm_pool.get(model, temperature=temperature), "_async_client", None)
+            if client is None:
+                return None
 
-        def format_docs(docs):
-            return "\n\n".join(doc.page_content for doc in docs)
+            async def preload():
+                try:
+                    # A generate request without prompt only loads the model
+                    await client.generate(model=model)
+                except Exception as e:
+                    print(f"Warning: could not preload {model}: {e}")
 
-        chain = (
-            {"context": self.retriever | format_docs, "question": RunnablePassthrough()}
-            | prompt
-            | llm
-            | StrOutputParser()
-        )
-        
-        return await chain.ainvoke(question)
+            task = asyncio.create_task(preload())
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+        return task
 
-    async def ask_stream(self, question: str, model_name: Optional[str] = None, temperature: float = 0.3, embedding_model: Optional[str] = None):
-        """Asks a question using the RAG chain and streams the response."""
-        if embedding_model:
-            self._update_embedding_model(embedding_model)
+    async def ask(self, question: str, model_name: Optional[str] = None, temperature: float = 0.3,
+                  embedding_model: Optional[str] = None, timings: Optional[Dict[str, float]] = None) -> str:
+        """Asks a question using the RAG chain."""
+        return "".join([chunk async for chunk in self.ask_stream(
+            question, model_name, temperature, embedding_model, timings=timings
+        )])
+
+    async def ask_stream(self, question: str, model_name: Optional[str] = None, temperature: float = 0.3,
+                         embedding_model: Optional[str] = None, timings: Optional[Dict[str, float]] = None):
+        """Asks a question using the RAG chain and streams the response.
+
+        Per-stage timings in milliseconds (embed, search, prompt, ttft, generate, total) and
+        tokens_per_second are written into `timings` when a dict is given.
+        """
+        timings = {} if timings is None else timings
+        started = time.perf_counter()
+        store = self._update_embedding_model(embedding_model)
 
         # Use provided model or fallback to default
         target_model = model_name or self.model_name
-        
-        # Create a specific LLM instance for this request
-        llm = ChatOllama(
-            model=target_model,
-            base_url=self.ollama_base_url,
-            temperature=temperature,
-        )
+        # Load the chat model into Ollama while the question is embedded and searched
+        preload = self._preload_llm(target_model, temperature)
 
-        template = """Usa el siguiente contexto para responder a la pregunta del usuario.
-Si la respuesta no se encuentra en el contexto, di que no tienes esa información. No inventes nada.
-Mantén la respuesta concisa y profesional.
+        vector, cached = await self._lookup_answer(store, question, target_model, temperature, timings)
+        if cached:
+            if preload:
+                preload.cancel()
+            timings["total_ms"] = (time.perf_counter() - started) * 1000
+            # Replay word by word so clients render it like a live answer
+            for piece in re.findall(r"\s*\S+\s*", cached.answer) or [cached.answer]:
+                yield piece
+            return
 
-Contexto:
-{context}
+        docs = await self._aretrieve(store, question, timings=timings)
 
-Pregunta: {question}
-Respuesta:"""
-        
-        prompt = ChatPromptTemplate.from_template(template)
+        prompt_start = time.perf_counter()
+        inputs = {"context": format_docs(docs), "question": question}
+        chain = self._get_chain(target_model, temperature)
+        generation_start = time.perf_counter()
+        timings["prompt_ms"] = (generation_start - prompt_start) * 1000
 
-        def format_docs(docs):
-            return "\n\n".join(doc.page_content for doc in docs)
+        parts = []
+        tokens = 0
+        last = None
+        async for chunk in chain.astream(inputs):
+            if not parts:
+                timings["ttft_ms"] = (time.perf_counter() - generation_start) * 1000
+            tokens += 1
+            last = chunk
+            parts.append(chunk.content)
+            yield chunk.content
 
-        chain = (
-            {"context": self.retriever | format_docs, "question": RunnablePassthrough()}
-            | prompt
-            | llm
-            | StrOutputParser()
-        )
-        
-        async for chunk in chain.astream(question):
-            yield chunk
+        now = time.perf_counter()
+        timings["generate_ms"] = (now - generation_start) * 1000
+        timings["total_ms"] = (now - started) * 1000
+        timings["tokens_per_second"] = self._tokens_per_second(last, tokens, now - generation_start)
+        print("RAG timings: " + ", ".join(
+            f"{name}={value:.1f}" for name, value in timings.items() if not isinstance(value, bool)
+        ))
+        # Only complete answers are cached; a disconnected client never gets here
+        self._store_answer(store, question, vector, docs, target_model, temperature, "".join(parts))
+
+    @staticmethod
+    def _tokens_per_second(last_chunk, chunks: int, seconds: float) -> float:
+        """Generation speed from Ollama's eval counters, or from streamed chunks if absent."""
+        metadata = getattr(last_chunk, "response_metadata", None) or {}
+        if metadata.get("eval_count") and metadata.get("eval_duration"):
+            return metadata["eval_count"] / (metadata["eval_duration"] / 1e9)
+        usage = getattr(last_chunk, "usage_metadata", None) or {}
+        tokens = usage.get("output_tokens") or chunks
+        return tokens / seconds if seconds > 0 else 0.0
 
     def get_related_docs(self, query: str, k: int = 3) -> List[Document]:
         """Returns documents similar to the query."""
-        return self.vectorstore.similarity_search(query, k=k)
+        return self._retrieve(self._update_embedding_model(None), query, k)
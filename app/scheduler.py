@@ -0,0 +1,146 @@
+import asyncio
+import heapq
+import itertools
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, List, Optional
+import config
+
+# Lower value = served first
+PRIORITIES = {"stream": 0, "chat": 1, "analyze": 2}
+
+
+class AdmissionRejected(Exception):
+    """A request that could not be admitted; `status_code` is the HTTP status to return."""
+    status_code = 503
+
+    def __init__(self, message: str, retry_after: int = 5):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class QueueFull(AdmissionRejected):
+    status_code = 429
+
+
+class QueueTimeout(AdmissionRejected):
+    status_code = 503
+
+
+@dataclass
+class _WaitStats:
+    admitted: int = 0
+    rejected: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(self.total_wait / self.admitted * 1000, 1) if self.admitted else 0.0,
+            "max_wait_ms": round(self.max_wait * 1000, 1),
+        }
+
+
+@dataclass
+class _ModelQueue:
+    active: int = 0
+    # (priority, sequence, kind, future)
+    waiters: List[tuple] = field(default_factory=list)
+
+
+class GenerationScheduler:
+    """Admission control for Ollama: per-model concurrency caps and a priority queue.
+
+    At most `max_concurrent` generations run per model; further requests wait in a
+    queue ordered by PRIORITIES (interactive streams first, batch analysis last). A request
+    is rejected with QueueFull when `max_queue` requests are already waiting for the
+    model, and with QueueTimeout when it waits longer than its kind's deadline
+    (0 = wait indefinitely).
+    """
+
+    def __init__(self,
+                 max_concurrent: int = config.SCHEDULER_MAX_CONCURRENT_PER_MODEL,
+                 max_queue: int = config.SCHEDULER_MAX_QUEUE,
+                 deadlines: Optional[Dict[str, float]] = None):
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_queue = max_queue
+        self.deadlines = deadlines if deadlines is not None else dict(config.SCHEDULER_DEADLINES)
+        self._models: Dict[str, _ModelQueue] = {}
+        self._sequence = itertools.count()
+        self._stats: Dict[str, _WaitStats] = {kind: _WaitStats() for kind in PRIORITIES}
+
+    async def acquire(self, model: str, kind: str) -> None:
+        queue = self._models.setdefault(model, _ModelQueue())
+        stats = self._stats.setdefault(kind, _WaitStats())
+        if queue.active < self.max_concurrent and not queue.waiters:
+            queue.active += 1
+            stats.admitted += 1
+            return
+
+        if len(queue.waiters) >= self.max_queue:
+            stats.rejected += 1
+            raise QueueFull(f"Too many requests waiting for {model}")
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (PRIORITIES.get(kind, len(PRIORITIES)), next(self._sequence), kind, future)
+        heapq.heappush(queue.waiters, entry)
+        start = time.monotonic()
+        deadline = self.deadlines.get(kind) or None
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=deadline)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                # Admitted just as we gave up: hand the slot on
+                self.release(model)
+            else:
+                future.cancel()
+                queue.waiters.remove(entry)
+                heapq.heapify(queue.waiters)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            stats.rejected += 1
+            raise QueueTimeout(f"Timed out after {deadline:.0f}s waiting for {model}")
+
+        waited = time.monotonic() - start
+        stats.admitted += 1
+        stats.total_wait += waited
+        stats.max_wait = max(stats.max_wait, waited)
+
+    def release(self, model: str) -> None:
+        queue = self._models[model]
+        while queue.waiters:
+            _, _, _, future = heapq.heappop(queue.waiters)
+            if not future.done():
+                # The slot passes directly to the next waiter
+                future.set_result(None)
+                return
+        queue.active -= 1
+
+    @asynccontextmanager
+    async def slot(self, model: str, kind: str) -> AsyncIterator[None]:
+        """Holds one generation slot for `model` while the block runs."""
+        await self.acquire(model, kind)
+        try:
+            yield
+        finally:
+            self.release(model)
+
+    def stats(self) -> dict:
+        return {
+            "max_concurrent_per_model": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "models": {
+                model: {
+                    "active": queue.active,
+                    "queued": len(queue.waiters),
+                    "queued_by_kind": {
+                        kind: sum(1 for w in queue.waiters if w[2] == kind) for kind in PRIORITIES
+                    },
+                }
+                for model, queue in self._models.items()
+            },
+            "kinds": {kind: stats.to_dict() for kind, stats in self._stats.items()},
+        }
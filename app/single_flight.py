@@ -0,0 +1,171 @@
+import asyncio
+import hashlib
+import itertools
+import json
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+# Producer of a streamed generation; may fill the headers before its first chunk
+StreamProducer = Callable[[Dict[str, str]], AsyncIterator[Any]]
+
+
+class StreamFlight:
+    """One in-flight streamed generation, fanned out to every attached consumer.
+
+    Chunks are kept until the generation ends, so a consumer that attaches late first
+    receives what was already produced. The generation is cancelled once every consumer
+    has gone away.
+    """
+
+    def __init__(self, producer: StreamProducer, grace: float = 5.0):
+        self.chunks: List[Any] = []
+        self.headers: Dict[str, str] = {}
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.abandoned = False
+        self.subscribers = 0
+        self.grace = grace
+        # Consumers counted at hand-out whose stream has not started yet
+        self._pending: Set[int] = set()
+        self._tickets = itertools.count()
+        self._changed = asyncio.Condition()
+        self.task = asyncio.create_task(self._drive(producer))
+
+    async def _notify(self) -> None:
+        async with self._changed:
+            self._changed.notify_all()
+
+    async def _drive(self, producer: StreamProducer) -> None:
+        try:
+            async for chunk in producer(self.headers):
+                self.chunks.append(chunk)
+                await self._notify()
+        except Exception as e:
+            # Surfaced to consumers that wait for the first chunk
+            self.error = e
+        finally:
+            self.done = True
+            await asyncio.shield(self._notify())
+
+    async def wait_started(self) -> None:
+        """Waits for the first chunk (or the end), after which `headers` are final.
+
+        Re-raises the producer's error if it failed before producing anything.
+        """
+        async with self._changed:
+            await self._changed.wait_for(lambda: self.chunks or self.done)
+        if self.error is not None and not self.chunks:
+            raise self.error
+
+    def attach(self) -> int:
+        """Counts a new consumer and returns its ticket for subscribe/release."""
+        ticket = next(self._tickets)
+        self._pending.add(ticket)
+        self.subscribers += 1
+        return ticket
+
+    def release(self, ticket: int) -> None:
+        """Drops a consumer whose stream never started (no-op once it has)."""
+        if ticket in self._pending:
+            self._pending.discard(ticket)
+            self._leave()
+
+    def _leave(self) -> None:
+        self.subscribers -= 1
+        if self.subscribers == 0 and not self.done:
+            self.abandoned = True
+            self.task.cancel()
+
+    def subscribe(self, ticket: int) -> AsyncIterator[Any]:
+        """Returns the chunks for an attached consumer, from the first one on.
+
+        If the stream is not iterated within `grace` seconds (the client went away
+        before the response started), the consumer is released as if it had left.
+        """
+        asyncio.get_running_loop().call_later(self.grace, self.release, ticket)
+        return self._follow(ticket)
+
+    async def _follow(self, ticket: int) -> AsyncIterator[Any]:
+        if ticket in self._pending:
+            self._pending.discard(ticket)
+        else:
+            # Released by the grace period but still iterated: count it again
+            self.subscribers += 1
+        sent = 0
+        try:
+            while True:
+                async with self._changed:
+                    await self._changed.wait_for(lambda: len(self.chunks) > sent or self.done)
+                while sent < len(self.chunks):
+                    yield self.chunks[sent]
+                    sent += 1
+                if self.done and sent >= len(self.chunks):
+                    return
+        finally:
+            self._leave()
+
+
+class SingleFlight:
+    """Coalesces identical concurrent requests into one execution.
+
+    Requests are identified by a hash of their payload; while one is running, identical
+    requests attach to it instead of starting another generation.
+    """
+
+    def __init__(self, enabled: bool = True, grace: float = 5.0):
+        self.enabled = enabled
+        self.grace = grace
+        self.started = 0
+        self.coalesced = 0
+        self._calls: Dict[str, asyncio.Task] = {}
+        self._streams: Dict[str, StreamFlight] = {}
+
+    @staticmethod
+    def key(kind: str, payload: Dict[str, Any]) -> str:
+        data = json.dumps({"kind": kind, **payload}, sort_keys=True, ensure_ascii=False, default=str)
+        return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+    async def run(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Awaits the in-flight call for `key`, starting `factory()` if there is none."""
+        if not self.enabled:
+            return await factory()
+        task = self._calls.get(key)
+        if task is None:
+            self.started += 1
+            task = asyncio.create_task(factory())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        else:
+            self.coalesced += 1
+        # One caller giving up must not cancel the call for the others
+        return await asyncio.shield(task)
+
+    def stream(self, key: str, producer: StreamProducer) -> Tuple[StreamFlight, int]:
+        """Returns the in-flight stream for `key` (starting `producer` if there is none)
+        and the ticket of the consumer attached to it.
+
+        The consumer counts from here on: it must either iterate `subscribe(ticket)` or
+        be released with `release(ticket)`, otherwise the generation is kept alive for it.
+        """
+        flight = self._streams.get(key) if self.enabled else None
+        if flight is None or flight.done or flight.abandoned:
+            self.started += 1
+            flight = StreamFlight(producer, grace=self.grace)
+            if self.enabled:
+                self._streams[key] = flight
+                flight.task.add_done_callback(lambda _: self._forget(key, flight))
+        else:
+            self.coalesced += 1
+        return flight, flight.attach()
+
+    def _forget(self, key: str, flight: StreamFlight) -> None:
+        if self._streams.get(key) is flight:
+            del self._streams[key]
+
+    def stats(self) -> dict:
+        total = self.started + self.coalesced
+        return {
+            "in_flight": len(self._calls) + len(self._streams),
+            "started": self.started,
+            "coalesced": self.coalesced,
+            "coalesced_rate": round(self.coalesced / total, 4) if total else 0.0,
+        }
@@ -0,0 +1,113 @@
+import os
+import sqlite3
+import threading
+from typing import List, Tuple
+from langchain_chroma import Chroma
+
+
+class SourceIndex:
+    """Maps document basenames to their chunk ids and sizes for one Chroma collection.
+
+    Lets listing and deleting documents touch only the chunks of that document instead
+    of materialising the whole collection. Entries live in SQLite, one row per source
+    path plus one row per chunk id, so updating or deleting a document costs in
+    proportion to that document; the API addresses documents by basename.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            """CREATE TABLE IF NOT EXISTS sources (
+                   source TEXT PRIMARY KEY,
+                   name TEXT NOT NULL,
+                   chunks INTEGER NOT NULL,
+                   bytes INTEGER NOT NULL
+               );
+               CREATE INDEX IF NOT EXISTS idx_sources_name ON sources (name);
+               CREATE TABLE IF NOT EXISTS chunks (source TEXT NOT NULL, id TEXT NOT NULL);
+               CREATE INDEX IF NOT EXISTS idx_chunks_source ON chunks (source);
+               CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);"""
+        )
+        # Only set once the index covers the whole collection (see rebuild)
+        self.exists = self._conn.execute("SELECT 1 FROM meta WHERE key = 'built'").fetchone() is not None
+
+    def rebuild(self, vectorstore: Chroma, page_size: int = 1000) -> None:
+        """Builds the index from an existing collection, one page at a time."""
+        with self._lock:
+            self._conn.execute("DELETE FROM sources")
+            self._conn.execute("DELETE FROM chunks")
+            offset = 0
+            while True:
+                page = vectorstore.get(limit=page_size, offset=offset, include=["metadatas", "documents"])
+                if not page["ids"]:
+                    break
+                rows = [
+                    (meta["source"], chunk_id, len((text or "").encode("utf-8")))
+                    for chunk_id, meta, text in zip(page["ids"], page["metadatas"], page["documents"])
+                    if (meta or {}).get("source")
+                ]
+                self._conn.executemany(
+                    "INSERT INTO sources (source, name, chunks, bytes) VALUES (?, ?, 1, ?) "
+                    "ON CONFLICT (source) DO UPDATE SET chunks = chunks + 1, bytes = bytes + excluded.bytes",
+                    [(source, os.path.basename(source), size) for source, _, size in rows],
+                )
+                self._conn.executemany("INSERT INTO chunks (source, id) VALUES (?, ?)",
+                                       [(source, chunk_id) for source, chunk_id, _ in rows])
+                offset += len(page["ids"])
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('built', '1')")
+            self._conn.commit()
+            self.exists = True
+
+    def set_source(self, source: str, ids: List[str], size: int) -> None:
+        """Records the full set of chunks currently stored for `source`."""
+        self.set_sources([(source, ids, size)])
+
+    def set_sources(self, entries: List[Tuple[str, List[str], int]]) -> None:
+        """set_source for several (source, ids, size) entries in one transaction."""
+        with self._lock:
+            for source, ids, size in entries:
+                self._conn.execute("DELETE FROM chunks WHERE source = ?", (source,))
+                if ids:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO sources (source, name, chunks, bytes) VALUES (?, ?, ?, ?)",
+                        (source, os.path.basename(source), len(ids), size),
+                    )
+                    self._conn.executemany("INSERT INTO chunks (source, id) VALUES (?, ?)",
+                                           [(source, chunk_id) for chunk_id in ids])
+                else:
+                    self._conn.execute("DELETE FROM sources WHERE source = ?", (source,))
+            self._conn.commit()
+
+    def source_ids(self, source: str) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT id FROM chunks WHERE source = ? ORDER BY rowid", (source,))
+            return [chunk_id for (chunk_id,) in rows]
+
+    def pop(self, name: str) -> List[str]:
+        """Removes a document by basename and returns the chunk ids it had."""
+        with self._lock:
+            sources = [source for (source,) in self._conn.execute("SELECT source FROM sources WHERE name = ?", (name,))]
+            ids = []
+            for source in sources:
+                ids.extend(chunk_id for (chunk_id,) in self._conn.execute(
+                    "SELECT id FROM chunks WHERE source = ? ORDER BY rowid", (source,)))
+                self._conn.execute("DELETE FROM chunks WHERE source = ?", (source,))
+            if sources:
+                self._conn.execute("DELETE FROM sources WHERE name = ?", (name,))
+                self._conn.commit()
+            return ids
+
+    def documents(self) -> List[dict]:
+        """Returns name, chunk count and bytes for every indexed document, sorted by name."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT name, SUM(chunks), SUM(bytes) FROM sources GROUP BY name ORDER BY name"
+            ).fetchall()
+        return [{"name": name, "chunks": chunks, "bytes": size} for name, chunks, size in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
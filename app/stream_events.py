@@ -0,0 +1,115 @@
+import asyncio
+import json
+from typing import Any, AsyncIterator, Dict, Optional
+import config
+
+# Event types of /chat/stream: token, tool_start, tool_end, usage, error, done, heartbeat
+MEDIA_TYPES = {
+    "text": "text/plain",
+    "sse": "text/event-stream",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def event(type: str, **fields: Any) -> Dict[str, Any]:
+    return {"type": type, **fields}
+
+
+def encode_sse(item: Dict[str, Any]) -> str:
+    data = json.dumps({k: v for k, v in item.items() if k != "type"}, ensure_ascii=False, default=str)
+    return f"event: {item['type']}\ndata: {data}\n\n"
+
+
+def encode_ndjson(item: Dict[str, Any]) -> str:
+    return json.dumps(item, ensure_ascii=False, default=str) + "\n"
+
+
+def encode_text(item: Dict[str, Any]) -> str:
+    """Legacy plain-text rendering: tokens, inline tool notices and errors only."""
+    if item["type"] == "token":
+        return item["content"]
+    if item["type"] == "tool_start":
+        return f"[Utilizando herramienta: {item['name']}]...\n"
+    if item["type"] == "error":
+        return f"\n\nError: {item['message']}"
+    return ""
+
+
+ENCODERS = {"text": encode_text, "sse": encode_sse, "ndjson": encode_ndjson}
+
+
+async def coalesce(events: AsyncIterator[Dict[str, Any]],
+                   max_chars: int = config.STREAM_COALESCE_CHARS,
+                   max_delay: float = config.STREAM_COALESCE_MS / 1000,
+                   heartbeat: float = config.STREAM_HEARTBEAT_SECONDS) -> AsyncIterator[Dict[str, Any]]:
+    """Merges consecutive token events into frames and adds heartbeats to idle streams.
+
+    Buffered tokens are flushed once they reach `max_chars` characters, once the oldest
+    has waited `max_delay` seconds, or before any other event. A heartbeat event is
+    emitted after `heartbeat` seconds without output (0 disables heartbeats).
+    """
+    loop = asyncio.get_running_loop()
+    iterator = events.__aiter__()
+    pending: Optional[asyncio.Future] = None
+    buffer = []
+    buffered_at = 0.0
+    last_sent = loop.time()
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(iterator.__anext__())
+            now = loop.time()
+            timeouts = []
+            if buffer:
+                timeouts.append(buffered_at + max_delay - now)
+            if heartbeat:
+                timeouts.append(last_sent + heartbeat - now)
+            done, _ = await asyncio.wait({pending}, timeout=max(0.0, min(timeouts)) if timeouts else None)
+
+            if not done:
+                if buffer and loop.time() - buffered_at >= max_delay:
+                    yield event("token", content="".join(buffer))
+                    buffer = []
+                elif heartbeat and loop.time() - last_sent >= heartbeat:
+                    yield event("heartbeat")
+                last_sent = loop.time()
+                continue
+
+            try:
+                item = pending.result()
+            except StopAsyncIteration:
+                break
+            finally:
+                pending = None
+
+            if item["type"] == "token":
+                if not buffer:
+                    buffered_at = loop.time()
+                buffer.append(item["content"])
+                if sum(len(part) for part in buffer) < max_chars:
+                    continue
+                yield event("token", content="".join(buffer))
+                buffer = []
+            else:
+                if buffer:
+                    yield event("token", content="".join(buffer))
+                    buffer = []
+                yield item
+            last_sent = loop.time()
+
+        if buffer:
+            yield event("token", content="".join(buffer))
+    finally:
+        if pending is not None:
+            pending.cancel()
+
+
+async def render(events: AsyncIterator[Dict[str, Any]], format: str = "text") -> AsyncIterator[str]:
+    """Encodes a stream of events in `format` (text, sse or ndjson), coalescing tokens."""
+    encode = ENCODERS[format]
+    # Plain text has no way to carry a heartbeat
+    heartbeat = 0 if format == "text" else config.STREAM_HEARTBEAT_SECONDS
+    async for item in coalesce(events, heartbeat=heartbeat):
+        frame = encode(item)
+        if frame:
+            yield frame
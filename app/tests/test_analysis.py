@@ -0,0 +1,74 @@
+"""
+Tests de las tareas de /analyze con salida estructurada
+"""
+import sys
+import os
+import pytest
+
+# Añadir el directorio app al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from analysis import Analyzer, AnalysisParseError
+from scheduler import GenerationScheduler
+
+
+class FakePool:
+    """Pool que devuelve siempre el mismo modelo falso y registra los parámetros."""
+
+    def __init__(self, responses):
+        self.llm = FakeListChatModel(responses=responses)
+        self.calls = []
+
+    def get(self, model, base_url=None, **params):
+        self.calls.append(params)
+        return self.llm
+
+
+@pytest.mark.asyncio
+async def test_structured_task_uses_json_mode_and_validates():
+    """El sentimiento se pide en modo JSON y se devuelve como dict validado."""
+    pool = FakePool(['{"sentimiento": "positivo", "confianza": 0.9}'])
+    analyzer = Analyzer(pool, GenerationScheduler(max_concurrent=1))
+
+    result, cached = await analyzer.analyze("sentiment", "Me encanta", "llama3.2")
+
+    assert result == {"sentimiento": "positivo", "confianza": 0.9}
+    assert not cached
+    assert pool.calls == [{"temperature": 0.1, "format": "json"}]
+
+
+@pytest.mark.asyncio
+async def test_retries_only_on_invalid_output():
+    """Una salida que no cumple el esquema provoca un único reintento."""
+    pool = FakePool(['{"keywords": "no es lista"}', '{"keywords": ["a", "b"]}'])
+    analyzer = Analyzer(pool, retries=1)
+
+    result, _ = await analyzer.analyze("extract_keywords", "texto", "llama3.2")
+
+    assert result == {"keywords": ["a", "b"]}
+    assert len(pool.calls) == 2
+    assert analyzer.stats()["parse_failures"] == 1
+
+
+@pytest.mark.asyncio
+async def test_gives_up_after_retries():
+    """Si todas las respuestas son inválidas se lanza AnalysisParseError y no se cachea."""
+    pool = FakePool(["no es json", '{"sentimiento": "feliz", "confianza": 2}'])
+    analyzer = Analyzer(pool, retries=1)
+
+    with pytest.raises(AnalysisParseError):
+        await analyzer.analyze("sentiment", "texto", "llama3.2")
+    assert len(analyzer.cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_results_are_cached_by_task_model_and_text():
+    """La misma tarea, modelo y texto se sirven de caché; otro modelo vuelve a generar."""
+    pool = FakePool(["Resumen uno", "Resumen dos"])
+    analyzer = Analyzer(pool)
+
+    assert await analyzer.analyze("summarize", "texto largo", "llama3.2") == ("Resumen uno", False)
+    assert await analyzer.analyze("summarize", "texto largo", "llama3.2") == ("Resumen uno", True)
+    assert await analyzer.analyze("summarize", "texto largo", "qwen3:14b") == ("Resumen dos", False)
+    assert pool.calls == [{"temperature": 0.1}, {"temperature": 0.1}]
@@ -0,0 +1,71 @@
+"""
+Tests de la caché semántica de respuestas RAG
+"""
+import pytest
+import sys
+import os
+
+# Añadir el directorio app al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+import config
+from answer_cache import SemanticAnswerCache
+from rag_service import RAGService
+
+
+def test_lookup_requires_similarity_and_same_model():
+    """Solo se reutilizan respuestas de preguntas parecidas con el mismo modelo y temperatura."""
+    cache = SemanticAnswerCache(threshold=0.9)
+    cache.put("¿horario?", [1.0, 0.0], ["c1"], "embed", "llm", 0.3, "De 9 a 17")
+    always = lambda ids: True
+
+    assert cache.lookup([0.99, 0.05], "embed", "llm", 0.31, always).answer == "De 9 a 17"
+    assert cache.lookup([0.0, 1.0], "embed", "llm", 0.3, always) is None
+    assert cache.lookup([1.0, 0.0], "embed", "otro", 0.3, always) is None
+    assert cache.lookup([1.0, 0.0], "embed", "llm", 0.8, always) is None
+    assert cache.stats()["hits"] == 1
+
+
+def test_entries_with_missing_chunks_are_dropped():
+    """Una respuesta cuyos chunks ya no existen se descarta."""
+    cache = SemanticAnswerCache(threshold=0.9)
+    cache.put("a", [1.0, 0.0], ["c1", "c2"], "embed", "llm", 0.3, "respuesta")
+
+    assert cache.lookup([1.0, 0.0], "embed", "llm", 0.3, lambda ids: False) is None
+    assert cache.stats()["entries"] == 0
+
+    cache.put("a", [1.0, 0.0], ["c1", "c2"], "embed", "llm", 0.3, "respuesta")
+    assert cache.invalidate_chunks(["c2"]) == 1
+    assert cache.stats()["entries"] == 0
+
+
+@pytest.fixture
+def rag(tmp_path, monkeypatch):
+    """RAGService con caché de respuestas activada y embeddings falsos."""
+    monkeypatch.setattr(config, "ANSWER_CACHE_ENABLED", True)
+    monkeypatch.setattr(config, "PARSE_WORKERS", 0)
+    service = RAGService(persist_dir=str(tmp_path / "chroma"), embedding_model="fake-embed")
+    service.embeddings.embeddings = DeterministicFakeEmbedding(size=8)
+    return service
+
+
+@pytest.mark.asyncio
+async def test_cached_answer_is_replayed_and_invalidated(rag, tmp_path):
+    """ask_stream reproduce la respuesta cacheada hasta que se borra el documento."""
+    doc = tmp_path / "faq.txt"
+    doc.write_text("El horario es de 9 a 17. " * 100, encoding="utf-8")
+    rag.ingest_file(str(doc))
+    store = rag._get_store("fake-embed")
+    question = "¿Cuál es el horario?"
+    docs = await rag._aretrieve(store, question)
+    vector = store.embeddings.embed_query(question)
+    rag._store_answer(store, question, vector, docs, "qwen3:14b", 0.3, "De 9 a 17 horas.")
+
+    parts = [p async for p in rag.ask_stream(question, model_name="qwen3:14b", temperature=0.3)]
+    assert parts == ["De ", "9 ", "a ", "17 ", "horas."]
+    assert await rag.ask(question, model_name="qwen3:14b", temperature=0.3) == "De 9 a 17 horas."
+
+    rag.delete_document("faq.txt")
+    assert rag.cache_stats()["answer_cache"]["entries"] == 0
+    assert rag.cache_stats()["answer_cache"]["hits"] == 2
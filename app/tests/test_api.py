@@ -134,5 +134,123 @@ def test_multiple_messages():
     assert request.messages[-1].role == "user"
 
 
+def test_rag_chat_stream_sends_stage_timings(client):
+    """/chat/stream con RAG envía los tiempos por etapa en Server-Timing."""
+    async def fake_ask_stream(question, model_name=None, temperature=0.3, embedding_model=None, timings=None):
+        timings.update({"embed_ms": 12.0, "search_ms": 3.5, "prompt_ms": 0.2, "ttft_ms": 80.0})
+        yield "Hola"
+        yield " mundo"
+
+    with patch("api_server.rag_service.ask_stream", fake_ask_stream):
+        response = client.post(
+            "/chat/stream",
+            json={"messages": [{"role": "user", "content": "Hola"}], "use_knowledge_base": True}
+        )
+
+    assert response.status_code == 200
+    assert response.text == "Hola mundo"
+    assert response.headers["server-timing"] == "embed;dur=12.0, search;dur=3.5, prompt;dur=0.2, ttft;dur=80.0"
+
+
+def test_rag_chat_stream_sse_events(client):
+    """Con format=sse se envían eventos tipados: tokens agrupados, uso y fin."""
+    import json
+
+    async def fake_ask_stream(question, model_name=None, temperature=0.3, embedding_model=None, timings=None):
+        timings.update({"ttft_ms": 80.0})
+        yield "Hola"
+        yield " mundo"
+
+    with patch("api_server.rag_service.ask_stream", fake_ask_stream):
+        response = client.post(
+            "/chat/stream?format=sse",
+            json={"messages": [{"role": "user", "content": "Hola"}], "use_knowledge_base": True}
+        )
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    frames = [frame.split("\n") for frame in response.text.strip().split("\n\n")]
+    events = [(lines[0][len("event: "):], json.loads(lines[1][len("data: "):])) for lines in frames]
+    assert events[0] == ("token", {"content": "Hola mundo"})
+    assert events[1] == ("usage", {"timings": {"ttft_ms": 80.0}})
+    assert events[-1][0] == "done"
+
+
+def test_chat_stream_rejected_when_queue_full(client):
+    """Con el modelo ocupado y la cola llena, /chat/stream responde 429."""
+    import asyncio
+    from scheduler import GenerationScheduler
+
+    scheduler = GenerationScheduler(max_concurrent=1, max_queue=0, deadlines={})
+    asyncio.run(scheduler.acquire("llama3.2", "chat"))
+
+    with patch("api_server.scheduler", scheduler):
+        response = client.post(
+            "/chat/stream",
+            json={"messages": [{"role": "user", "content": "Hola"}], "model": "llama3.2"}
+        )
+
+    assert response.status_code == 429
+    assert "Retry-After" in response.headers
+
+
+def test_chat_stream_ndjson_rejection_is_an_error_event(client):
+    """Con format=ndjson la respuesta ya ha empezado: el rechazo llega como evento error."""
+    import asyncio
+    import json
+    from scheduler import GenerationScheduler
+
+    scheduler = GenerationScheduler(max_concurrent=1, max_queue=0, deadlines={})
+    asyncio.run(scheduler.acquire("llama3.2", "chat"))
+
+    with patch("api_server.scheduler", scheduler):
+        response = client.post(
+            "/chat/stream?format=ndjson",
+            json={"messages": [{"role": "user", "content": "Hola"}], "model": "llama3.2"}
+        )
+
+    assert response.status_code == 200
+    events = [json.loads(line) for line in response.text.splitlines()]
+    assert events[-1]["type"] == "error"
+    assert events[-1]["status"] == 429 and "retry_after" in events[-1]
+    assert "done" not in [item["type"] for item in events]
+
+
+def test_analyze_batch_streams_ndjson_results(client):
+    """/analyze/batch devuelve una línea por elemento según terminan y un resumen final."""
+    import asyncio
+    import json
+
+    async def fake_analyze(task, text, model):
+        await asyncio.sleep(0.05 if text == "lento" else 0)
+        if text == "falla":
+            raise ValueError("salida inválida")
+        return f"{task}:{text}", False
+
+    items = [
+        {"text": "lento", "task": "summarize", "id": "a"},
+        {"text": "rápido", "task": "sentiment"},
+        {"text": "falla", "task": "extract_keywords"},
+    ]
+    with patch("api_server.analyzer.analyze", fake_analyze), \
+         patch("api_server.residency.ensure_loaded", Mock(side_effect=lambda model: asyncio.sleep(0))):
+        response = client.post("/analyze/batch", json={"items": items, "concurrency": 3})
+
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert response.status_code == 200
+    assert [line.get("index") for line in lines[:3]][-1] == 0
+    results = {line["index"]: line for line in lines[:3]}
+    assert results[0]["result"] == "summarize:lento" and results[0]["id"] == "a"
+    assert results[2]["error"] == "salida inválida"
+    assert all("latency_ms" in line for line in lines[:3])
+    assert lines[3]["done"] and lines[3]["count"] == 3 and lines[3]["errors"] == 1
+
+
+def test_analyze_batch_rejects_unknown_task(client):
+    """Una tarea desconocida en el lote se rechaza antes de generar nada."""
+    response = client.post("/analyze/batch", json={"items": [{"text": "x", "task": "traducir"}]})
+    assert response.status_code == 400
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
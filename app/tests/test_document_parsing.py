@@ -0,0 +1,136 @@
+"""
+Tests del parseo de documentos en procesos
+"""
+import pytest
+import sys
+import os
+import subprocess
+import textwrap
+
+# Añadir el directorio app al path
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, APP_DIR)
+
+import config
+from document_parsing import make_parse_pool, parse_file, iter_text_chunks, make_text_splitter
+
+
+def make_pdf(path, pages):
+    """Genera un PDF mínimo con una línea de texto por página."""
+    objs = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+            "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in pages:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+        objs.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objs.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                    f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objs)} 0 R >>")
+        kids.append(f"{len(objs)} 0 R")
+    objs[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(pages)} >>"
+
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for i, obj in enumerate(objs, 1):
+        offsets.append(len(out))
+        out += f"{i} 0 obj\n{obj}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objs) + 1}\n0000000000 65535 f \n".encode()
+    out += b"".join(f"{o:010d} 00000 n \n".encode() for o in offsets)
+    out += f"trailer\n<< /Size {len(objs) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    path.write_bytes(out)
+
+
+@pytest.fixture(scope="module")
+def executor():
+    with make_parse_pool(2) as pool:
+        yield pool
+
+
+def test_pdf_pages_are_parsed_in_parallel_and_in_order(tmp_path, executor, monkeypatch):
+    """Cada rango de páginas se procesa por separado y el orden se conserva."""
+    monkeypatch.setattr(config, "PDF_PAGES_PER_TASK", 1)
+    pdf = tmp_path / "doc.pdf"
+    make_pdf(pdf, ["Pagina uno", "Pagina dos", "Pagina tres"])
+
+    chunks = parse_file(str(pdf), executor)
+
+    assert [c.page_content for c in chunks] == ["Pagina uno", "Pagina dos", "Pagina tres"]
+    assert [c.metadata["page"] for c in chunks] == [0, 1, 2]
+    assert all(c.metadata["source"] == str(pdf) for c in chunks)
+
+
+def test_text_parsing_matches_in_process(tmp_path, executor):
+    """El resultado en el pool es idéntico al parseo en el propio proceso."""
+    doc = tmp_path / "doc.txt"
+    doc.write_text("\n\n".join(f"párrafo {i} " * 40 for i in range(5)), encoding="utf-8")
+
+    in_pool = parse_file(str(doc), executor)
+    in_process = parse_file(str(doc))
+
+    assert len(in_pool) > 1
+    assert [(c.page_content, c.metadata) for c in in_pool] == [(c.page_content, c.metadata) for c in in_process]
+
+
+@pytest.mark.parametrize("block_size", [300, 2000, 65536])
+def test_streaming_split_matches_whole_file_split(tmp_path, block_size):
+    """El troceado incremental produce los mismos chunks que el troceado completo."""
+    paragraphs = []
+    for i in range(60):
+        lines = [f"linea {j} del parrafo {i} " * (1 + (i * j) % 7) for j in range(1 + i % 9)]
+        paragraphs.append("\n".join(lines))
+    text = "\n\n".join(paragraphs)
+    doc = tmp_path / "big.txt"
+    doc.write_text(text, encoding="utf-8")
+
+    streamed = [c.page_content for c in iter_text_chunks(str(doc), block_size)]
+
+    assert streamed == make_text_splitter().split_text(text)
+
+
+def run_server_script(tmp_path, launcher):
+    """Ejecuta un script con efectos a nivel de modulo que parsea un fichero en el pool.
+
+    Devuelve los nombres de modulo con los que se ejecuto el script, uno por importacion.
+    """
+    marker = tmp_path / "imports.log"
+    doc = tmp_path / "doc.py"
+    doc.write_text("print('hola')\n" * 50, encoding="utf-8")
+    # Equivalente a `uvicorn api_server:app`: importa el script y usa el pool
+    (tmp_path / "runner").mkdir()
+    (tmp_path / "runner" / "__init__.py").write_text("")
+    (tmp_path / "runner" / "__main__.py").write_text("import server\n")
+    (tmp_path / "server.py").write_text(textwrap.dedent(f"""
+        import sys
+        sys.path.insert(0, {APP_DIR!r})
+
+        if __name__ == "__main__" and {launcher!r}:
+            from launcher import run_module
+            run_module("runner", [])
+            sys.exit(0)
+
+        with open({str(marker)!r}, "a") as f:
+            f.write(__name__ + "\\n")
+
+        if __name__ in ("__main__", "server"):
+            from document_parsing import make_parse_pool, parse_file
+            with make_parse_pool(2) as pool:
+                print(len(parse_file({str(doc)!r}, pool)))
+    """))
+
+    result = subprocess.run([sys.executable, str(tmp_path / "server.py")], cwd=tmp_path,
+                            capture_output=True, text=True, timeout=120)
+    assert result.returncode == 0, result.stderr
+    assert int(result.stdout.split()[-1]) > 0
+    return marker.read_text().split()
+
+
+def test_pool_workers_do_not_rerun_launched_script(tmp_path):
+    """Con el lanzador, los workers no vuelven a ejecutar el codigo de modulo del script."""
+    assert run_server_script(tmp_path, launcher=True) == ["server"]
+
+
+def test_pool_workers_rerun_plain_script(tmp_path):
+    """Sin lanzador, cada worker re-importa el script como __mp_main__."""
+    imports = run_server_script(tmp_path, launcher=False)
+    assert imports[0] == "__main__"
+    assert "__mp_main__" in imports[1:]
@@ -0,0 +1,87 @@
+"""
+Tests de la caché persistente de embeddings
+"""
+import pytest
+import sys
+import os
+
+# Añadir el directorio app al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from embedding_cache import EmbeddingCache, CachedEmbeddings, text_hash
+from lru_cache import LRUCache
+
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    """Embeddings falsos que registran los textos embebidos."""
+    embedded: list = []
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return super().embed_documents(texts)
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = EmbeddingCache(str(tmp_path / "cache.sqlite3"), max_entries=3)
+    yield cache
+    cache.close()
+
+
+def test_cached_embeddings_only_embed_misses(cache):
+    """Los textos ya cacheados no vuelven a embeberse."""
+    inner = CountingEmbeddings(size=4, embedded=[])
+    embeddings = CachedEmbeddings(inner, cache, "nomic-embed-text")
+
+    first = embeddings.embed_documents(["a", "b"])
+    second = embeddings.embed_documents(["a", "b", "c"])
+
+    assert inner.embedded == ["a", "b", "c"]
+    for cached, computed in zip(second, first):
+        assert cached == pytest.approx(computed, rel=1e-6)
+    assert cache.hits == 2
+    assert cache.misses == 3
+
+
+def test_cache_is_keyed_by_model(cache):
+    """El mismo texto con otro modelo es un fallo de caché."""
+    cache.put_many("model-a", {text_hash("a"): [1.0, 2.0]})
+
+    assert cache.get_many("model-b", [text_hash("a")]) == {}
+    assert cache.get_many("model-a", [text_hash("a")]) == {text_hash("a"): [1.0, 2.0]}
+
+
+def test_cache_evicts_least_recently_used(cache):
+    """Al superar max_entries se elimina la entrada usada hace más tiempo."""
+    for name in ["a", "b", "c"]:
+        cache.put_many("m", {name: [0.0]})
+    cache.get_many("m", ["a"])
+    cache.put_many("m", {"d": [0.0]})
+
+    assert set(cache.get_many("m", ["a", "b", "c", "d"])) == {"a", "c", "d"}
+    assert cache.stats()["entries"] == 3
+
+
+class CountingQueryEmbeddings(DeterministicFakeEmbedding):
+    """Embeddings falsos que cuentan las consultas embebidas."""
+    queries: list = []
+
+    def embed_query(self, text):
+        self.queries.append(text)
+        return super().embed_query(text)
+
+
+@pytest.mark.asyncio
+async def test_query_embeddings_are_cached_in_memory():
+    """Las consultas repetidas (sync o async) se embeben una sola vez."""
+    inner = CountingQueryEmbeddings(size=4, queries=[])
+    embeddings = CachedEmbeddings(inner, None, "nomic-embed-text", query_cache=LRUCache(2))
+
+    first = embeddings.embed_query("hola")
+    assert embeddings.embed_query("hola") == first
+    assert await embeddings.aembed_query("hola") == first
+    embeddings.embed_query("adiós")
+
+    assert inner.queries == ["hola", "adiós"]
+    assert embeddings.query_cache.stats()["hits"] == 2
@@ -0,0 +1,77 @@
+"""
+Tests de la cola de ingestión en segundo plano
+"""
+import pytest
+import sys
+import os
+
+# Añadir el directorio app al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from rag_service import RAGService
+from ingest_jobs import IngestionQueue
+
+
+@pytest.fixture
+def rag(tmp_path):
+    """RAGService con embeddings falsos y base de datos temporal."""
+    service = RAGService(persist_dir=str(tmp_path / "chroma"), embedding_model="fake-embed")
+    service.embeddings.embeddings = DeterministicFakeEmbedding(size=8)
+    return service
+
+
+@pytest.mark.asyncio
+async def test_job_reports_progress_and_completion(rag, tmp_path):
+    """Un trabajo pasa a 'done' con sus contadores de chunks."""
+    doc = tmp_path / "doc.txt"
+    doc.write_text("hola mundo " * 300, encoding="utf-8")
+    queue = IngestionQueue(rag, workers=1)
+
+    job = queue.submit(str(doc), "doc.txt")
+    assert job.stage == "queued"
+    await job.done.wait()
+
+    data = queue.get(job.id).to_dict()
+    assert data["stage"] == "done"
+    assert data["chunks_embedded"] == data["chunks_total"] > 0
+    assert data["error"] is None
+
+    again = queue.submit(str(doc), "doc.txt")
+    await again.done.wait()
+    assert again.stage == "skipped"
+    await queue.stop()
+
+
+@pytest.mark.asyncio
+async def test_failed_job_records_error(rag, tmp_path):
+    """Los errores de ingestión quedan registrados en el trabajo."""
+    queue = IngestionQueue(rag, workers=1)
+
+    job = queue.submit(str(tmp_path / "missing.txt"), "missing.txt")
+    await job.done.wait()
+
+    assert job.stage == "failed"
+    assert "not found" in job.error
+    await queue.stop()
+
+
+@pytest.mark.asyncio
+async def test_jobs_do_not_switch_default_embedding_model(rag, tmp_path):
+    """Un trabajo para otro modelo de embeddings no cambia el modelo por defecto del servicio."""
+    doc = tmp_path / "doc.txt"
+    doc.write_text("hola mundo " * 300, encoding="utf-8")
+    other = rag._get_store("otro-embed")
+    other.embeddings.embeddings = DeterministicFakeEmbedding(size=8)
+    default_store = rag.vectorstore
+    queue = IngestionQueue(rag, workers=1)
+
+    job = queue.submit(str(doc), "doc.txt", embedding_model="otro-embed")
+    await job.done.wait()
+
+    assert job.stage == "done" and job.stats.chunks > 0
+    assert rag.embedding_model_name == "fake-embed"
+    assert rag.vectorstore is default_store
+    assert rag.list_documents() == []
+    assert rag.list_documents("otro-embed") == ["doc.txt"]
+    await queue.stop()
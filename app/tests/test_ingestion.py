@@ -0,0 +1,53 @@
+"""
+Tests del pipeline de embeddings por lotes
+"""
+import pytest
+import sys
+import os
+
+# Añadir el directorio app al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_chroma import Chroma
+from ingestion import EmbeddingPipeline
+
+
+class CountingEmbeddings(DeterministicFakeEmbedding):
+    """Embeddings falsos que registran el tamaño de cada lote."""
+    batch_sizes: list = []
+
+    def embed_documents(self, texts):
+        self.batch_sizes.append(len(texts))
+        return super().embed_documents(texts)
+
+
+@pytest.fixture
+def vectorstore(tmp_path):
+    return Chroma(persist_directory=str(tmp_path), embedding_function=DeterministicFakeEmbedding(size=8))
+
+
+def test_pipeline_batches_and_stores_all_chunks(vectorstore):
+    """Todos los chunks se guardan, agrupados según batch_size."""
+    embeddings = CountingEmbeddings(size=8, batch_sizes=[])
+    chunks = [Document(page_content=f"chunk {i}", metadata={"source": "doc.txt"}) for i in range(10)]
+
+    stats = EmbeddingPipeline(embeddings, vectorstore, batch_size=4, concurrency=2).run(chunks)
+
+    assert stats.chunks == 10
+    assert stats.batches == 3
+    assert sorted(embeddings.batch_sizes) == [2, 4, 4]
+    assert len(vectorstore.get()["ids"]) == 10
+    assert stats.chunks_per_second > 0
+
+
+def test_pipeline_accepts_lazy_iterables_and_empty_metadata(vectorstore):
+    """Acepta generadores y chunks sin metadata."""
+    embeddings = DeterministicFakeEmbedding(size=8)
+    chunks = (Document(page_content=f"chunk {i}", id=f"id-{i}") for i in range(3))
+
+    stats = EmbeddingPipeline(embeddings, vectorstore, batch_size=2).run(chunks)
+
+    assert stats.chunks == 3
+    assert sorted(vectorstore.get()["ids"]) == ["id-0", "id-1", "id-2"]
@@ -0,0 +1,40 @@
+"""
+Tests del pool de clientes ChatOllama
+"""
+import sys
+import os
+
+# Añadir el directorio app al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from llm_pool import ChatModelPool
+
+
+def test_same_settings_reuse_client():
+    """Los mismos parámetros devuelven el mismo cliente; otros parámetros, uno nuevo."""
+    pool = ChatModelPool(base_url="http://ollama:11434", max_size=4)
+
+    llm = pool.get("qwen3:14b", temperature=0.3)
+    assert pool.get("qwen3:14b", temperature=0.3) is llm
+    assert pool.get("qwen3:14b", temperature=0.7) is not llm
+    assert pool.get("qwen3:14b", base_url="http://otro:11434", temperature=0.3) is not llm
+    assert llm.base_url == "http://ollama:11434"
+    assert pool.stats()["hits"] == 1
+
+
+def test_pool_is_bounded_and_evicts_idle(monkeypatch):
+    """Se descartan el cliente menos usado al llenarse y los inactivos."""
+    now = [0.0]
+    monkeypatch.setattr("llm_pool.time.monotonic", lambda: now[0])
+    pool = ChatModelPool(max_size=2, idle_seconds=60)
+
+    a = pool.get("a")
+    pool.get("b")
+    pool.get("a")
+    pool.get("c")
+    assert len(pool) == 2
+    assert pool.get("a") is a
+
+    now[0] += 61
+    pool.get("d")
+    assert len(pool) == 1
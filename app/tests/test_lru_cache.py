@@ -0,0 +1,47 @@
+"""
+Tests de la caché LRU en memoria
+"""
+import sys
+import os
+
+# Añadir el directorio app al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from lru_cache import LRUCache
+
+
+def test_evicts_least_recently_used():
+    """Al superar maxsize se descarta la entrada menos usada."""
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    """Las entradas caducadas cuentan como fallo."""
+    now = [100.0]
+    monkeypatch.setattr("lru_cache.time.monotonic", lambda: now[0])
+    cache = LRUCache(2, ttl=10)
+    cache.put("a", 1)
+
+    now[0] += 5
+    assert cache.get("a") == 1
+    now[0] += 6
+    assert cache.get("a") is None
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_stale_generation_is_not_stored():
+    """Un valor calculado antes de clear() no se guarda."""
+    cache = LRUCache(2)
+    generation = cache.generation
+    cache.clear()
+    cache.put("a", 1, generation)
+
+    assert cache.get("a") is None
@@ -0,0 +1,59 @@
+"""
+Tests del gestor de modelos residentes en Ollama
+"""
+import asyncio
+import json
+import pytest
+import sys
+import os
+
+# Añadir el directorio app al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import httpx
+from model_residency import ModelResidencyManager
+
+
+def fake_ollama(requests, loaded):
+    """Transporte que simula /api/ps, /api/generate y /api/embed."""
+    async def handler(request):
+        requests.append((request.url.path, json.loads(request.content or b"{}")))
+        if request.url.path == "/api/ps":
+            return httpx.Response(200, json={"models": [{"name": n, "size_vram": 1} for n in loaded]})
+        await asyncio.sleep(0.05)
+        model = json.loads(request.content)["model"]
+        loaded.add(model if ":" in model else f"{model}:latest")
+        return httpx.Response(200, json={"done": True})
+    return httpx.MockTransport(handler)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_requests_share_one_load():
+    """Varias peticiones para un modelo no cargado esperan a una sola carga."""
+    requests, loaded = [], set()
+    manager = ModelResidencyManager(base_url="http://ollama", transport=fake_ollama(requests, loaded))
+
+    results = await asyncio.gather(*(manager.ensure_loaded("llama3.2") for _ in range(5)))
+
+    assert all(results)
+    assert requests == [("/api/generate", {"model": "llama3.2"})]
+    assert await manager.ensure_loaded("llama3.2")
+    assert len(requests) == 1
+    await manager.stop()
+
+
+@pytest.mark.asyncio
+async def test_pinned_models_use_keep_alive_and_show_as_resident():
+    """Los modelos fijados se cargan con keep_alive y aparecen en el snapshot."""
+    requests, loaded = [], {"otro:7b"}
+    manager = ModelResidencyManager(base_url="http://ollama", keep_alive="1h",
+                                    transport=fake_ollama(requests, loaded))
+    manager.pin("nomic-embed-text", "embedding")
+
+    await manager.ensure_loaded("nomic-embed-text")
+    await manager.refresh()
+    snapshot = manager.snapshot()
+
+    assert requests[0] == ("/api/embed", {"model": "nomic-embed-text", "input": [], "keep_alive": "1h"})
+    assert {m["name"]: m["pinned"] for m in snapshot["resident"]} == {"nomic-embed-text:latest": True, "otro:7b": False}
+    await manager.stop()
@@ -0,0 +1,219 @@
+"""
+Tests de la ejecución asíncrona de herramientas del servidor MCP de MongoDB
+"""
+import sys
+import os
+import asyncio
+import json
+import time
+import pytest
+
+# Añadir el directorio app al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from datetime import datetime
+from bson import ObjectId
+from mcp_server import tools as tools_module
+from mcp_server.mongodb_mcp import MongoDBMCPServer
+from mcp_server.tools import AsyncMongoDBTools, MongoDBTools
+
+
+class SlowAsyncTools:
+    """Herramientas asíncronas falsas que tardan en responder sin bloquear el bucle."""
+
+    async def count_documents(self, collection, filter_json="{}"):
+        await asyncio.sleep(0.1)
+        return json.dumps({"success": True, "collection": collection, "count": 3})
+
+    def __getattr__(self, name):
+        async def unused(**kwargs):
+            raise AssertionError(f"{name} no debería llamarse")
+        return unused
+
+
+@pytest.mark.asyncio
+async def test_aexecute_tool_does_not_block_event_loop():
+    """Varias consultas lentas en paralelo tardan como una sola."""
+    server = MongoDBMCPServer()
+    server.async_tools = SlowAsyncTools()
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(
+        server.aexecute_tool("mongodb_count", {"collection": f"c{i}"}) for i in range(5)
+    ))
+
+    assert time.perf_counter() - start < 0.3
+    assert [json.loads(r)["collection"] for r in results] == [f"c{i}" for i in range(5)]
+
+
+@pytest.mark.asyncio
+async def test_aexecute_tool_reports_errors_as_json():
+    """Herramientas desconocidas o parámetros inválidos devuelven un JSON de error."""
+    server = MongoDBMCPServer()
+    server.async_tools = SlowAsyncTools()
+
+    unknown = json.loads(await server.aexecute_tool("mongodb_drop", {}))
+    bad_args = json.loads(await server.aexecute_tool("mongodb_count", {"coleccion": "x"}))
+
+    assert unknown == {"success": False, "error": "Unknown tool: mongodb_drop"}
+    assert not bad_args["success"]
+
+
+class FakeCursor:
+    """Cursor síncrono y asíncrono que cuenta los documentos leídos."""
+
+    def __init__(self, documents):
+        self.documents = documents
+        self.read = 0
+        self.closed = False
+
+    def skip(self, n):
+        return self
+
+    def limit(self, n):
+        return self
+
+    def batch_size(self, n):
+        return self
+
+    def __iter__(self):
+        for document in self.documents:
+            self.read += 1
+            yield document
+
+    def __aiter__(self):
+        return self._aiterate()
+
+    async def _aiterate(self):
+        for document in self:
+            yield document
+
+    def close(self):
+        self.closed = True
+
+
+class FakeAsyncCursor(FakeCursor):
+    async def close(self):
+        self.closed = True
+
+
+def make_tools(tools_class, cursor):
+    tools = tools_class()
+    tools.client = object()
+    tools.db = {"logs": type("Collection", (), {"find": lambda self, *args: cursor})()}
+    return tools
+
+
+@pytest.fixture
+def small_budget(monkeypatch):
+    monkeypatch.setattr(tools_module.config, "result_compact", True)
+    monkeypatch.setattr(tools_module.config, "result_max_bytes", 200)
+    monkeypatch.setattr(tools_module.config, "result_max_string", 20)
+    monkeypatch.setattr(tools_module.config, "result_max_array", 3)
+
+
+def test_compact_serialization_same_with_and_without_orjson(monkeypatch, small_budget):
+    """La salida compacta no tiene espacios y es igual con orjson o con json."""
+    data = {"_id": ObjectId("65a000000000000000000001"), "at": datetime(2024, 1, 2), "name": "Ana"}
+    tools = MongoDBTools()
+
+    with_orjson = tools._serialize_result(data)
+    monkeypatch.setattr(tools_module, "orjson", None)
+    without_orjson = tools._serialize_result(data)
+
+    assert with_orjson == without_orjson
+    assert "\n" not in with_orjson and ": " not in with_orjson
+    assert json.loads(with_orjson)["_id"] == {"$oid": "65a000000000000000000001"}
+
+
+def test_large_values_are_truncated(small_budget):
+    """Las cadenas y listas largas se recortan indicando cuánto se omitió."""
+    tools = MongoDBTools()
+
+    document = tools._truncate({"text": "x" * 50, "tags": list(range(5)), "nested": {"items": [{"v": "y" * 25}]}})
+
+    assert document["text"] == "x" * 20 + "...[30 more chars]"
+    assert document["tags"] == [0, 1, 2, "...[2 more items]"]
+    assert document["nested"]["items"][0]["v"].endswith("...[5 more chars]")
+
+
+def test_find_stops_reading_at_byte_budget(small_budget):
+    """find deja de leer el cursor al agotar el presupuesto de bytes y lo cierra."""
+    cursor = FakeCursor([{"n": i, "text": "z" * 15} for i in range(1000)])
+    tools = make_tools(MongoDBTools, cursor)
+
+    result = json.loads(tools.find_documents("logs", limit=1000))
+
+    assert result["truncated"] is True
+    assert 0 < result["count"] < 10
+    assert cursor.read == result["count"] + 1
+    assert cursor.closed
+
+
+@pytest.mark.asyncio
+async def test_async_find_stops_reading_at_byte_budget(small_budget):
+    """La versión asíncrona aplica el mismo presupuesto leyendo el cursor en streaming."""
+    cursor = FakeAsyncCursor([{"n": i, "text": "z" * 15} for i in range(1000)])
+    tools = make_tools(AsyncMongoDBTools, cursor)
+
+    result = json.loads(await tools.find_documents("logs", limit=1000))
+
+    assert result["truncated"] is True
+    assert cursor.read == result["count"] + 1
+    assert cursor.closed
+
+
+class FakeWriteCollection:
+    """Colección falsa con operaciones de escritura, en versión síncrona o asíncrona."""
+
+    def __init__(self, is_async):
+        self.is_async = is_async
+        self.calls = []
+
+    def _result(self, name, *args, **kwargs):
+        self.calls.append((name, args, kwargs))
+        result = type("Result", (), {
+            "acknowledged": True, "inserted_id": ObjectId("65a000000000000000000001"),
+            "inserted_ids": [1, 2], "matched_count": 2, "modified_count": 1,
+            "upserted_id": None, "deleted_count": 3,
+        })()
+        if not self.is_async:
+            return result
+
+        async def wrapped():
+            return result
+        return wrapped()
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self._result(name, *args, **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_sync_and_async_tools_return_same_results():
+    """Las herramientas síncronas y asíncronas llaman igual a MongoDB y devuelven lo mismo."""
+    calls = [
+        ("insert_document", {"collection": "c", "document_json": '{"a": 1}'}),
+        ("insert_many_documents", {"collection": "c", "documents_json": '[{"a": 1}, {"a": 2}]'}),
+        ("insert_many_documents", {"collection": "c", "documents_json": '{"a": 1}'}),
+        ("update_documents", {"collection": "c", "filter_json": '{"_id": "65a000000000000000000001"}',
+                              "update_json": '{"$set": {"a": 2}}', "update_many": True}),
+        ("delete_documents", {"collection": "c", "filter_json": "{}"}),
+    ]
+    results = {}
+    for tools_class, is_async in [(MongoDBTools, False), (AsyncMongoDBTools, True)]:
+        tools = tools_class()
+        tools.client = object()
+        coll = FakeWriteCollection(is_async)
+        tools.db = {"c": coll}
+        outputs = []
+        for name, kwargs in calls:
+            output = getattr(tools, name)(**kwargs)
+            outputs.append(await output if is_async else output)
+        results[is_async] = (outputs, coll.calls)
+
+    assert results[False] == results[True]
+    outputs, mongo_calls = results[False]
+    assert json.loads(outputs[2]) == {"success": False, "error": "documents_json must be a JSON array"}
+    assert json.loads(outputs[3])["matched_count"] == 2
+    assert [c[0] for c in mongo_calls] == ["insert_one", "insert_many", "update_many", "delete_one"]
+    assert mongo_calls[2][1][0] == {"_id": ObjectId("65a000000000000000000001")}
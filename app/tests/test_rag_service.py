@@ -0,0 +1,247 @@
+"""
+Tests de ingestión incremental del RAGService
+"""
+import pytest
+import sys
+import os
+import json
+import dataclasses
+
+# Añadir el directorio app al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import DeterministicFakeEmbedding
+import config
+from rag_service import RAGService
+
+
+@pytest.fixture
+def rag(tmp_path):
+    """RAGService con embeddings falsos y base de datos temporal."""
+    service = RAGService(persist_dir=str(tmp_path / "chroma"), embedding_model="fake-embed")
+    service.embeddings.embeddings = DeterministicFakeEmbedding(size=8)
+    return service
+
+
+def write_doc(path, paragraphs):
+    # Párrafos de ~600 caracteres para que cada uno sea un chunk independiente
+    path.write_text("\n\n".join(p * 150 for p in paragraphs), encoding="utf-8")
+
+
+def test_reingest_unchanged_file_is_skipped(rag, tmp_path):
+    """Un fichero sin cambios no se vuelve a procesar."""
+    doc = tmp_path / "doc.txt"
+    write_doc(doc, ["uno ", "dos ", "tres"])
+
+    added = rag.ingest_file(str(doc)).chunks
+    total = len(rag.vectorstore.get()["ids"])
+
+    assert added == total > 0
+    stats = rag.ingest_file(str(doc))
+    assert stats.chunks == 0
+    assert stats.unchanged == total
+    assert len(rag.vectorstore.get()["ids"]) == total
+
+
+def test_reingest_only_embeds_changed_chunks(rag, tmp_path):
+    """Solo se embeben los chunks nuevos y se eliminan los que desaparecen."""
+    doc = tmp_path / "doc.txt"
+    write_doc(doc, ["uno ", "dos ", "tres"])
+    rag.ingest_file(str(doc))
+
+    write_doc(doc, ["uno ", "dos ", "cuatro"])
+    stats = rag.ingest_file(str(doc))
+
+    assert stats.chunks == 1
+    assert stats.deleted == 1
+    assert stats.unchanged == 2
+    contents = rag.vectorstore.get()["documents"]
+    assert len(contents) == 3
+    assert not any(c.startswith("tres") for c in contents)
+
+
+def test_delete_document_removes_manifest(rag, tmp_path):
+    """Borrar un documento permite volver a ingerirlo completo."""
+    doc = tmp_path / "doc.txt"
+    write_doc(doc, ["uno ", "dos "])
+    added = rag.ingest_file(str(doc)).chunks
+
+    assert rag.delete_document("doc.txt")
+    assert rag.manifests.get(str(doc)) is None
+    assert rag.ingest_file(str(doc)).chunks == added
+
+
+def test_source_index_lists_and_rebuilds(rag, tmp_path):
+    """El índice de fuentes refleja chunks y bytes, y se reconstruye si falta."""
+    doc = tmp_path / "doc.txt"
+    write_doc(doc, ["uno ", "dos "])
+    added = rag.ingest_file(str(doc)).chunks
+
+    details = rag.document_stats()
+    assert rag.list_documents() == ["doc.txt"]
+    assert details[0]["chunks"] == added
+    assert details[0]["bytes"] > 0
+
+    rag.source_index.close()
+    os.remove(rag.source_index.path)
+    rag._stores.clear()
+    rag.embedding_model_name = None
+    rag._update_embedding_model("fake-embed")
+
+    assert rag.document_stats() == details
+
+
+def test_metadata_changes_update_unchanged_chunks(rag, tmp_path):
+    """Si sólo cambia la metadata (p. ej. el número de página) se actualiza sin re-embeber."""
+    source = str(tmp_path / "doc.pdf")
+    store = rag._get_store("fake-embed")
+    pages = [Document(page_content=f"pagina {i} " * 20, metadata={"source": source, "page": i}) for i in range(3)]
+    rag._sync_source(source, pages, store)
+
+    # Se inserta una página al principio: el texto del resto no cambia, su número sí
+    inserted = Document(page_content="portada " * 20, metadata={"source": source, "page": 0})
+    shifted = [Document(page_content=p.page_content, metadata={"source": source, "page": i + 1})
+               for i, p in enumerate(pages)]
+    stats = rag._sync_source(source, [inserted, *shifted], store)
+
+    assert (stats.chunks, stats.unchanged, stats.updated) == (1, 3, 3)
+    stored = rag.vectorstore.get(include=["documents", "metadatas"])
+    pages_by_text = {text: meta["page"] for text, meta in zip(stored["documents"], stored["metadatas"])}
+    assert pages_by_text == {d.page_content: d.metadata["page"] for d in [inserted, *shifted]}
+
+    stats = rag._sync_source(source, [inserted, *shifted], store)
+    assert (stats.chunks, stats.updated) == (0, 0)
+
+
+def test_legacy_json_manifests_are_imported(rag, tmp_path):
+    """Los manifiestos JSON de versiones anteriores se migran a SQLite una sola vez."""
+    doc = tmp_path / "doc.txt"
+    write_doc(doc, ["uno ", "dos "])
+    rag.ingest_file(str(doc))
+    manifest = rag.manifests.get(str(doc))
+
+    legacy = os.path.join(rag._get_store("fake-embed").persist_directory, "manifests.json")
+    with open(legacy, "w", encoding="utf-8") as f:
+        json.dump([dataclasses.asdict(manifest)], f)
+    rag.manifests.close()
+    os.remove(rag.manifests.path)
+    rag._stores.clear()
+    rag.embedding_model_name = None
+    rag._update_embedding_model("fake-embed")
+
+    assert not os.path.exists(legacy)
+    assert rag.manifests.get(str(doc)) == manifest
+    assert rag.ingest_file(str(doc)).chunks == 0
+
+
+def test_streaming_ingestion_matches_regular_ingestion(rag, tmp_path, monkeypatch):
+    """Un fichero ingerido en modo streaming produce los mismos chunks."""
+    doc = tmp_path / "doc.txt"
+    write_doc(doc, ["uno ", "dos ", "tres", "cuatro "])
+    regular = rag.ingest_file(str(doc)).chunks
+    ids = sorted(rag.vectorstore.get()["ids"])
+    rag.delete_document("doc.txt")
+
+    monkeypatch.setattr(config, "STREAMING_INGEST_MIN_BYTES", 0)
+    monkeypatch.setattr(config, "PARSE_WORKERS", 0)
+    streamed = rag.ingest_file(str(doc)).chunks
+
+    assert streamed == regular
+    assert sorted(rag.vectorstore.get()["ids"]) == ids
+
+
+def test_directory_ingestion_resumes_from_checkpoint(rag, tmp_path, monkeypatch):
+    """Los ficheros completados no se repiten y los fallidos se reintentan."""
+    monkeypatch.setattr(config, "PARSE_WORKERS", 0)
+    docs = tmp_path / "docs"
+    (docs / "sub").mkdir(parents=True)
+    write_doc(docs / "a.txt", ["uno ", "dos "])
+    write_doc(docs / "b.md", ["tres", "cuatro "])
+    write_doc(docs / "sub" / "c.txt", ["cinco "])
+    (docs / "roto.txt").write_bytes(b"\xff\xfe\x00 no es utf-8 \xc3")
+
+    added = rag.ingest_directory(str(docs)).chunks
+    assert added == len(rag.vectorstore.get()["ids"]) > 0
+    assert sorted(d["name"] for d in rag.document_stats()) == ["a.txt", "b.md", "c.txt"]
+
+    # Una segunda pasada solo reintenta el fichero que falló
+    attempted = []
+    original = rag._ingest_file
+    monkeypatch.setattr(rag, "_ingest_file",
+                        lambda path, *args, **kwargs: attempted.append(path) or original(path, *args, **kwargs))
+    (docs / "roto.txt").write_text("ya " * 400, encoding="utf-8")
+
+    assert rag.ingest_directory(str(docs)).chunks > 0
+    assert attempted == [str(docs / "roto.txt")]
+
+    attempted.clear()
+    rag.ingest_directory(str(docs), resume=False)
+    assert len(attempted) == 4
+
+
+def test_directory_ingestion_batches_manifest_writes(rag, tmp_path, monkeypatch):
+    """Los manifiestos de una carpeta se guardan por lotes, no uno por fichero."""
+    monkeypatch.setattr(config, "PARSE_WORKERS", 0)
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    for i in range(5):
+        write_doc(docs / f"doc{i}.txt", [f"doc{i} uno ", f"doc{i} dos "])
+    batches = []
+    original = rag.manifests.put_many
+    monkeypatch.setattr(rag.manifests, "put_many", lambda manifests: batches.append(len(manifests)) or original(manifests))
+
+    rag.ingest_directory(str(docs))
+
+    assert batches == [5]
+    assert len(rag.document_stats()) == 5
+    assert all(rag.manifests.get(str(docs / f"doc{i}.txt")) for i in range(5))
+    assert rag.ingest_directory(str(docs), resume=False).chunks == 0
+
+
+def test_retrieval_cache_invalidated_on_changes(rag, tmp_path):
+    """Las búsquedas repetidas se sirven de caché hasta que cambia la colección."""
+    doc = tmp_path / "doc.txt"
+    write_doc(doc, ["uno ", "dos "])
+    rag.ingest_file(str(doc))
+    cache = rag._get_store("fake-embed").retrieval_cache
+
+    first = rag.get_related_docs("uno  dos", k=2)
+    assert rag.get_related_docs(" uno dos ", k=2) == first
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    write_doc(doc, ["uno ", "tres"])
+    rag.ingest_file(str(doc))
+    assert len(cache) == 0
+
+    rag.get_related_docs("uno dos", k=2)
+    rag.delete_document("doc.txt")
+    assert len(cache) == 0
+    assert rag.get_related_docs("uno dos", k=2) == []
+
+
+@pytest.mark.asyncio
+async def test_ask_and_ask_stream_share_cached_chain(rag, tmp_path, monkeypatch):
+    """ask y ask_stream usan la misma cadena, construida una sola vez por modelo."""
+    from langchain_core.language_models import FakeListChatModel
+    llm = FakeListChatModel(responses=["Respuesta de prueba"] * 2)
+    monkeypatch.setattr(rag.llm_pool, "get", lambda model, **params: llm)
+    doc = tmp_path / "doc.txt"
+    write_doc(doc, ["uno ", "dos "])
+    rag.ingest_file(str(doc))
+
+    timings = {}
+    streamed = [chunk async for chunk in rag.ask_stream("¿uno?", model_name="fake", timings=timings)]
+    assert "".join(streamed) == "Respuesta de prueba"
+    assert len(streamed) > 1
+    assert {"embed_ms", "search_ms", "prompt_ms", "ttft_ms", "generate_ms", "total_ms"} <= set(timings)
+    assert timings["tokens_per_second"] > 0
+    assert await rag.ask("¿dos?", model_name="fake") == "Respuesta de prueba"
+    assert len(rag._chains) == 1
+
+
+def test_prompt_template_requires_context_and_question(tmp_path):
+    """Una plantilla sin {context} o {question} se rechaza al crear el servicio."""
+    with pytest.raises(ValueError, match="context"):
+        RAGService(persist_dir=str(tmp_path / "chroma"), embedding_model="fake-embed",
+                   prompt_template="Pregunta: {question}")
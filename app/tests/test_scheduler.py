@@ -0,0 +1,68 @@
+"""
+Tests del control de admisión y prioridades de generación
+"""
+import asyncio
+import pytest
+import sys
+import os
+
+# Añadir el directorio app al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from scheduler import GenerationScheduler, QueueFull, QueueTimeout
+
+
+@pytest.mark.asyncio
+async def test_waiting_requests_are_served_by_priority():
+    """Con el modelo ocupado, los streams se atienden antes que chat y analyze."""
+    scheduler = GenerationScheduler(max_concurrent=1, max_queue=10, deadlines={})
+    order = []
+
+    async def request(kind):
+        async with scheduler.slot("m", kind):
+            order.append(kind)
+            await asyncio.sleep(0.01)
+
+    await scheduler.acquire("m", "chat")
+    tasks = [asyncio.create_task(request(kind)) for kind in ["analyze", "chat", "stream"]]
+    await asyncio.sleep(0.01)
+    assert scheduler.stats()["models"]["m"]["queued"] == 3
+    scheduler.release("m")
+    await asyncio.gather(*tasks)
+
+    assert order == ["stream", "chat", "analyze"]
+    assert scheduler.stats()["models"]["m"]["active"] == 0
+    assert scheduler.stats()["kinds"]["analyze"]["max_wait_ms"] > 0
+
+
+@pytest.mark.asyncio
+async def test_full_queue_and_deadline_are_rejected():
+    """Se rechaza con QueueFull si la cola está llena y con QueueTimeout si vence el plazo."""
+    scheduler = GenerationScheduler(max_concurrent=1, max_queue=1, deadlines={"chat": 0.05})
+    await scheduler.acquire("m", "chat")
+
+    waiter = asyncio.create_task(scheduler.acquire("m", "chat"))
+    await asyncio.sleep(0)
+    with pytest.raises(QueueFull):
+        await scheduler.acquire("m", "analyze")
+    with pytest.raises(QueueTimeout):
+        await waiter
+
+    # El hueco sigue siendo del primero y la cola queda vacía
+    assert scheduler.stats()["models"]["m"] == {
+        "active": 1, "queued": 0,
+        "queued_by_kind": {"stream": 0, "chat": 0, "analyze": 0},
+    }
+    assert scheduler.stats()["kinds"]["chat"]["rejected"] == 1
+    scheduler.release("m")
+    await scheduler.acquire("m", "stream")
+
+
+@pytest.mark.asyncio
+async def test_models_have_independent_limits():
+    """El límite de concurrencia se aplica por modelo."""
+    scheduler = GenerationScheduler(max_concurrent=1, max_queue=0, deadlines={})
+    await scheduler.acquire("a", "chat")
+    await scheduler.acquire("b", "chat")
+    with pytest.raises(QueueFull):
+        await scheduler.acquire("a", "chat")
@@ -0,0 +1,263 @@
+"""
+Tests del catálogo de esquema de MongoDB
+"""
+import sys
+import os
+import asyncio
+import pytest
+
+# Añadir el directorio app al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from bson import ObjectId
+from mcp_server.schema_catalog import SchemaCatalog
+
+
+class FakeCursor:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for document in self.documents:
+            yield document
+
+
+class FakeCollection:
+    def __init__(self, documents):
+        self.documents = documents
+        self.pipelines = []
+
+    async def estimated_document_count(self):
+        return len(self.documents) * 1000
+
+    async def aggregate(self, pipeline):
+        self.pipelines.append(pipeline)
+        return FakeCursor(self.documents[:pipeline[0]["$sample"]["size"]])
+
+    async def count_documents(self, *args, **kwargs):
+        raise AssertionError("el catálogo no debe contar con count_documents")
+
+
+class FakeDatabase(dict):
+    def __init__(self, collections):
+        super().__init__(collections)
+        self.list_calls = 0
+
+    async def list_collection_names(self):
+        self.list_calls += 1
+        await asyncio.sleep(0.01)
+        return list(self)
+
+
+class FakeTools:
+    def __init__(self, db):
+        self.db = db
+
+    async def connect(self):
+        pass
+
+
+def make_catalog(**kwargs):
+    users = FakeCollection([
+        {"_id": ObjectId(), "name": "Ana", "age": 30},
+        {"_id": ObjectId(), "name": "Luis", "age": 41.5},
+        {"_id": ObjectId(), "name": "Eva"},
+        {"_id": ObjectId(), "email": "x@y.z"},
+    ])
+    db = FakeDatabase({"users": users, "orders": FakeCollection([])})
+    return SchemaCatalog(FakeTools(db), **kwargs), db, users
+
+
+@pytest.mark.asyncio
+async def test_snapshot_has_estimated_counts_and_field_stats():
+    """Se usa estimated_document_count y una muestra $sample para las estadísticas de campos."""
+    catalog, _, users = make_catalog(sample_size=3)
+
+    snapshot = await catalog.get()
+
+    assert [c["name"] for c in snapshot["collections"]] == ["orders", "users"]
+    info = snapshot["collections"][1]
+    assert info["document_count"] == 4000
+    assert info["sample_size"] == 3
+    assert users.pipelines == [[{"$sample": {"size": 3}}]]
+    fields = {f["name"]: f for f in info["fields"]}
+    assert info["fields"][0]["name"] == "_id"
+    assert fields["age"] == {"name": "age", "frequency": 0.667, "types": {"int": 1, "double": 1}}
+    assert snapshot["collections"][0]["fields"] == []
+
+
+@pytest.mark.asyncio
+async def test_cached_until_ttl_and_refreshes_shared():
+    """Dentro del TTL se sirve de caché; las peticiones concurrentes comparten un refresco."""
+    catalog, db, _ = make_catalog(ttl=60)
+
+    await asyncio.gather(catalog.get(), catalog.get(), catalog.get())
+    await catalog.get()
+    assert db.list_calls == 1
+
+    catalog.ttl = 0
+    await catalog.get()
+    assert db.list_calls == 2
+
+
+@pytest.mark.asyncio
+async def test_failed_refresh_serves_previous_snapshot():
+    """Si el refresco falla se devuelve la última instantánea conocida."""
+    catalog, db, _ = make_catalog(ttl=0)
+    first = await catalog.get()
+
+    async def broken():
+        raise RuntimeError("sin conexión")
+    db.list_collection_names = broken
+
+    assert await catalog.get() is first
+
+
+@pytest.mark.asyncio
+async def test_describe_for_prompt():
+    """La descripción para el prompt incluye los tipos de los campos, pero no los tamaños."""
+    catalog, _, _ = make_catalog()
+    await catalog.get()
+
+    description = catalog.describe(max_fields=3)
+
+    assert "- users: _id: objectId, name: string, age: int|double" in description
+    assert "- orders" in description
+    assert "4000" not in description
+
+
+@pytest.mark.asyncio
+async def test_version_changes_only_with_schema():
+    """La versión sube al cambiar colecciones o campos, no por refrescar con el mismo esquema."""
+    catalog, db, users = make_catalog(ttl=0)
+
+    await catalog.get()
+    await catalog.get()
+    assert catalog.version == 1
+
+    users.documents.append({"_id": ObjectId(), "tags": ["a"]})
+    await catalog.get()
+    assert catalog.version == 2
+    assert catalog.snapshot["version"] == 2
+
+
+@pytest.mark.asyncio
+async def test_version_ignores_sample_order_and_rare_fields():
+    """Una muestra aleatoria distinta, con otro orden o con campos raros, no cambia la versión."""
+    documents = [{"_id": ObjectId(), "name": f"n{i}", "age": i} for i in range(50)]
+    users = FakeCollection(documents)
+    catalog = SchemaCatalog(FakeTools(FakeDatabase({"users": users})), ttl=0, min_frequency=0.05)
+    await catalog.get()
+
+    # Otro orden de campos y un campo en sólo 1 de 50 documentos
+    users.documents = [{"age": d["age"], "name": d["name"], "_id": d["_id"]} for d in reversed(documents)]
+    users.documents[0]["nickname"] = "x"
+    await catalog.get()
+    assert catalog.version == 1
+
+    users.documents = [{**d, "email": "x@y.z"} for d in documents]
+    await catalog.get()
+    assert catalog.version == 2
+
+
+@pytest.mark.asyncio
+async def test_failed_collection_keeps_previous_description():
+    """Si una colección falla al muestrear, el resto se refresca y ésta conserva su descripción."""
+    catalog, db, users = make_catalog(ttl=0)
+    first = await catalog.get()
+    before = first["collections"][1]
+
+    async def broken(pipeline):
+        raise RuntimeError("timeout")
+    users.aggregate = broken
+    db["products"] = FakeCollection([{"sku": "A1"}])
+
+    snapshot = await catalog.get()
+    names = [c["name"] for c in snapshot["collections"]]
+    assert names == ["orders", "products", "users"]
+    users_info = snapshot["collections"][2]
+    assert users_info["fields"] == before["fields"]
+    assert users_info["error"] == "timeout"
+
+
+@pytest.mark.asyncio
+async def test_collection_names_available_before_first_sample():
+    """Los nombres de las colecciones están disponibles antes de terminar la primera muestra."""
+    catalog, db, users = make_catalog()
+    sampling = asyncio.Event()
+
+    async def slow(pipeline):
+        await sampling.wait()
+        return FakeCursor([])
+    users.aggregate = slow
+
+    task = catalog.refresh()
+    while catalog.collection_names is None:
+        await asyncio.sleep(0.01)
+    assert catalog.collection_names == ["orders", "users"]
+    assert catalog.snapshot is None and catalog.version == 0
+
+    sampling.set()
+    await task
+    assert catalog.version == 1
+
+
+@pytest.mark.asyncio
+async def test_poll_detects_new_collection():
+    """El sondeo de la lista de colecciones refresca el catálogo al aparecer una nueva."""
+    catalog, db, _ = make_catalog(ttl=3600, poll_interval=0.02)
+    catalog.start()
+    try:
+        while catalog.snapshot is None:
+            await asyncio.sleep(0.01)
+        db["products"] = FakeCollection([{"sku": "A1"}])
+        for _ in range(100):
+            if catalog.version == 2:
+                break
+            await asyncio.sleep(0.01)
+    finally:
+        await catalog.stop()
+
+    assert catalog.version == 2
+    assert "products" in [c["name"] for c in catalog.snapshot["collections"]]
+
+
+@pytest.mark.asyncio
+async def test_mongodb_prompt_rebuilt_only_on_new_version(monkeypatch):
+    """El prompt de MongoDB se reutiliza mientras no cambie la versión del catálogo."""
+    import api_server
+
+    catalog, db, _ = make_catalog(ttl=0)
+    await catalog.get()
+    monkeypatch.setattr(api_server, "schema_catalog", catalog)
+    monkeypatch.setattr(api_server, "_mongodb_prompt", {"key": None, "text": ""})
+
+    first = api_server.mongodb_system_prompt()
+    assert "orders, users" in first
+    assert api_server.mongodb_system_prompt() is first
+
+    db["products"] = FakeCollection([{"sku": "A1"}])
+    await catalog.get()
+    second = api_server.mongodb_system_prompt()
+    assert second is not first and "orders, products, users" in second
+
+
+@pytest.mark.asyncio
+async def test_mongodb_prompt_uses_collection_names_until_sampled(monkeypatch):
+    """Sin instantánea todavía, el prompt de MongoDB lista las colecciones conocidas."""
+    import api_server
+
+    catalog, _, _ = make_catalog()
+    await catalog._list_collections()
+    monkeypatch.setattr(api_server, "schema_catalog", catalog)
+    monkeypatch.setattr(api_server, "_mongodb_prompt", {"key": None, "text": ""})
+    monkeypatch.setattr(api_server, "MONGODB_MCP_AVAILABLE", True)
+
+    request = api_server.ChatRequest(messages=[{"role": "user", "content": "hola"}], use_mongodb_tools=True)
+    messages = api_server.build_chat_messages(request)
+
+    assert "orders, users" in messages[0].content
+    assert "Esquema de las colecciones" not in messages[0].content
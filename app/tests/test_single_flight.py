@@ -0,0 +1,125 @@
+"""
+Tests de la coalescencia de peticiones idénticas
+"""
+import asyncio
+import pytest
+import sys
+import os
+
+# Añadir el directorio app al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from single_flight import SingleFlight
+
+
+@pytest.mark.asyncio
+async def test_identical_calls_share_one_execution():
+    """Dos llamadas con la misma clave esperan a una única ejecución."""
+    flights = SingleFlight()
+    calls = []
+
+    async def generate():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "respuesta"
+
+    key = flights.key("chat", {"messages": ["hola"], "model": "m"})
+    results = await asyncio.gather(flights.run(key, generate), flights.run(key, generate))
+
+    assert results == ["respuesta", "respuesta"]
+    assert len(calls) == 1
+    assert flights.stats()["coalesced"] == 1
+    assert flights.key("chat", {"model": "m", "messages": ["hola"]}) == key
+
+
+@pytest.mark.asyncio
+async def test_stream_is_fanned_out_to_late_subscribers():
+    """Un consumidor que llega tarde recibe también los fragmentos ya generados."""
+    flights = SingleFlight()
+    runs = []
+
+    async def producer(headers):
+        runs.append(1)
+        headers["X-Test"] = "1"
+        for word in ["uno ", "dos ", "tres"]:
+            yield word
+            await asyncio.sleep(0.02)
+
+    first, first_ticket = flights.stream("k", producer)
+    await first.wait_started()
+    consumer = asyncio.create_task(_collect(first.subscribe(first_ticket)))
+    await asyncio.sleep(0.03)
+    second, second_ticket = flights.stream("k", producer)
+
+    assert second is first
+    assert second.headers == {"X-Test": "1"}
+    assert await _collect(second.subscribe(second_ticket)) == "uno dos tres"
+    assert await consumer == "uno dos tres"
+    assert len(runs) == 1
+
+
+@pytest.mark.asyncio
+async def test_stream_is_cancelled_when_all_consumers_leave():
+    """Si todos los consumidores se desconectan se cancela la generación."""
+    flights = SingleFlight()
+
+    async def producer(headers):
+        while True:
+            yield "x"
+            await asyncio.sleep(0.01)
+
+    flight, ticket = flights.stream("k", producer)
+    stream = flight.subscribe(ticket)
+    await stream.__anext__()
+    await stream.aclose()
+    await asyncio.sleep(0.01)
+
+    assert flight.task.cancelled()
+    retry, _ = flights.stream("k", producer)
+    assert retry is not flight
+    retry.task.cancel()
+
+
+@pytest.mark.asyncio
+async def test_stream_is_cancelled_when_consumer_is_released_before_subscribing():
+    """Un consumidor que se va antes de empezar a leer cuenta y cancela la generación."""
+    flights = SingleFlight()
+
+    async def producer(headers):
+        await asyncio.sleep(10)
+        yield "x"
+
+    flight, ticket = flights.stream("k", producer)
+    other, other_ticket = flights.stream("k", producer)
+    assert other is flight and flight.subscribers == 2
+
+    flight.release(ticket)
+    await asyncio.sleep(0)
+    assert not flight.task.done()
+
+    flight.release(other_ticket)
+    flight.release(other_ticket)
+    await asyncio.sleep(0.01)
+    assert flight.subscribers == 0
+    assert flight.abandoned and flight.task.cancelled()
+
+
+@pytest.mark.asyncio
+async def test_stream_never_iterated_is_released_after_grace():
+    """Si la respuesta nunca empieza a leer el stream, se libera tras el periodo de gracia."""
+    flights = SingleFlight(grace=0.02)
+
+    async def producer(headers):
+        while True:
+            yield "x"
+            await asyncio.sleep(0.01)
+
+    flight, ticket = flights.stream("k", producer)
+    flight.subscribe(ticket)
+    await asyncio.sleep(0.05)
+
+    assert flight.abandoned and flight.task.cancelled()
+
+
+async def _collect(stream):
+    return "".join([chunk async for chunk in stream])
@@ -0,0 +1,79 @@
+"""
+Tests de los eventos de /chat/stream: agrupación de tokens, latidos y codificación
+"""
+import sys
+import os
+import asyncio
+import json
+import pytest
+
+# Añadir el directorio app al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from stream_events import coalesce, encode_ndjson, encode_sse, encode_text, event, render
+
+
+async def events_from(items, delay=0.0):
+    for item in items:
+        if delay:
+            await asyncio.sleep(delay)
+        yield item
+
+
+async def collect(iterator):
+    return [item async for item in iterator]
+
+
+@pytest.mark.asyncio
+async def test_tokens_are_merged_up_to_max_chars():
+    """Los tokens consecutivos se agrupan hasta max_chars y se vacían antes de otro evento."""
+    items = [event("token", content=c) for c in "abcde"] + [event("done")]
+
+    result = await collect(coalesce(events_from(items), max_chars=2, max_delay=10, heartbeat=0))
+
+    assert result == [
+        event("token", content="ab"),
+        event("token", content="cd"),
+        event("token", content="e"),
+        event("done"),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_buffer_is_flushed_after_max_delay():
+    """Un token lento no retiene los anteriores más de max_delay."""
+    async def slow():
+        yield event("token", content="a")
+        await asyncio.sleep(0.1)
+        yield event("token", content="b")
+
+    result = await collect(coalesce(slow(), max_chars=100, max_delay=0.01, heartbeat=0))
+
+    assert result == [event("token", content="a"), event("token", content="b")]
+
+
+@pytest.mark.asyncio
+async def test_heartbeat_on_idle_stream():
+    """Sin salida durante `heartbeat` segundos se emite un latido."""
+    result = await collect(coalesce(events_from([event("done")], delay=0.08), heartbeat=0.03))
+
+    assert event("heartbeat") in result
+    assert result[-1] == event("done")
+
+
+def test_encoders():
+    """SSE lleva el tipo como evento; NDJSON una línea JSON; texto sólo tokens, herramientas y errores."""
+    token = event("token", content="hola")
+    assert encode_sse(token) == 'event: token\ndata: {"content": "hola"}\n\n'
+    assert json.loads(encode_ndjson(token)) == {"type": "token", "content": "hola"}
+    assert encode_text(token) == "hola"
+    assert encode_text(event("tool_start", name="mongodb_find")) == "[Utilizando herramienta: mongodb_find]...\n"
+    assert encode_text(event("usage", output_tokens=3)) == ""
+
+
+@pytest.mark.asyncio
+async def test_render_text_skips_non_text_events():
+    """El formato texto conserva la salida anterior y omite uso y fin."""
+    items = [event("token", content="Hola"), event("usage", output_tokens=1), event("done")]
+
+    assert "".join(await collect(render(events_from(items), "text"))) == "Hola"
@@ -0,0 +1,79 @@
+"""
+Tests del ejecutor de llamadas a herramientas
+"""
+import sys
+import os
+import asyncio
+import json
+import time
+import pytest
+
+# Añadir el directorio app al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from langchain_core.tools import tool
+from tool_executor import ToolExecutor
+
+
+@tool
+async def slow_count(collection: str) -> str:
+    """Cuenta documentos tardando un poco."""
+    await asyncio.sleep(0.1)
+    return json.dumps({"collection": collection, "count": len(collection)})
+
+
+@tool
+async def broken(collection: str) -> str:
+    """Siempre falla."""
+    raise RuntimeError("sin conexión")
+
+
+@tool
+async def hangs(collection: str) -> str:
+    """No termina nunca."""
+    await asyncio.sleep(3600)
+    return ""
+
+
+def call(name, id, collection="users"):
+    return {"name": name, "args": {"collection": collection}, "id": id}
+
+
+@pytest.mark.asyncio
+async def test_calls_of_one_turn_run_concurrently_in_order():
+    """Las llamadas independientes se ejecutan a la vez y los resultados conservan el orden."""
+    executor = ToolExecutor([slow_count], max_concurrency=4)
+
+    start = time.perf_counter()
+    messages = await executor.run([call("slow_count", "1", "a"), call("slow_count", "2", "bbb")])
+
+    assert time.perf_counter() - start < 0.18
+    assert [m.tool_call_id for m in messages] == ["1", "2"]
+    assert json.loads(messages[1].content)["count"] == 3
+    assert all(m.status == "success" for m in messages)
+
+
+@pytest.mark.asyncio
+async def test_concurrency_cap():
+    """Con max_concurrency=1 las llamadas van una tras otra."""
+    executor = ToolExecutor([slow_count], max_concurrency=1)
+
+    start = time.perf_counter()
+    await executor.run([call("slow_count", "1"), call("slow_count", "2")])
+
+    assert time.perf_counter() - start >= 0.2
+
+
+@pytest.mark.asyncio
+async def test_errors_unknown_tools_and_timeouts_are_answered():
+    """Cada llamada recibe su ToolMessage aunque falle, no exista o supere el tiempo del turno."""
+    executor = ToolExecutor([slow_count, broken, hangs], timeout=0.2)
+
+    messages = await executor.run([
+        call("broken", "1"), call("mongodb_drop", "2"), call("hangs", "3"), call("slow_count", "4"),
+    ])
+
+    assert [m.status for m in messages] == ["error", "error", "error", "success"]
+    assert "sin conexión" in json.loads(messages[0].content)["error"]
+    assert json.loads(messages[1].content)["error"] == "Unknown tool: mongodb_drop"
+    assert "timed out" in json.loads(messages[2].content)["error"]
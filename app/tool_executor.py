@@ -0,0 +1,59 @@
+import asyncio
+import json
+from typing import Dict, List, Sequence, Tuple
+from langchain_core.messages import ToolMessage
+from langchain_core.tools import BaseTool
+import config
+
+
+def _error(message: str) -> str:
+    # Same shape as the MCP tools' own error results
+    return json.dumps({"success": False, "error": message}, ensure_ascii=False)
+
+
+class ToolExecutor:
+    """Runs the tool calls of one LLM turn concurrently.
+
+    Tools are resolved by name from a registry. At most `max_concurrency` calls run at
+    once and the whole turn is bounded by `timeout` seconds; calls still running then are
+    cancelled and answered with an error. One ToolMessage is returned per call, in the
+    order the model issued them, so unknown tools and failures are reported back to the
+    model instead of leaving a call unanswered.
+    """
+
+    def __init__(self,
+                 tools: Sequence[BaseTool] = (),
+                 timeout: float = config.TOOL_TURN_TIMEOUT,
+                 max_concurrency: int = config.TOOL_MAX_CONCURRENCY):
+        self.registry: Dict[str, BaseTool] = {t.name: t for t in tools}
+        self.timeout = timeout
+        self.max_concurrency = max(1, max_concurrency)
+
+    async def _call(self, tool_call: dict, semaphore: asyncio.Semaphore) -> Tuple[str, str]:
+        """Returns (content, status) of one call."""
+        tool = self.registry.get(tool_call["name"])
+        if tool is None:
+            return _error(f"Unknown tool: {tool_call['name']}"), "error"
+        async with semaphore:
+            print(f"Executing tool: {tool_call['name']} with args: {tool_call['args']}")
+            return str(await tool.ainvoke(tool_call["args"])), "success"
+
+    async def run(self, tool_calls: List[dict]) -> List[ToolMessage]:
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        tasks = [asyncio.create_task(self._call(call, semaphore)) for call in tool_calls]
+        if tasks:
+            _, pending = await asyncio.wait(tasks, timeout=self.timeout or None)
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        messages = []
+        for call, task in zip(tool_calls, tasks):
+            if task.cancelled():
+                content, status = _error(f"Tool timed out after {self.timeout:.0f}s"), "error"
+            elif task.exception() is not None:
+                content, status = _error(f"Tool execution failed: {task.exception()}"), "error"
+            else:
+                content, status = task.result()
+            messages.append(ToolMessage(content=content, tool_call_id=call["id"], name=call["name"], status=status))
+        return messages
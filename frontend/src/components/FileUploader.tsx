@@ -24,8 +24,28 @@ export const FileUploader: React.FC<FileUploaderProps> = ({ embeddingModel, onUp
         setUploadStatus(`Uploading ${file.name}...`);
 
         try {
-            const data = await api.ingest(file, embeddingModel);
-            setUploadStatus(`Success! Added ${data.chunks_added} chunks from ${data.filename}`);
+            const { job_id } = await api.ingest(file, embeddingModel);
+
+            // Ingestion runs in the background; poll until the job finishes
+            let job = await api.getIngestJob(job_id);
+            while (!['done', 'skipped', 'failed'].includes(job.stage)) {
+                setUploadStatus(
+                    job.stage === 'embedding'
+                        ? `Embedding ${file.name}: ${job.chunks_embedded}/${job.chunks_total - job.chunks_unchanged} chunks...`
+                        : `Processing ${file.name} (${job.stage})...`
+                );
+                await new Promise((resolve) => setTimeout(resolve, 1000));
+                job = await api.getIngestJob(job_id);
+            }
+
+            if (job.stage === 'failed') {
+                throw new Error(job.error || 'Ingestion failed');
+            }
+            setUploadStatus(
+                job.stage === 'skipped'
+                    ? `${job.filename} is unchanged, nothing to do`
+                    : `Success! Added ${job.chunks_embedded} chunks from ${job.filename}`
+            );
 
             if (onUploadSuccess) {
                 onUploadSuccess();
@@ -29,6 +29,20 @@ export interface ChatResponse {
   model: string;
 }
 
+export interface IngestJob {
+  job_id: string;
+  filename: string;
+  embedding_model: string;
+  stage: 'queued' | 'parsing' | 'embedding' | 'done' | 'skipped' | 'failed';
+  chunks_total: number;
+  chunks_embedded: number;
+  chunks_unchanged: number;
+  chunks_deleted: number;
+  chunks_updated: number;
+  chunks_per_second: number;
+  error: string | null;
+}
+
 export interface ModelInfo {
   name: string;
   size?: string;
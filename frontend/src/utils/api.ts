@@ -1,4 +1,4 @@
-import { ChatRequest, ChatResponse, ModelInfo } from '../types';
+import { ChatRequest, ChatResponse, IngestJob, ModelInfo } from '../types';
 
 const API_BASE_URL = import.meta.env.VITE_API_URL || 'api';
 const API_KEY = import.meta.env.VITE_API_KEY || '';
@@ -42,7 +42,7 @@ export const api = {
   },
 
   async *chatStream(request: ChatRequest): AsyncGenerator<string, void, unknown> {
-    const response = await fetch(`${API_BASE_URL}/chat/stream`, {
+    const response = await fetch(`${API_BASE_URL}/chat/stream?format=sse`, {
       method: 'POST',
       headers: getHeaders({
         'Content-Type': 'application/json',
@@ -60,27 +60,37 @@ export const api = {
     }
 
     const decoder = new TextDecoder();
+    let buffer = '';
 
     try {
       while (true) {
         const { done, value } = await reader.read();
         if (done) break;
 
-        const chunk = decoder.decode(value, { stream: true });
-
-        // Si el servidor envía SSE events
-        if (chunk.startsWith('data: ')) {
-          const lines = chunk.split('\n');
-          for (const line of lines) {
-            if (line.startsWith('data: ')) {
-              const data = line.slice(6);
-              if (data === '[DONE]') return;
-              yield data;
-            }
+        buffer += decoder.decode(value, { stream: true });
+
+        // Cada evento SSE termina con una línea en blanco
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+          const frame = buffer.slice(0, boundary);
+          buffer = buffer.slice(boundary + 2);
+
+          let type = 'message';
+          let data = '';
+          for (const line of frame.split('\n')) {
+            if (line.startsWith('event: ')) type = line.slice(7);
+            else if (line.startsWith('data: ')) data += line.slice(6);
+          }
+          const payload = data ? JSON.parse(data) : {};
+
+          if (type === 'token') {
+            yield payload.content;
+          } else if (type === 'error') {
+            throw new Error(payload.message);
+          } else if (type === 'done') {
+            return;
           }
-        } else {
-          // Stream de texto plano
-          yield chunk;
+          // tool_start, tool_end, usage y heartbeat no se muestran en el mensaje
         }
       }
     } finally {
@@ -108,6 +118,16 @@ export const api = {
     return response.json();
   },
 
+  async getIngestJob(jobId: string): Promise<IngestJob> {
+    const response = await fetch(`${API_BASE_URL}/ingest/jobs/${jobId}`, {
+      headers: getHeaders(),
+    });
+    if (!response.ok) {
+      throw new Error('Failed to fetch ingestion job');
+    }
+    return response.json();
+  },
+
   async getDocuments(embeddingModel?: string): Promise<{ documents: string[] }> {
     const query = embeddingModel ? `?embedding_model=${embeddingModel}` : '';
     const response = await fetch(`${API_BASE_URL}/documents${query}`, {